@@ -32,6 +32,10 @@ AWS_IOT_PORT = 8883
 # Topic to publish to
 AWS_IOT_TOPIC = "beaconscanner"
 
+# Topic with runtime configuration updates for this device, this can also be
+# the shadow delta topic "$aws/things/<thing name>/shadow/update/delta"
+AWS_IOT_CONFIG_TOPIC = AWS_IOT_TOPIC + "/" + DEVICE_ID + "/config"
+
 # Certificate
 AWS_IOT_CLIENT_CERT = "/flash/cert/certificate.pem.crt"
 
@@ -47,9 +51,14 @@ AWS_IOT_OFFLINE_QUEUE_SIZE = -1
 AWS_IOT_DRAINING_FREQ = 2
 AWS_IOT_CONN_DISCONN_TIMEOUT = 30
 AWS_IOT_MQTT_OPER_TIMEOUT = 10
+AWS_IOT_PUBLISH_WINDOW = 4  # QoS 1 publishes in flight, 1 publishes synchronously
+AWS_IOT_PUBLISH_RETRIES = 3
 AWS_IOT_LAST_WILL_TOPIC = 'lastwillmessage'
 AWS_IOT_LAST_WILL_MSG = 'Last will of device [' + DEVICE_ID + ']'
 
+# Offer the TLS session of the previous connection on reconnect
+AWS_IOT_TLS_SESSION_RESUMPTION = True
+
 ####################### Shadow updater ########################
 #THING_NAME = "my thing name"
 #CLIENT_ID = "ShadowUpdater"
@@ -29,6 +29,9 @@ LOG_LEVEL = logging.INFO
 # Customer
 CUSTOMER = "InnovateNow"
 
+# Runtime configuration changes received from AWS IoT are persisted in this file
+RUNTIME_CONFIG_FILE = "/flash/runtime_config.json"
+
 # Device identifier for IoT environment
 DEVICE_ID = "e3974fe0-18d9-11e8-9cfb-da0741d48d81"
 
@@ -50,6 +53,24 @@ WLAN_SSID = "HARTOG_GUEST" # SSID to connect to
 WLAN_KEY = "1234567890"    # SSID key
 WLAN_INT_ANTENNA = True    # True internal antenna else False
 
+# WLAN networks as (ssid, key, priority), the highest priority is preferred
+# when its signal is above WLAN_ROAM_RSSI_THRESHOLD
+WLAN_PROFILES = [
+    (WLAN_SSID, WLAN_KEY, 10),
+]
+
+# Roam to a better access point when the signal or publish latency degrades
+WLAN_ROAM_RSSI_THRESHOLD = -80      # dBm
+WLAN_ROAM_LATENCY_THRESHOLD = 5000  # ms
+WLAN_ROAM_CHECK_SECONDS = 60
+
+# Timeouts of the connection phases, every phase is tried CONNECT_ATTEMPTS
+# times. Keep the attempts well within the 5 minute watchdog
+WLAN_CONNECT_TIMEOUT = 10000  # ms, a single join
+WLAN_CONNECT_PHASE_TIMEOUT = 30000  # ms, all joins of an attempt
+NTP_SYNC_TIMEOUT = 30         # seconds
+CONNECT_ATTEMPTS = 3
+
 # BLE scan time in seconds before sending the results to AWS
 # 240
 SCAN_TIME_IN_SECONDS = 240
@@ -60,9 +81,20 @@ SENSOR_I2C_SDA_PIN = 'P22'
 SENSOR_I2C_SCL_PIN = 'P21'
 
 # Environmental sensor is the BME280 sensor (temp, humidity and barometric pressure)
+# with an optional TSL2561 lux sensor which is detected on the I2C bus
 ENVIRONMENT_SENSOR_AVAILABLE = True
 ENVIRONMENT_SENSOR_ID = '4c871008-18da-11e8-a5ea-96c32e02788c'
 
+# BME280 oversampling, filter and mode profile: weather, humidity or
+# indoor-navigation
+ENVIRONMENT_SENSOR_PROFILE = 'weather'
+
+# Sample the environment every INTERVAL seconds and send the mean, standard
+# deviation, minimum and maximum of the cycle, 0 reads once per cycle.
+# The last BUFFER samples are kept
+ENVIRONMENT_SAMPLE_INTERVAL = 10
+ENVIRONMENT_SAMPLE_BUFFER = 32
+
 # GPS is an optional sensor
 # When this setting is set to False you can add a fixed latitude/longitude
 GPS_AVAILABLE = True
@@ -73,10 +105,35 @@ GPS_UART_RX_PIN = 'P4'
 GPS_FIXED_LATITUDE = None
 GPS_FIXED_LONGITUDE = None
 
-# Distance greater than last coords in NVRAM use the stored values
-# Device should be static this rule will help to stabilize the coordinates
-# when gps is activated on board
-GPS_COORD_DIFF_UPDATE_RULE = 25 # meters
+# Receiver type (MTK, UBLOX or UBLOX_M8) for sending the last fix and time
+# after a reset so the receiver gets a fix faster, None disables it
+GPS_RECEIVER = 'MTK'
+
+# Read the GPS continuously in the background and keep the latest fix
+GPS_BACKGROUND_READER = True
+
+# Skip GPS reads and put the receiver in standby while the device does not
+# move. Reads skip up to MAX_SKIP cycles and return every cycle after motion
+# of the Pytrack accelerometer, a displacement or a speed above the limits
+GPS_POWER_SAVE = True
+GPS_POWER_MAX_SKIP = 10
+GPS_POWER_DISPLACEMENT = 25     # meters
+GPS_POWER_SPEED = 2.0           # kph
+ACCELEROMETER_AVAILABLE = False
+
+# Position estimate. The device should be static, the estimate stabilizes
+# the coordinates. Fixes more than GATE standard deviations off are rejected
+# until more than MAX_REJECTS in a row show the device moved
+GPS_POSITION_NOISE = 0.5        # meters per second
+GPS_POSITION_GATE = 3.0
+GPS_POSITION_MAX_REJECTS = 5
+
+# Geofence zones on flash, None disables geofencing
+# Send only the zones when inside a zone and leave the GPS values out of the
+# message when no zone was entered or exited
+GEOFENCE_FILE = "/flash/geofences.json"
+GEOFENCE_ZONE_ONLY = False
+GEOFENCE_SKIP_UNCHANGED = False
 
 # NTP for setting the correct time
 NTP_POOL_SERVER = "nl.pool.ntp.org"
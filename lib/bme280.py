@@ -21,57 +21,144 @@
 # THE SOFTWARE.
 
 # Linter
-# pylint: disable=E0401,E1101,R0902,W0613,W0612,C0103
+# pylint: disable=E0401,E1101,R0902,W0613,W0612,C0103,R1710
 
 """ BME280 sensor library """
 
 import time
 from array import array
-from ustruct import unpack, unpack_from
+
+try:
+    from ustruct import unpack, unpack_from
+except ImportError:
+    from struct import unpack, unpack_from
+
+# Value of a skipped channel in read_values
+NO_VALUE = float('nan')
 
 # BME280 default address.
 BME280_I2CADDR = 0x76
 
-# Operating Modes
+# Oversampling settings, skipped channels are not measured
+BME280_OSAMPLE_SKIP = 0
 BME280_OSAMPLE_1 = 1
 BME280_OSAMPLE_2 = 2
 BME280_OSAMPLE_4 = 3
 BME280_OSAMPLE_8 = 4
 BME280_OSAMPLE_16 = 5
 
+# IIR filter coefficients
+BME280_FILTER_OFF = 0
+BME280_FILTER_2 = 1
+BME280_FILTER_4 = 2
+BME280_FILTER_8 = 3
+BME280_FILTER_16 = 4
+
+# Standby times between measurements in normal mode
+BME280_STANDBY_0_5 = 0     # 0.5 ms
+BME280_STANDBY_62_5 = 1    # 62.5 ms
+BME280_STANDBY_125 = 2
+BME280_STANDBY_250 = 3
+BME280_STANDBY_500 = 4
+BME280_STANDBY_1000 = 5
+BME280_STANDBY_10 = 6
+BME280_STANDBY_20 = 7
+
+# Sensor modes
+BME280_MODE_SLEEP = 0
+BME280_MODE_FORCED = 1
+BME280_MODE_NORMAL = 3
+
+# Recommended profiles of the datasheet:
+# (mode, temperature, pressure, humidity oversampling, filter, standby)
+BME280_PROFILE_WEATHER = (BME280_MODE_FORCED, BME280_OSAMPLE_1, BME280_OSAMPLE_1,
+                          BME280_OSAMPLE_1, BME280_FILTER_OFF, BME280_STANDBY_0_5)
+BME280_PROFILE_HUMIDITY = (BME280_MODE_FORCED, BME280_OSAMPLE_1, BME280_OSAMPLE_SKIP,
+                           BME280_OSAMPLE_1, BME280_FILTER_OFF, BME280_STANDBY_0_5)
+BME280_PROFILE_INDOOR_NAVIGATION = (BME280_MODE_NORMAL, BME280_OSAMPLE_2, BME280_OSAMPLE_16,
+                                    BME280_OSAMPLE_1, BME280_FILTER_16, BME280_STANDBY_0_5)
+
+BME280_PROFILES = {
+    'weather': BME280_PROFILE_WEATHER,
+    'humidity': BME280_PROFILE_HUMIDITY,
+    'indoor-navigation': BME280_PROFILE_INDOOR_NAVIGATION,
+}
+
 BME280_REGISTER_CONTROL_HUM = 0xF2
+BME280_REGISTER_STATUS = 0xF3
 BME280_REGISTER_CONTROL = 0xF4
+BME280_REGISTER_CONFIG = 0xF5
+
+_OSAMPLES = (BME280_OSAMPLE_SKIP, BME280_OSAMPLE_1, BME280_OSAMPLE_2, BME280_OSAMPLE_4,
+             BME280_OSAMPLE_8, BME280_OSAMPLE_16)
 
 class BME280(object):
-    """ BME280 sensor for temperature, humidiy, barometeric pressure """
+    """ BME280 sensor for temperature, humidiy, barometeric pressure.
+        In forced mode every read triggers a conversion and waits for it,
+        in normal mode the sensor measures continuously and a read returns
+        the latest result without waiting """
 
     def __init__(self,
                  mode=BME280_OSAMPLE_1,
                  address=BME280_I2CADDR,
                  i2c=None,
+                 temperature_oversample=None,
+                 pressure_oversample=None,
+                 humidity_oversample=None,
+                 iir_filter=BME280_FILTER_OFF,
+                 standby=BME280_STANDBY_0_5,
+                 sensor_mode=BME280_MODE_FORCED,
+                 profile=None,
                  **kwargs):
-        # Check that mode is valid.
-        if mode not in [BME280_OSAMPLE_1, BME280_OSAMPLE_2, BME280_OSAMPLE_4,
-                        BME280_OSAMPLE_8, BME280_OSAMPLE_16]:
-            raise ValueError(
-                'Unexpected mode value {0}. Set mode to one of '
-                'BME280_ULTRALOWPOWER, BME280_STANDARD, BME280_HIGHRES, or '
-                'BME280_ULTRAHIGHRES'.format(mode))
+        # mode is the oversampling of the channels without their own setting
+        if profile is not None:
+            sensor_mode, temperature_oversample, pressure_oversample, \
+                humidity_oversample, iir_filter, standby = profile
+
+        self._osample_t = mode if temperature_oversample is None else temperature_oversample
+        self._osample_p = mode if pressure_oversample is None else pressure_oversample
+        self._osample_h = mode if humidity_oversample is None else humidity_oversample
+        if self._osample_t == BME280_OSAMPLE_SKIP:
+            raise ValueError('The temperature compensates pressure and humidity, '
+                             'it can not be skipped')
+        for osample in (self._osample_t, self._osample_p, self._osample_h):
+            if osample not in _OSAMPLES:
+                raise ValueError(
+                    'Unexpected oversampling value {0}. Use one of '
+                    'BME280_OSAMPLE_SKIP, BME280_OSAMPLE_1 ... '
+                    'BME280_OSAMPLE_16'.format(osample))
+        if not BME280_FILTER_OFF <= iir_filter <= BME280_FILTER_16:
+            raise ValueError('Unexpected filter value {0}'.format(iir_filter))
+        if not BME280_STANDBY_0_5 <= standby <= BME280_STANDBY_20:
+            raise ValueError('Unexpected standby value {0}'.format(standby))
+        if sensor_mode not in (BME280_MODE_FORCED, BME280_MODE_NORMAL):
+            raise ValueError('Unexpected sensor mode {0}'.format(sensor_mode))
+
         self._mode = mode
+        self._filter = iir_filter
+        self._standby = standby
+        self._sensor_mode = sensor_mode
         self.address = address
         if i2c is None:
             raise ValueError('An I2C object is required.')
         self.i2c = i2c
 
-        # load calibration data
-        dig_88_a1 = self.i2c.readfrom_mem(self.address, 0x88, 26)
-        dig_e1_e7 = self.i2c.readfrom_mem(self.address, 0xE1, 7)
+        # load calibration data, with a managed bus both blocks are read
+        # without a transaction of another device in between
+        dig_88_a1 = bytearray(26)
+        dig_e1_e7 = bytearray(7)
+        calibration = ((0x88, dig_88_a1), (0xE1, dig_e1_e7))
+        if hasattr(self.i2c, 'read_registers'):
+            self.i2c.read_registers(self.address, calibration)
+        else:
+            for register, buf in calibration:
+                self.i2c.readfrom_mem_into(self.address, register, buf)
         self.dig_T1, self.dig_T2, self.dig_T3, self.dig_P1, \
             self.dig_P2, self.dig_P3, self.dig_P4, self.dig_P5, \
             self.dig_P6, self.dig_P7, self.dig_P8, self.dig_P9, \
             _, self.dig_H1 = unpack("<HhhHhhhhhhhhBB", dig_88_a1)
 
-        self.dig_H2, self.dig_H3 = unpack("<hB", dig_e1_e7)
+        self.dig_H2, self.dig_H3 = unpack_from("<hB", dig_e1_e7)
         e4_sign = unpack_from("<b", dig_e1_e7, 3)[0]
         self.dig_H4 = (e4_sign << 4) | (dig_e1_e7[4] & 0xF)
 
@@ -80,14 +167,52 @@ class BME280(object):
 
         self.dig_H6 = unpack_from("<b", dig_e1_e7, 6)[0]
 
-        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
-                             bytearray([0x3F]))
         self.t_fine = 0
 
         # temporary data holders which stay allocated
         self._l1_barray = bytearray(1)
         self._l8_barray = bytearray(8)
         self._l3_resultarray = array("i", [0, 0, 0])
+        self._l3_compensated = [0, 0, 0]
+
+        self.configure()
+
+    def _write(self, register, value):
+        """ Write a byte to the register """
+        self._l1_barray[0] = value
+        self.i2c.writeto_mem(self.address, register, self._l1_barray)
+
+    def configure(self):
+        """ Write the oversampling, filter and standby settings and start
+            normal mode when configured. The config register is only
+            written in sleep mode """
+        self._write(BME280_REGISTER_CONTROL, BME280_MODE_SLEEP)
+        self._write(BME280_REGISTER_CONFIG, self._standby << 5 | self._filter << 2)
+        self._write(BME280_REGISTER_CONTROL_HUM, self._osample_h)
+        if self._sensor_mode == BME280_MODE_NORMAL:
+            self._write(BME280_REGISTER_CONTROL, self._control(BME280_MODE_NORMAL))
+
+        # Maximum measurement time in us (datasheet 9.1), skipped channels
+        # are not measured
+        self._measure_time = 1250 + 2300 * self._osample_count(self._osample_t)
+        if self._osample_p:
+            self._measure_time += 2300 * self._osample_count(self._osample_p) + 575
+        if self._osample_h:
+            self._measure_time += 2300 * self._osample_count(self._osample_h) + 575
+
+    @staticmethod
+    def _osample_count(osample):
+        """ Return the number of samples of the oversampling setting """
+        return 1 << (osample - 1) if osample else 0
+
+    def _control(self, sensor_mode):
+        """ Return the measurement control value for the sensor mode """
+        return self._osample_t << 5 | self._osample_p << 2 | sensor_mode
+
+    @property
+    def measure_time(self):
+        """ Return the maximum time of a measurement in us """
+        return self._measure_time
 
     def read_raw_data(self, result):
         """ Reads the raw (uncompensated) data from the sensor.
@@ -98,17 +223,10 @@ class BME280(object):
                 None
         """
 
-        self._l1_barray[0] = self._mode
-        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM,
-                             self._l1_barray)
-        self._l1_barray[0] = self._mode << 5 | self._mode << 2 | 1
-        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
-                             self._l1_barray)
-
-        sleep_time = 1250 + 2300 * (1 << self._mode)
-        sleep_time = sleep_time + 2300 * (1 << self._mode) + 575
-        sleep_time = sleep_time + 2300 * (1 << self._mode) + 575
-        time.sleep_us(sleep_time)  # Wait the required time
+        # In normal mode the data registers hold the latest measurement
+        if self._sensor_mode == BME280_MODE_FORCED:
+            self._write(BME280_REGISTER_CONTROL, self._control(BME280_MODE_FORCED))
+            time.sleep_us(self._measure_time)  # Wait the required time
 
         # burst readout from 0xF7 to 0xFE, recommended by datasheet
         self.i2c.readfrom_mem_into(self.address, 0xF7, self._l8_barray)
@@ -127,23 +245,24 @@ class BME280(object):
     def read_compensated_data(self, result=None):
         """ Reads the data from the sensor and returns the compensated data.
             Args:
-                result: array of length 3 or alike where the result will be
+                result: list of length 3 or alike where the result will be
                 stored, in temperature, pressure, humidity order. You may use
                 this to read out the sensor without allocating heap memory
             Returns:
-                array with temperature, pressure, humidity. Will be the one from
-                the result parameter if not None
+                list with temperature, pressure, humidity. Will be the one from
+                the result parameter if not None. Skipped channels are None
         """
         self.read_raw_data(self._l3_resultarray)
         raw_temp, raw_press, raw_hum = self._l3_resultarray
         # temperature
-        var1 = ((raw_temp >> 3) - (self.dig_T1 << 1)) * (self.dig_T2 >> 11)
+        var1 = (((raw_temp >> 3) - (self.dig_T1 << 1)) * self.dig_T2) >> 11
         var2 = (((((raw_temp >> 4) - self.dig_T1) *
                   ((raw_temp >> 4) - self.dig_T1)) >> 12) * self.dig_T3) >> 14
         self.t_fine = var1 + var2
         temp = (self.t_fine * 5 + 128) >> 8
 
-        # pressure
+        # pressure, a skipped channel reads 0x80000
+        pressure = None
         var1 = self.t_fine - 128000
         var2 = var1 * var1 * self.dig_P6
         var2 = var2 + ((var1 * self.dig_P5) << 17)
@@ -151,9 +270,9 @@ class BME280(object):
         var1 = (((var1 * var1 * self.dig_P3) >> 8) +
                 ((var1 * self.dig_P2) << 12))
         var1 = (((1 << 47) + var1) * self.dig_P1) >> 33
-        if var1 == 0:
+        if self._osample_p and var1 == 0:
             pressure = 0
-        else:
+        elif self._osample_p:
             p = 1048576 - raw_press
             p = (((p << 31) - var2) * 3125) // var1
             var1 = (self.dig_P9 * (p >> 13) * (p >> 13)) >> 25
@@ -170,7 +289,7 @@ class BME280(object):
         h = h - (((((h >> 15) * (h >> 15)) >> 7) * self.dig_H1) >> 4)
         h = 0 if h < 0 else h
         h = 419430400 if h > 419430400 else h
-        humidity = h >> 12
+        humidity = h >> 12 if self._osample_h else None
 
         if result:
             result[0] = temp
@@ -178,7 +297,22 @@ class BME280(object):
             result[2] = humidity
             return result
 
-        return array("i", (temp, pressure, humidity))
+        return [temp, pressure, humidity]
+
+    def read_values(self, result):
+        """ Reads the temperature, pressure and humidity of one conversion.
+            Args:
+                result: array('f') of length 3 where the temperature in
+                degrees, pressure in hPa and humidity in percent are stored.
+                Skipped channels are NaN
+            Returns:
+                result
+        """
+        t, p, h = self.read_compensated_data(self._l3_compensated)
+        result[0] = t / 100
+        result[1] = NO_VALUE if p is None else (p // 256) / 100
+        result[2] = NO_VALUE if h is None else h / 1024
+        return result
 
     @property
     def temperature(self):
@@ -189,17 +323,17 @@ class BME280(object):
 
     @property
     def pressure(self):
-        """Return the temperature in hPa"""
+        """Return the pressure in hPa or None when skipped"""
         t, p, h = self.read_compensated_data()
-        p = (p // 256) / 100
-        return p
+        if p is not None:
+            return (p // 256) / 100
 
     @property
     def humidity(self):
-        """Return the humidity in percent"""
+        """Return the humidity in percent or None when skipped"""
         t, p, h = self.read_compensated_data()
-        h = h / 1024
-        return h
+        if h is not None:
+            return h / 1024
 
     @property
     def values(self):
@@ -207,11 +341,16 @@ class BME280(object):
 
         t, p, h = self.read_compensated_data()
 
-        p = p // 256
-        pi = p // 100
-        pd = p - pi * 100
+        pressure = None
+        if p is not None:
+            p = p // 256
+            pi = p // 100
+            pd = p - pi * 100
+            pressure = "{}.{:02d}hPa".format(pi, pd)
 
-        hi = h // 1024
-        hd = h * 100 // 1024 - hi * 100
-        return ("{}C".format(t / 100), "{}.{:02d}hPa".format(pi, pd),
-                "{}.{:02d}%".format(hi, hd))
+        humidity = None
+        if h is not None:
+            hi = h // 1024
+            hd = h * 100 // 1024 - hi * 100
+            humidity = "{}.{:02d}%".format(hi, hd)
+        return ("{}C".format(t / 100), pressure, humidity)
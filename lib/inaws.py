@@ -17,7 +17,7 @@
 # THE SOFTWARE.
 
 # Linter
-# pylint: disable=E0401,C0103
+# pylint: disable=E0401,C0103,W0212
 
 """
 InnovateNow AWS library
@@ -25,14 +25,124 @@ InnovateNow AWS library
 import json
 import sys
 import socket
+import time
 
 import aws_config as awsconfig
 from MQTTLib import AWSIoTMQTTClient
+from inmqtt import PublishPipeline
 
 # Initialize logging
 import inlogging as logging
 log = logging.getLogger(__name__)
 
+# Modules of the MQTT library which wrap the socket with ssl
+MQTT_SSL_MODULES = ['MQTTMsgHandler', 'MQTTClient']
+
+class TLSSessionCache(object):
+    """
+    Stand-in for the ssl module used by the MQTT library which remembers
+    the TLS session of the last connection and offers it again on the next
+    handshake so a reconnect can resume the session instead of doing a full
+    handshake with the client certificates.
+    """
+
+    def __init__(self, ssl_module):
+        """
+        Initialize the session cache around the real ssl module
+        """
+        self._ssl = ssl_module
+        self._sock = None
+        self.session = None
+        self.enabled = hasattr(ssl_module, 'save_session')
+
+    def __getattr__(self, name):
+        """
+        Everything else is served by the real ssl module
+        """
+        return getattr(self._ssl, name)
+
+    def wrap_socket(self, sock, **kwargs):
+        """
+        Wrap the socket and offer the cached session when available
+        """
+        if self.enabled and self.session:
+            kwargs['saved_session'] = self.session
+            try:
+                self._sock = self._ssl.wrap_socket(sock, **kwargs)
+                return self._sock
+            except TypeError:
+                # Firmware without session resumption support
+                log.warning('TLS session resumption not supported')
+                self.enabled = False
+                self.session = None
+                del kwargs['saved_session']
+
+        self._sock = self._ssl.wrap_socket(sock, **kwargs)
+        return self._sock
+
+    def save(self):
+        """
+        Save the session of the last wrapped socket
+        """
+        if self.enabled and self._sock:
+            try:
+                self.session = self._ssl.save_session(self._sock)
+            except Exception as e:
+                log.warning('Unable to save TLS session {}', e)
+                self.session = None
+        self._sock = None
+
+    def clear(self):
+        """
+        Forget the cached session
+        """
+        self.session = None
+        self._sock = None
+
+def find_message_handler(client, depth=3):
+    """
+    Return the message handler of the MQTT library which owns the
+    connection of the client or None when it is not found
+    """
+    objects = [client]
+    for _ in range(depth):
+        found = []
+        for obj in objects:
+            for value in getattr(obj, '__dict__', {}).values():
+                if hasattr(value, 'push_on_send_queue') and \
+                   hasattr(value, '_receive_callback'):
+                    return value
+                if hasattr(value, '__dict__'):
+                    found.append(value)
+        objects = found
+
+    return None
+
+def install_tls_session_cache():
+    """
+    Install the TLS session cache in the MQTT library modules.
+    Returns the cache or None when the library does not use the ssl module
+    """
+    cache = None
+    for name in MQTT_SSL_MODULES:
+        try:
+            module = __import__(name)
+        except ImportError:
+            continue
+
+        ssl_module = getattr(module, 'ssl', None)
+        if ssl_module is None:
+            continue
+
+        if isinstance(ssl_module, TLSSessionCache):
+            return ssl_module
+
+        if cache is None:
+            cache = TLSSessionCache(ssl_module)
+        setattr(module, 'ssl', cache)
+
+    return cache
+
 class AWS(object):
     """
     AWS IoT communication with Pycom provided libraries
@@ -44,11 +154,18 @@ class AWS(object):
         """
         self.client = None
         self.is_connected = False
+        self.connect_time_ms = None  # Duration of the last connect
+        self.session_offered = False # Last connect offered a cached TLS session
+        self._tls_cache = None
+        self._pipeline = None
+        self.publish_time_ms = None  # Latency measured since the previous publish
 
     def connect(self):
         """
         Connect AWS IoT
         """
+        if self._tls_cache is None and awsconfig.AWS_IOT_TLS_SESSION_RESUMPTION:
+            self._tls_cache = install_tls_session_cache()
 
         if self.client is None:
             # Configure the MQTT client
@@ -64,25 +181,117 @@ class AWS(object):
             self.client.configureMQTTOperationTimeout(awsconfig.AWS_IOT_MQTT_OPER_TIMEOUT)
 
         # Connect to MQTT Host
-        if self.client.connect():
+        self.session_offered = bool(self._tls_cache and self._tls_cache.session)
+        start = time.ticks_ms()
+        connected = self.client.connect()
+        self.connect_time_ms = time.ticks_diff(time.ticks_ms(), start)
+
+        if connected:
             self.is_connected = True
-            log.info('AWS IoT connection succeeded')
+            if self._tls_cache:
+                self._tls_cache.save()
+            if self._pipeline is None and awsconfig.AWS_IOT_PUBLISH_WINDOW > 1:
+                self._pipeline = self._install_pipeline()
+            # The ssl module does not report whether the server accepted
+            # the offered session, the connect time tells the difference
+            log.info('AWS IoT connection succeeded in {}ms (TLS session offered: {})',
+                     self.connect_time_ms, self.session_offered)
         else:
+            # Do not offer a session the server may have rejected
+            if self._tls_cache:
+                self._tls_cache.clear()
             raise socket.error('AWS IoT connection failed')
 
-    def publish(self, msg=None):
+    def _install_pipeline(self):
+        """
+        Send the publishes through the message handler of the MQTT library
+        and take the PUBACKs of the pipeline from its receive path.
+        Returns None when the handler is not found
+        """
+        handler = find_message_handler(self.client)
+        if handler is None:
+            log.warning('MQTT message handler not found, publishing synchronously')
+            return None
+
+        pipeline = PublishPipeline(handler.push_on_send_queue,
+                                   size=awsconfig.AWS_IOT_PUBLISH_WINDOW,
+                                   timeout=awsconfig.AWS_IOT_MQTT_OPER_TIMEOUT,
+                                   retries=awsconfig.AWS_IOT_PUBLISH_RETRIES)
+        receive = handler._receive_callback
+
+        def receive_callback(message):
+            if not pipeline.received(message):
+                receive(message)
+
+        handler._receive_callback = receive_callback
+        return pipeline
+
+    def publish(self, msg=None, callback=None):
+        """
+        Publish message with QoS 1.
+        With the pipeline up to AWS_IOT_PUBLISH_WINDOW messages are kept in
+        flight and the optional callback(payload, succeeded) is called in
+        publish order. publish_time_ms holds the latency measured since the
+        previous publish or None
+        """
+        payload = json.dumps(msg)
+        log.info('Publish [{}]', payload)
+
+        if self._pipeline is None:
+            start = time.ticks_ms()
+            succeeded = self.client.publish(awsconfig.AWS_IOT_TOPIC, payload, 1)
+            self.publish_time_ms = time.ticks_diff(time.ticks_ms(), start)
+            if callback:
+                callback(payload, succeeded)
+            return succeeded
+
+        succeeded = self._pipeline.publish(awsconfig.AWS_IOT_TOPIC, payload, callback,
+                                           timeout=awsconfig.AWS_IOT_MQTT_OPER_TIMEOUT)
+        self.publish_time_ms = self._pipeline.window.take_latency()
+        return succeeded
+
+    def service(self):
         """
-        Publish message
+        Retransmit timed out publishes and complete the acknowledged ones
         """
-        log.info('Publish [{}]', json.dumps(msg))
-        self.client.publish(awsconfig.AWS_IOT_TOPIC, json.dumps(msg), 1)
+        if self._pipeline:
+            self._pipeline.service()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all publishes in flight are completed.
+        Returns False when the timeout in seconds expired first
+        """
+        if self._pipeline is None:
+            return True
+        return self._pipeline.flush(timeout)
+
+    def subscribe(self, topic=None, callback=None):
+        """
+        Subscribe to the topic, by default the device configuration topic.
+        The callback is called with (client, userdata, message)
+        """
+        if topic is None:
+            topic = awsconfig.AWS_IOT_CONFIG_TOPIC
+
+        log.info('Subscribe to [{}]', topic)
+        if not self.client.subscribe(topic, 1, callback):
+            raise socket.error('AWS IoT subscription to [' + topic + '] failed')
 
     def disconnect(self):
         """
         Disconnect AWS IoT
         """
         if self.client:
+            self.flush(timeout=awsconfig.AWS_IOT_MQTT_OPER_TIMEOUT)
             if self.client.disconnect():
                 log.info('AWS IoT disconnected')
                 self.is_connected = False
-                self.client = None
+
+    def reconnect(self):
+        """
+        Reconnect AWS IoT reusing the configured client and TLS session
+        """
+        if self.is_connected:
+            self.disconnect()
+        self.connect()
@@ -23,12 +23,22 @@
 
 import binascii
 import sys
-from network import Bluetooth
+import time
+
+try:
+    from network import Bluetooth
+except ImportError:
+    Bluetooth = None
+
+from intimebase import timebase
 
 # Initialize logging
 import inlogging as logging
 log = logging.getLogger(__name__)
 
+# Milliseconds between the calls of the service function while scanning
+SERVICE_INTERVAL = 1000
+
 class BLEScanner(object):
     """ BLE scanner for beacons and tags data packages """
 
@@ -36,21 +46,29 @@ class BLEScanner(object):
 
         self._beacons = []
         self._tags = []
+        self._beacon_ticks = []  # First sighting of every beacon in ticks
+        self._tag_ticks = []     # First sighting of every tag in ticks
 
         self._max_list_items = max_list_items
         self._ble = None
 
-    def start(self, timeout=-1):
-        """ Start beacon scanning """
+    def start(self, timeout=-1, service=None):
+        """ Start beacon scanning. The optional service function is called
+            every SERVICE_INTERVAL ms while scanning """
 
         log.info('Start scanning for beacons and tags')
         if self._ble is None:
             self._ble = Bluetooth()
 
         self._ble.start_scan(timeout)
+        serviced = time.ticks_ms()
         while self._ble.isscanning():
             self.beacon_data_collect()
 
+            if service and time.ticks_diff(time.ticks_ms(), serviced) >= SERVICE_INTERVAL:
+                serviced = time.ticks_ms()
+                service()
+
     def stop(self):
         """ Stop BLE """
         log.info('Stop scanning for beacons and tags')
@@ -68,6 +86,8 @@ class BLEScanner(object):
         log.info('Reset beacon/tag list')
         self._beacons[:] = []
         self._tags[:] = []
+        self._beacon_ticks[:] = []
+        self._tag_ticks[:] = []
 
     @property
     def beacons(self):
@@ -81,6 +101,16 @@ class BLEScanner(object):
         res = list(self._tags) # make a copy
         return res
 
+    @property
+    def beacon_ticks(self):
+        """ Return the first sighting ticks of the beacons found """
+        return list(self._beacon_ticks)
+
+    @property
+    def tag_ticks(self):
+        """ Return the first sighting ticks of the tags found """
+        return list(self._tag_ticks)
+
     def beacon_data_collect(self):
         """ Collect the beacon data """
 
@@ -95,6 +125,7 @@ class BLEScanner(object):
                 if tag not in self._tags:
                     log.debug('Found tag [{}]', tag)
                     self._tags.append(tag)
+                    self._tag_ticks.append(timebase.stamp())
 
             else:
 
@@ -110,3 +141,4 @@ class BLEScanner(object):
                     if beacon not in self._beacons:
                         log.debug('Found beacon [{}]', beacon)
                         self._beacons.append(beacon)
+                        self._beacon_ticks.append(timebase.stamp())
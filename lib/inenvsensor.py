@@ -22,23 +22,49 @@
 """
 InnovateNow Environment Sensor based on:
     - BME280 sensor for Temperature, Humidity and Barometric pressure
+    - TSL2561 sensor for Lux (optional)
 """
+import _thread
+from array import array
+
 import bme280
+import tsl2561
+from intimebase import timebase
+from intimer import Timer
 
 # Initialize logging
 import inlogging as logging
 log = logging.getLogger(__name__)
 
+# Index of the values in a reading
+TEMPERATURE = 0
+BAROMETRIC_PRESSURE = 1
+HUMIDITY = 2
+LUX = 3
+
+# Message names of the values
+CHANNELS = ('temperature', 'barometricPressure', 'humidity', 'lux')
+
+# Sample of a channel without a new value
+NO_VALUE = bme280.NO_VALUE
+
 class Environment(object):
     """
-    Class for getting the Enviroment sensor values
+    Class for getting the Enviroment sensor values.
+    read() takes the values of one conversion, the properties return the
+    values of the last reading. Channels skipped by the profile are NO_VALUE
+    in a reading and None in the properties
     """
 
-    def __init__(self, i2c=None):
+    def __init__(self, i2c=None, profile='weather'):
         """
-        Initialize the enviromental sensor
+        Initialize the enviromental sensor with a BME280 profile
+        (weather, humidity or indoor-navigation)
         """
         self.i2c = i2c
+        self.ticks = None  # Ticks of the last reading
+        self.bme280 = None
+        self.tsl2561 = None
 
         if self.i2c:
             self.addresses = self.i2c.scan()
@@ -46,26 +72,234 @@ class Environment(object):
             # log.info('I2C addresses [{}]', self.addresses)
             log.info('BME280 [{}]', bme280.BME280_I2CADDR)
 
-            self.bme280 = None
             if bme280.BME280_I2CADDR in self.addresses:
                 log.info('Initialize Temperature, Humidity and Barometric sensor')
                 self.bme280 = bme280.BME280(address=bme280.BME280_I2CADDR,
-                                            i2c=i2c) # default address 0x76
+                                            i2c=i2c, # default address 0x76
+                                            profile=bme280.BME280_PROFILES[profile])
+
+            if tsl2561.TSL2561_I2CADDR in self.addresses:
+                log.info('Initialize Lux sensor')
+                self.tsl2561 = tsl2561.TSL2561(i2c=i2c, address=tsl2561.TSL2561_I2CADDR)
+                self.tsl2561.integration_time(402)
+                self.tsl2561.start()
+
+        # Last reading, stays allocated
+        self.values = array('f', [0.0] * (LUX + 1 if self.tsl2561 else LUX))
+        self.lux_ticks = None  # Ticks of the last lux value
+
+    def read(self):
+        """
+        Read all values of one conversion into values, returns values or
+        None without a sensor. The lux value is collected from the
+        integration started by the previous read, so reading never waits
+        for it
+        """
+        if self.tsl2561:
+            self.__read_lux()
+
+        if self.bme280:
+            self.bme280.read_values(self.values)
+            self.ticks = timebase.stamp()
+            return self.values
+
+    def __read_lux(self):
+        """
+        Collect a finished integration and start the next one
+        """
+        try:
+            lux = self.tsl2561.poll(autogain=True)
+        except ValueError as e:
+            log.warning('Lux sensor {}', e)
+            self.tsl2561.start()
+            return
+
+        if lux is not None:
+            self.values[LUX] = lux
+            self.lux_ticks = timebase.stamp()
+            self.tsl2561.start()
+
+    def __value(self, channel):
+        """
+        Return the value of the last reading or None when not measured
+        """
+        if self.ticks is not None:
+            value = self.values[channel]
+            if value == value:  # NaN when skipped
+                return value
 
     @property
     def temperature(self):
-        """Return the current temperature in celsius"""
-        if self.bme280:
-            return self.bme280.temperature
+        """Return the temperature in celsius of the last reading"""
+        return self.__value(TEMPERATURE)
 
     @property
     def humidity(self):
-        """Return the current humidity percentage"""
-        if self.bme280:
-            return self.bme280.humidity
+        """Return the humidity percentage of the last reading"""
+        return self.__value(HUMIDITY)
+
+    @property
+    def lux(self):
+        """Return the lux of the last reading"""
+        if self.lux_ticks is not None:
+            return self.values[LUX]
 
     @property
     def barometric_pressure(self):
-        """Return the current barometric pressure in hPa"""
-        if self.bme280:
-            return self.bme280.pressure
+        """Return the barometric pressure in hPa of the last reading"""
+        return self.__value(BAROMETRIC_PRESSURE)
+
+
+class Statistics(object):
+    """
+    Streaming mean and variance (Welford) with minimum and maximum
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new window
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        """
+        Add a value
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    @property
+    def variance(self):
+        """
+        Return the sample variance
+        """
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    def to_dict(self):
+        """
+        Return the aggregates for a message
+        """
+        return {'mean': round(self.mean, 2),
+                'stdDev': round(self.variance ** 0.5, 2),
+                'min': round(self.minimum, 2),
+                'max': round(self.maximum, 2),
+                'samples': self.count}
+
+
+class EnvironmentSampler(object):
+    """
+    Samples the environment on a timer into ring buffers of the last size
+    samples and keeps the statistics per reporting window. Memory does not
+    grow with the window
+    """
+
+    def __init__(self, environment, interval=10, size=32):
+        """
+        Initialize the sampler, interval in seconds
+        """
+        self.environment = environment
+        self.interval = interval
+        self.size = size
+        self.channels = len(environment.values)
+
+        self.ticks = array('l', [0] * size)
+        self.buffers = [array('f', [0.0] * size) for _ in range(self.channels)]
+        self.samples = 0             # Total samples taken
+        self.errors = 0
+        self._lux_ticks = None       # Ticks of the last sampled lux value
+
+        # The window being sampled and the last reported window are swapped
+        self._window = [Statistics() for _ in range(self.channels)]
+        self._reported = [Statistics() for _ in range(self.channels)]
+        self._lock = _thread.allocate_lock()
+        self._timer = None
+
+    def start(self):
+        """
+        Start sampling
+        """
+        if self._timer is None:
+            self._timer = Timer(seconds=self.interval, callback=self._sample, periodic=True)
+
+    def stop(self):
+        """
+        Stop sampling
+        """
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _sample(self, alarm=None):
+        """
+        Take a sample
+        """
+        try:
+            values = self.environment.read()
+        except OSError as e:
+            self.errors += 1
+            log.error('Environment sample failed {}', e)
+            return
+
+        if values is None:
+            return
+
+        with self._lock:
+            index = self.samples % self.size
+            self.ticks[index] = self.environment.ticks
+            for channel in range(self.channels):
+                value = values[channel]
+                if value != value:
+                    # Channel skipped by the profile
+                    self.buffers[channel][index] = NO_VALUE
+                    continue
+
+                if channel == LUX:
+                    # Only a lux value collected since the last sample
+                    lux_ticks = self.environment.lux_ticks
+                    if lux_ticks is None or lux_ticks == self._lux_ticks:
+                        self.buffers[channel][index] = NO_VALUE
+                        continue
+                    self._lux_ticks = lux_ticks
+
+                self.buffers[channel][index] = value
+                self._window[channel].add(value)
+            self.samples += 1
+
+    def history(self, channel):
+        """
+        Return the samples of the channel in the ring buffer, oldest first.
+        Skipped samples and samples without a new lux value are NO_VALUE (NaN)
+        """
+        with self._lock:
+            count = min(self.samples, self.size)
+            first = self.samples - count
+            return [self.buffers[channel][(first + i) % self.size] for i in range(count)]
+
+    def window(self):
+        """
+        End the reporting window and return the statistics per channel name,
+        valid until the next window
+        """
+        with self._lock:
+            self._window, self._reported = self._reported, self._window
+            for statistics in self._window:
+                statistics.reset()
+
+        return dict((CHANNELS[channel], self._reported[channel])
+                    for channel in range(self.channels) if self._reported[channel].count)
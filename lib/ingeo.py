@@ -0,0 +1,172 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,E1101,C0103
+
+"""
+InnovateNow geodesy functions. Coordinates are signed decimal degrees
+(latitude, longitude), distances in meters
+"""
+import math
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+EARTH_RADIUS = 6371000             # Mean radius in meters
+EQUIRECTANGULAR_LIMIT = 10000      # Meters up to which the fast path is accurate enough
+
+_RADIANS = math.pi / 180
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Return the great circle distance
+    """
+    phi1 = lat1 * _RADIANS
+    phi2 = lat2 * _RADIANS
+    sin_phi = math.sin((phi2 - phi1) / 2)
+    sin_lambda = math.sin((lon2 - lon1) * _RADIANS / 2)
+
+    a = sin_phi * sin_phi + math.cos(phi1) * math.cos(phi2) * sin_lambda * sin_lambda
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def equirectangular(lat1, lon1, lat2, lon2):
+    """
+    Return the distance on a flat projection, accurate for short distances
+    with a single cosine
+    """
+    x = (lon2 - lon1) * math.cos((lat1 + lat2) * _RADIANS / 2)
+    y = lat2 - lat1
+    return EARTH_RADIUS * _RADIANS * math.sqrt(x * x + y * y)
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """
+    Return the distance with the fast path when the points are close
+    """
+    meters = equirectangular(lat1, lon1, lat2, lon2)
+    if meters < EQUIRECTANGULAR_LIMIT:
+        return meters
+
+    return haversine(lat1, lon1, lat2, lon2)
+
+
+def bearing(lat1, lon1, lat2, lon2):
+    """
+    Return the initial bearing in degrees (0-360) from the first to the
+    second point
+    """
+    phi1 = lat1 * _RADIANS
+    phi2 = lat2 * _RADIANS
+    delta_lambda = (lon2 - lon1) * _RADIANS
+
+    y = math.sin(delta_lambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(delta_lambda)
+    return (math.atan2(y, x) / _RADIANS + 360) % 360
+
+
+def haversine_many(lat, lon, lats, lons, out=None):
+    """
+    Return the distances from one point to the points in the lats and lons
+    buffers in out, an array('f') which is allocated when not given
+    """
+    count = len(lats)
+    if out is None:
+        out = array('f', bytearray(4 * count))
+
+    phi = lat * _RADIANS
+    cos_phi = math.cos(phi)
+    diameter = 2 * EARTH_RADIUS
+    sin = math.sin
+    cos = math.cos
+    for i in range(count):
+        phi2 = lats[i] * _RADIANS
+        sin_phi = sin((phi2 - phi) / 2)
+        sin_lambda = sin((lons[i] - lon) * _RADIANS / 2)
+        a = sin_phi * sin_phi + cos_phi * cos(phi2) * sin_lambda * sin_lambda
+        out[i] = diameter * math.asin(math.sqrt(min(a, 1.0)))
+
+    return out
+
+
+def equirectangular_many(lat, lon, lats, lons, out=None):
+    """
+    Return the flat projection distances from one point to the points in the
+    lats and lons buffers. The cosine of the first point is used for all
+    points, so they should be close to each other
+    """
+    count = len(lats)
+    if out is None:
+        out = array('f', bytearray(4 * count))
+
+    cos_phi = math.cos(lat * _RADIANS)
+    scale = EARTH_RADIUS * _RADIANS
+    sqrt = math.sqrt
+    for i in range(count):
+        x = (lons[i] - lon) * cos_phi
+        y = lats[i] - lat
+        out[i] = scale * sqrt(x * x + y * y)
+
+    return out
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """
+    Return the great circle distances of NumPy arrays for analysis of
+    recorded tracks on a host
+    """
+    if numpy is None:
+        raise ImportError('numpy is not available')
+
+    phi1 = numpy.radians(lat1)
+    phi2 = numpy.radians(lat2)
+    sin_phi = numpy.sin((phi2 - phi1) / 2)
+    sin_lambda = numpy.sin(numpy.radians(numpy.subtract(lon2, lon1)) / 2)
+
+    a = sin_phi * sin_phi + numpy.cos(phi1) * numpy.cos(phi2) * sin_lambda * sin_lambda
+    return 2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+def equirectangular_np(lat1, lon1, lat2, lon2):
+    """
+    Return the flat projection distances of NumPy arrays
+    """
+    if numpy is None:
+        raise ImportError('numpy is not available')
+
+    x = numpy.radians(numpy.subtract(lon2, lon1)) * numpy.cos(numpy.radians(numpy.add(lat1, lat2)) / 2)
+    y = numpy.radians(numpy.subtract(lat2, lat1))
+    return EARTH_RADIUS * numpy.sqrt(x * x + y * y)
+
+
+def track_distance_np(lats, lons):
+    """
+    Return the length of a recorded track
+    """
+    if numpy is None:
+        raise ImportError('numpy is not available')
+
+    lats = numpy.asarray(lats, dtype=float)
+    lons = numpy.asarray(lons, dtype=float)
+    return float(numpy.sum(haversine_np(lats[:-1], lons[:-1], lats[1:], lons[1:])))
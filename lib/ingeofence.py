@@ -0,0 +1,184 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,C0103,W0622
+
+"""
+InnovateNow geofencing
+"""
+import json
+
+from array import array
+
+import inlogging as logging
+log = logging.getLogger(__name__)
+
+GRID_SIZE = 8                # Cells per axis of the grid index
+
+EVENT_ENTER = 'enter'
+EVENT_EXIT = 'exit'
+
+
+class Zone(object):
+    """
+    Polygon zone with its bounding box
+    """
+
+    def __init__(self, id, polygon):
+        """
+        Initialize the zone with a list of (latitude, longitude) points
+        """
+        if len(polygon) < 3:
+            raise ValueError('Zone [' + str(id) + '] needs at least 3 points')
+
+        self.id = id
+        self.lats = array('f', [point[0] for point in polygon])
+        self.lons = array('f', [point[1] for point in polygon])
+
+        self.min_lat = min(self.lats)
+        self.max_lat = max(self.lats)
+        self.min_lon = min(self.lons)
+        self.max_lon = max(self.lons)
+
+    def contains(self, lat, lon):
+        """
+        Return if the point is inside the polygon (ray casting)
+        """
+        if lat < self.min_lat or lat > self.max_lat or lon < self.min_lon or lon > self.max_lon:
+            return False
+
+        lats = self.lats
+        lons = self.lons
+        inside = False
+        j = len(lats) - 1
+        for i in range(len(lats)):
+            lat_i = lats[i]
+            lat_j = lats[j]
+            if (lat_i > lat) != (lat_j > lat) and \
+               lon < (lons[j] - lons[i]) * (lat - lat_i) / (lat_j - lat_i) + lons[i]:
+                inside = not inside
+            j = i
+
+        return inside
+
+
+class Geofence(object):
+    """
+    Zones with a grid index over their bounding boxes. Only the zones of the
+    grid cell of a point are tested. The zones file is JSON:
+    {"zones": [{"id": "depot", "polygon": [[lat, lon], ...]}, ...]}
+    """
+
+    def __init__(self, zones=None, grid_size=GRID_SIZE):
+        """
+        Initialize the geofence and build the index
+        """
+        self.zones = zones or []
+        self.grid_size = grid_size
+        self.current = ()            # Ids of the zones of the last update
+        self.updates = 0
+
+        self.__grid = []
+        self.__index()
+
+    @staticmethod
+    def load(path):
+        """
+        Load the zones from flash, a missing or invalid file gives no zones
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except OSError:
+            log.warning('No geofence zones in [{}]', path)
+            return Geofence()
+        except ValueError as e:
+            log.error('Invalid geofence zones in [{}] {}', path, e)
+            return Geofence()
+
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('zones must be in an object')
+            zones = [Zone(zone['id'], zone['polygon']) for zone in data.get('zones', [])]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            log.error('Invalid geofence zones in [{}] {}', path, e)
+            return Geofence()
+
+        log.info('Loaded {} geofence zones', len(zones))
+        return Geofence(zones)
+
+    def __index(self):
+        """
+        Precompute the zones per grid cell
+        """
+        if not self.zones:
+            return
+
+        self.min_lat = min(zone.min_lat for zone in self.zones)
+        self.max_lat = max(zone.max_lat for zone in self.zones)
+        self.min_lon = min(zone.min_lon for zone in self.zones)
+        self.max_lon = max(zone.max_lon for zone in self.zones)
+        self.cell_lat = (self.max_lat - self.min_lat) / self.grid_size or 1.0
+        self.cell_lon = (self.max_lon - self.min_lon) / self.grid_size or 1.0
+
+        self.__grid = [[] for _ in range(self.grid_size * self.grid_size)]
+        for number, zone in enumerate(self.zones):
+            for row in range(self.__row(zone.min_lat), self.__row(zone.max_lat) + 1):
+                for column in range(self.__column(zone.min_lon), self.__column(zone.max_lon) + 1):
+                    self.__grid[row * self.grid_size + column].append(number)
+
+    def __row(self, lat):
+        """
+        Return the grid row of the latitude
+        """
+        return min(int((lat - self.min_lat) / self.cell_lat), self.grid_size - 1)
+
+    def __column(self, lon):
+        """
+        Return the grid column of the longitude
+        """
+        return min(int((lon - self.min_lon) / self.cell_lon), self.grid_size - 1)
+
+    def locate(self, lat, lon):
+        """
+        Return the ids of the zones containing the point
+        """
+        if not self.zones or lat < self.min_lat or lat > self.max_lat or \
+           lon < self.min_lon or lon > self.max_lon:
+            return ()
+
+        cell = self.__grid[self.__row(lat) * self.grid_size + self.__column(lon)]
+        return tuple(self.zones[number].id for number in cell
+                     if self.zones[number].contains(lat, lon))
+
+    def update(self, lat, lon):
+        """
+        Locate the point and return the (event, zone id) of the zones
+        entered and exited since the last update
+        """
+        zones = self.locate(lat, lon)
+        events = [(EVENT_EXIT, id) for id in self.current if id not in zones]
+        events.extend((EVENT_ENTER, id) for id in zones if id not in self.current)
+
+        for event, id in events:
+            log.info('Geofence {} zone [{}]', event, id)
+
+        self.current = zones
+        self.updates += 1
+        return events
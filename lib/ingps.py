@@ -23,6 +23,9 @@
 InnovateNow GPS sensor based on serial or I2C GPS modules with NMEA support.
 Parsing of the NMEA sentences is done with the micropyGPS library.
 
+Sentences of all talkers (GP, GN, GL, GA, BD, GB) are accepted, segments
+are matched on their sentence type so combined GNSS receivers work as well.
+
 Tested with:
 - UBlox NEO-6M
 - Quectel L76-L
@@ -30,8 +33,13 @@ Tested with:
 pylint:
 """
 import time
-from machine import Timer
+import _thread
 from micropygps import MicropyGPS
+from intimer import Deadline
+from intimebase import timebase
+
+import innvram
+import ingpscmd
 
 # Initialize logging
 import inlogging as logging
@@ -40,155 +48,620 @@ log = logging.getLogger(__name__)
 # Quectel L76-L address
 GPS_I2CADDR = 0x10
 
+# Segments are matched on the sentence type, the GP talker is only an example
 SUPPORTED_GPS_SEGMENTS = ['GPGSV', 'GPRMC', 'GPGSA', 'GPGGA', 'GPGLL', 'GPVTG']
 
+# Sentence types needed for position, altitude, speed and course. Reading
+# stops as soon as these are parsed for the same fix epoch
+GPS_REQUIRED_SENTENCES = ('RMC', 'GGA')
+
+# Milliseconds to wait after a read without data
+GPS_POLL_INTERVAL = 50
+
+# Receiver types for hot start assistance
+RECEIVER_MTK = 'MTK'          # Quectel L76-L
+RECEIVER_UBLOX = 'UBLOX'      # u-blox 6 like the NEO-6M
+RECEIVER_UBLOX_M8 = 'UBLOX_M8'
+
+# NVRAM keys of the last fix
+NVRAM_GPS_LATITUDE = 'gps_lat'     # 1e-7 degrees
+NVRAM_GPS_LONGITUDE = 'gps_lon'    # 1e-7 degrees
+NVRAM_GPS_ALTITUDE = 'gps_alt'     # cm
+NVRAM_GPS_TIME = 'gps_time'        # seconds since epoch
+NVRAM_GPS_HDOP = 'gps_hdop'        # 0.1
+NVRAM_GPS_SATELLITES = 'gps_sats'
+
+# Minimal milliseconds between two saves of the last fix
+GPS_FIX_SAVE_INTERVAL = 600000
+
+# Times before 2018-01-01 are not valid for assistance
+MIN_VALID_TIME = 1514764800
+
+def load_last_fix():
+    """
+    Return the last saved fix as (latitude, longitude, altitude, time,
+    hdop, satellites) or None
+    """
+    latitude = innvram.load_signed(NVRAM_GPS_LATITUDE)
+    longitude = innvram.load_signed(NVRAM_GPS_LONGITUDE)
+    if latitude is None or longitude is None:
+        return None
+
+    return (latitude / 10000000, longitude / 10000000,
+            innvram.load_signed(NVRAM_GPS_ALTITUDE, 0) / 100,
+            innvram.load(NVRAM_GPS_TIME, 0),
+            innvram.load(NVRAM_GPS_HDOP, 0) / 10,
+            innvram.load(NVRAM_GPS_SATELLITES, 0))
+
+def save_last_fix(fix):
+    """
+    Save the position, time and quality of the fix
+    """
+    innvram.store_signed(NVRAM_GPS_LATITUDE, int(fix.lat * 10000000))
+    innvram.store_signed(NVRAM_GPS_LONGITUDE, int(fix.lon * 10000000))
+    innvram.store_signed(NVRAM_GPS_ALTITUDE, int(fix.altitude * 100))
+    innvram.store(NVRAM_GPS_TIME, int(time.time()))
+    innvram.store(NVRAM_GPS_HDOP, int(fix.hdop * 10))
+    innvram.store(NVRAM_GPS_SATELLITES, fix.satellites_in_use)
+
+# Size of a single read, the I2C interface of the Quectel L76-L returns 255 bytes
+GPS_READ_SIZE = 255
+
+# Longest sentence accepted, NMEA 0183 limits sentences to 82 characters
+NMEA_MAX_LENGTH = 96
+
+# bytearray.find and count scan the read buffer in C, ports without them
+# scan in Python
+if hasattr(bytearray, 'find') and hasattr(bytearray, 'count'):
+    _find = bytearray.find
+    _count = bytearray.count
+else:
+    def _find(buf, sub, start, end):
+        """
+        Return the index of the first byte of sub in buf[start:end] or -1
+        """
+        c = sub[0]
+        for i in range(start, end):
+            if buf[i] == c:
+                return i
+        return -1
+
+    def _count(buf, sub, start, end):
+        """
+        Return the number of bytes of sub in buf[start:end]
+        """
+        c = sub[0]
+        n = 0
+        for i in range(start, end):
+            if buf[i] == c:
+                n += 1
+        return n
+
 class DataReader(object):
     """
-    Class for reading the gps data via uart
+    Class for reading the gps data via uart or i2c.
+    Data is read into a fixed buffer and sentences are reassembled across
+    reads in a fixed line buffer. Only \\r\\n terminated sentences are handed
+    to the sentence handler, which validates the checksum and returns the
+    sentence type or None
     """
-    def __init__(self):
+    def __init__(self, sentence_handler=None):
         self.__finished = False
-        self.data = ''
+        self.complete = False
         self.segments_parsed = []
-
-    def start(self, i2c=None, uart=None, timeout=5, gps_segments=SUPPORTED_GPS_SEGMENTS):
+        self.types_parsed = []
+        self.sentence_handler = sentence_handler
+        self._required = None
+        self._epoch = None
+        self._epochs = dict()
+
+        # Buffers which stay allocated
+        self._read_buf = bytearray(GPS_READ_SIZE)
+        self._read_mv = memoryview(self._read_buf)
+        self._line = bytearray(NMEA_MAX_LENGTH)
+        self._line_mv = memoryview(self._line)
+        self._line_len = 0
+        self._overflow = False
+        self._offset = 0          # Data left in the read buffer from offset up to size
+        self._size = 0
+
+        # Statistics
+        self.bytes_read = 0
+        self.sentences_complete = 0
+        self.sentences_dropped = 0
+        self.reads = 0            # Reads during the last start
+        self.read_us = 0          # Time spent reading the bus during the last start
+        self.read_time_ms = 0     # Duration of the last start
+        self.timed_out = False    # Last start ended on the timeout
+
+    def start(self, i2c=None, uart=None, timeout=5, gps_segments=SUPPORTED_GPS_SEGMENTS,
+              required=None, epoch=None):
         """
-        Start reading GPS data
+        Start reading GPS data. Reading ends when all gps_segments are parsed,
+        when the required sentence types are parsed for the same fix epoch
+        returned by epoch() or when the timeout in seconds passes
         """
         log.debug('Start reading the data')
 
+        start = time.ticks_ms()
+        deadline = Deadline(timeout * 1000)
+
         self.segments_parsed = []
+        self.types_parsed = []
+        self._required = required
+        self._epoch = epoch
+        self._epochs = dict()
         self.__finished = False
+        self.complete = False
+        self.reads = 0
+        self.read_us = 0
+        self.timed_out = False
 
         """
         Write 1 byte to register to start sending data
         """
         if i2c:
             log.debug('Wake up GPS device')
-            i2c.writeto(GPS_I2CADDR, self.data)
+            i2c.writeto(GPS_I2CADDR, b'')
+
+        # Data read after the end of the previous read, sentences continue
+        # across reads as the receiver writes a continuous stream
+        if self._offset < self._size:
+            self.feed(self._size, self._offset)
 
-        Timer.Alarm(handler=self.__stop, s=timeout)
         while not self.__finished:
-            ret_data = None
+            if deadline.expired:
+                log.debug('Data reader timeout')
+                self.timed_out = True
+                break
+
+            size = 0
+            read_start = time.ticks_us()
 
             if i2c:
-                ret_data = self.__i2c_read_data(i2c)
+                size = self.__i2c_read_data(i2c)
             if uart:
-                ret_data = self.__uart_read_data(uart)
+                size = self.__uart_read_data(uart)
+
+            self.read_us += time.ticks_diff(time.ticks_us(), read_start)
+            self.reads += 1
 
             # Process the data read
-            if ret_data:
-                data_str = ret_data.decode("utf-8")
-                data_array = data_str.split('$')
+            data = 0
+            if size:
+                self.bytes_read += size
+                data = self.feed(size)
+
+            if not self.__finished and all(i[2:] in self.types_parsed for i in gps_segments):
+                self.complete = True
+                self.__finished = True
 
-                log.debug('Read data: ' + str(data_array))
+            # Wait for the receiver when there was nothing to read
+            if not data and not self.__finished:
+                time.sleep_ms(min(GPS_POLL_INTERVAL, deadline.remaining))
 
-                # Process the data item
-                for data_item in data_array:
-                    # Add $ and remove \r\n
-                    data_item = '$' + data_item.rstrip('\r\n')
+        self.read_time_ms = time.ticks_diff(time.ticks_ms(), start)
 
-                    log.debug('Process [' + data_item + ']')
-                    if data_item.find('$GP') > -1 and data_item.find('*') > -1:
+    def feed(self, size, offset=0):
+        """
+        Process the read buffer from offset up to size, returns the number
+        of bytes which were not padding. Processing stops when the read is
+        finished, the rest of the buffer is processed at the next start
+        """
+        buf = self._read_buf
+        data = size - offset
+        self._offset = size
+        self._size = size
+        i = offset
+        while i < size:
+            if not self._line_len:
+                # Skip to the next sentence, \n are padding of the I2C interface
+                start = _find(buf, b'$', i, size)
+                end = size if start < 0 else start
+                data -= _count(buf, b'\n', i, end)
+                if start < 0:
+                    break
+                i = start
+                first = i + 1
+            else:
+                first = i
+
+            newline = _find(buf, b'\n', i, size)
+            end = size if newline < 0 else newline
+
+            # $ starts a sentence, data before it is a cut sentence
+            start = _find(buf, b'$', first, end)
+            while start >= 0:
+                self.__append(i, start)
+                if not self._overflow:
+                    self.sentences_dropped += 1
+                self._line_len = 0
+                self._overflow = False
+                i = start
+                start = _find(buf, b'$', start + 1, end)
+
+            self.__append(i, end)
+            if newline < 0:
+                break
+
+            i = newline + 1
+            if self._overflow or self._line[self._line_len - 1] == 0x0D:
+                self.__line_complete()
+                if self.__finished:
+                    self._offset = i
+                    return data - (size - i)
+            else:
+                # Padding within a sentence which the receiver has not
+                # finished writing, up to the next data
+                data -= 1
+                while i < size and buf[i] == 0x0A:
+                    data -= 1
+                    i += 1
+
+        return data
+
+    def __append(self, start, end):
+        """
+        Append the read buffer from start up to end to the line, the data
+        beyond NMEA_MAX_LENGTH overflows the line
+        """
+        length = min(end - start, NMEA_MAX_LENGTH - self._line_len)
+        if length < end - start:
+            self._overflow = True
+        self._line_mv[self._line_len:self._line_len + length] = \
+            self._read_mv[start:start + length]
+        self._line_len += length
+
+    def __line_complete(self):
+        """
+        Hand a \r\n terminated sentence to the sentence handler
+        """
+        length = self._line_len
+        self._line_len = 0
 
-                        # Get segment and check if it has been already seen
-                        segment = data_item.split(',')[0].lstrip('$')
-                        log.debug('Segment [' + segment + '] found')
+        # Padding between sentences
+        if not length:
+            return
 
-                        if not segment in self.segments_parsed:
-                            self.segments_parsed.append(segment)
-                            self.data = self.data + data_item
+        if self._overflow or length < 2 or self._line[length - 1] != 0x0D:
+            self._overflow = False
+            self.sentences_dropped += 1
+            return
 
-                        if all(i in self.segments_parsed for i in gps_segments):
-                            self.__finished = True
-                        else:
-                            time.sleep_ms(2)
+        segment = None
+        if self.sentence_handler:
+            segment = self.sentence_handler(self._line_mv[:length - 1])
+
+        if segment is None:
+            self.sentences_dropped += 1
+            return
+
+        self.sentences_complete += 1
+        log.debug('Segment [' + segment + '] found')
+        if not segment in self.segments_parsed:
+            self.segments_parsed.append(segment)
+
+        sentence_type = segment[2:]
+        if not sentence_type in self.types_parsed:
+            self.types_parsed.append(sentence_type)
+
+        # Check if the required sentences of one fix epoch are complete
+        if self._required and sentence_type in self._required:
+            self._epochs[sentence_type] = self._epoch() if self._epoch else None
+
+            if len(self._epochs) == len(self._required):
+                epochs = list(self._epochs.values())
+                if all(e == epochs[0] for e in epochs):
+                    self.complete = True
+                    self.__finished = True
 
     def __uart_read_data(self, uart):
         """
-        Read the data via UART
+        Read the data via UART into the read buffer
         """
-        return uart.readall()
+        return uart.readinto(self._read_buf) or 0
 
     def __i2c_read_data(self, i2c):
         """
-        Read the data via i2c (255 bytes)
+        Read the data via i2c (255 bytes) into the read buffer
         """
-        return i2c.readfrom(GPS_I2CADDR, 255)
+        i2c.readfrom_into(GPS_I2CADDR, self._read_buf)
+        return GPS_READ_SIZE
+
 
-    def __stop(self, alarm):
-        if alarm:
-            log.debug('Data reader timeout')
-            self.__finished = True
+class Fix(object):
+    """
+    Snapshot of the GPS values after a read, replaced as a whole so readers
+    never see values of different fixes
+    """
+
+    def __init__(self, parser, valid=False, ticks=None):
+        """
+        Take the snapshot from the parser
+        """
+        self.latitude = parser.latitude
+        self.longitude = parser.longitude
+        self.coords_valid = valid and self.latitude[0] != 0 and self.longitude[0] != 0
+        self.lat = -self.latitude[0] if self.latitude[1] == 'S' else self.latitude[0]
+        self.lon = -self.longitude[0] if self.longitude[1] == 'W' else self.longitude[0]
+        self.valid = valid           # All required or all segments found in the read
+        self.ticks = ticks           # Ticks of the read, None when not valid
+        self.altitude = parser.altitude
+        self.speed = parser.speed
+        self.course = parser.course
+        self.direction = parser.compass_direction()
+        self.hdop = parser.hdop
+        self.satellites_in_use = parser.satellites_in_use
+        self.date = parser.date
+        self.timestamp = parser.timestamp
+
+
+class GPSService(object):
+    """
+    Reads the GPS continuously in a background thread and keeps the latest
+    fix and a small history of complete fixes
+    """
+
+    def __init__(self, gps, history=10, interval=1000):
+        """
+        Initialize the service for the GPS, interval is the minimal time
+        in ms between the start of two reads
+        """
+        self.gps = gps
+        self.interval = interval
+        self.latest = None
+        self.running = False
+        self._history = [None] * history
+        self._index = 0
+
+    def start(self):
+        """
+        Start reading in the background
+        """
+        if not self.running:
+            self.running = True
+            _thread.start_new_thread(self._run, ())
+
+    def stop(self):
+        """
+        Stop reading after the current read
+        """
+        self.running = False
+
+    def history(self):
+        """
+        Return the fixes in the history, oldest first
+        """
+        size = len(self._history)
+        fixes = [self._history[(self._index + i) % size] for i in range(size)]
+        return [fix for fix in fixes if fix is not None]
+
+    def _run(self):
+        """
+        Read the GPS until stopped
+        """
+        while self.running:
+            start = time.ticks_ms()
+            try:
+                fix = self.gps.read()
+            except Exception as e:
+                log.error('GPS read failed {}', e)
+                fix = None
+
+            if fix is not None:
+                if fix.valid:
+                    self._history[self._index] = fix
+                    self._index = (self._index + 1) % len(self._history)
+                self.latest = fix
+
+            wait = self.interval - time.ticks_diff(time.ticks_ms(), start)
+            if wait > 0:
+                time.sleep_ms(wait)
 
 
 class GPS(object):
     """
-    Class for retrieving and processing the GPS data
+    Class for retrieving and processing the GPS data.
+    Any object with readinto(), like a file with recorded NMEA data, can be
+    used as uart
     """
 
-    def __init__(self, i2c=None, uart=None, timeout=5, gps_segments=SUPPORTED_GPS_SEGMENTS):
+    def __init__(self, i2c=None, uart=None, timeout=5, gps_segments=SUPPORTED_GPS_SEGMENTS,
+                 required_sentences=GPS_REQUIRED_SENTENCES, receiver=None, hot_start=False):
         """
-        Initialize the GPS module on the specified portions
+        Initialize the GPS module on the specified portions.
+        Reading ends as soon as the required sentences of one fix epoch are
+        parsed, use None to wait for all gps_segments.
+        With hot_start the last saved fix and the current time are sent to
+        the receiver type (RECEIVER_MTK, RECEIVER_UBLOX or RECEIVER_UBLOX_M8)
         """
         self.__uart = uart
         self.__i2c = i2c
         self.__parser = MicropyGPS(location_formatting='dd')
         self.is_running = False
-        self.coords_valid = False    # Coordinates found
-        self.is_valid = False        # All segments found
+        self.coords_valid = False    # Coordinates found in the last read
+        self.is_valid = False        # All required or all segments found
         self.__timeout = timeout     # Data reader timeout in seconds
         self.__gps_segments = gps_segments
+        self.__required = required_sentences
+        self.__reader = DataReader(sentence_handler=self.__parser.update_sentence)
+        self.__fix = Fix(self.__parser)
+        self.__service = None
+        self.fix_ticks = None        # Ticks of the last valid coordinates
+        self.receiver = receiver
+        self.ttff_ms = None          # Time to first fix
+        self.__start_ticks = time.ticks_ms()
+        self.__saved_ticks = None
+
+        if hot_start:
+            self.assist()
+
+    def send(self, command):
+        """
+        Send a command to the receiver
+        """
+        if self.__i2c:
+            self.__i2c.writeto(GPS_I2CADDR, command)
+        if self.__uart:
+            self.__uart.write(command)
 
-    def update(self):
+    def assist(self):
+        """
+        Send the last saved fix and the current time to the receiver for a
+        faster first fix. Returns if assistance was sent
+        """
+        last_fix = load_last_fix()
+        if last_fix is None or time.time() < MIN_VALID_TIME:
+            return False
+
+        latitude, longitude, altitude, fix_time, hdop, satellites = last_fix
+        utc = time.gmtime()[:6]
+        log.info('GPS assistance with fix of {}s ago (hdop {}, {} satellites)',
+                 int(time.time()) - fix_time, hdop, satellites)
+
+        if self.receiver == RECEIVER_MTK:
+            self.send(ingpscmd.pmtk_reference_position_time(latitude, longitude, altitude, utc))
+        elif self.receiver == RECEIVER_UBLOX:
+            self.send(ingpscmd.ubx_aid_ini(latitude, longitude, altitude, utc))
+        elif self.receiver == RECEIVER_UBLOX_M8:
+            self.send(ingpscmd.ubx_mga_ini_time_utc(utc))
+            self.send(ingpscmd.ubx_mga_ini_pos_llh(latitude, longitude, altitude))
+        else:
+            return False
+
+        return True
+
+    def start_service(self, history=10, interval=1000):
+        """
+        Read the GPS in the background, update() then takes the latest fix
+        """
+        if self.__service is None:
+            self.__service = GPSService(self, history=history, interval=interval)
+        self.__service.start()
+
+    def stop_service(self):
+        """
+        Stop reading the GPS in the background
+        """
+        if self.__service:
+            self.__service.stop()
+
+    @property
+    def service(self):
         """
-        Update the GPS values
+        Return the background service or None
         """
-        log.info('Start reading the GPS values')
-        self.is_running = True
+        return self.__service
 
-        datareader = DataReader()
+    def read(self):
+        """
+        Read the GPS data and return the new fix
+        """
+        datareader = self.__reader
         datareader.start(i2c=self.__i2c, uart=self.__uart, timeout=self.__timeout,
-                         gps_segments=self.__gps_segments)
+                         gps_segments=self.__gps_segments,
+                         required=self.__required, epoch=self.__fix_epoch)
+
+        log.debug('GPS read in {}ms ({} reads, {}us on the bus, timeout {})',
+                  datareader.read_time_ms, datareader.reads,
+                  datareader.read_us, datareader.timed_out)
 
-        self.coords_valid = False
-        if all(i in datareader.segments_parsed for i in self.__gps_segments):
-            self.is_valid = True
+        # Only a fix parsed during this read is stamped, after a timeout the
+        # parser still holds the values of an older fix
+        valid = datareader.complete
+        return Fix(self.__parser, valid=valid, ticks=timebase.stamp() if valid else None)
 
-        for c in datareader.data:
-            self.__parser.update(str(c))
+    def update(self):
+        """
+        Update the GPS values, with the background service running this
+        takes the latest fix without reading
+        """
+        if self.__service and self.__service.running:
+            fix = self.__service.latest
+            if fix is None:
+                log.info('No GPS fix read in the background yet')
+                return
+        else:
+            log.info('Start reading the GPS values')
+            self.is_running = True
+            fix = self.read()
+            self.is_running = False
+
+        self.__fix = fix
+        self.is_valid = fix.valid
+        self.coords_valid = fix.coords_valid
 
         # Check if we found coords
-        if self.__parser.latitude[0] != 0 and \
-           self.__parser.longitude[0] != 0:
+        if fix.coords_valid:
             log.debug('Found coordinates')
-            self.coords_valid = True
+            self.fix_ticks = fix.ticks
 
-        self.is_running = False
+            if self.ttff_ms is None:
+                self.ttff_ms = time.ticks_diff(fix.ticks, self.__start_ticks)
+                log.info('GPS time to first fix {}ms', self.ttff_ms)
+
+            # Keep the last fix for assistance after a reset
+            if fix.valid and (self.__saved_ticks is None or
+                              time.ticks_diff(fix.ticks, self.__saved_ticks) > GPS_FIX_SAVE_INTERVAL):
+                save_last_fix(fix)
+                self.__saved_ticks = fix.ticks
+
+    def __fix_epoch(self):
+        """
+        Return the UTC time of the last parsed sentence
+        """
+        return self.__parser.timestamp
+
+    @property
+    def reader(self):
+        """
+        Return the data reader with the timing of the last read
+        """
+        return self.__reader
+
+    @property
+    def fix(self):
+        """
+        Return the fix of the last update
+        """
+        return self.__fix
 
     @property
     def latitude(self):
         """
         Return latitude
         """
-        return self.__parser.latitude
+        return self.__fix.latitude
 
     @property
     def longitude(self):
         """
         Return longitude
         """
-        return self.__parser.longitude
+        return self.__fix.longitude
+
+    @property
+    def datetime(self):
+        """
+        Return the UTC (year, month, day, hours, minutes, seconds) of the
+        last sentence with a date or None
+        """
+        day, month, year = self.__fix.date
+        if not day:
+            return None
+
+        hours, minutes, seconds = self.__fix.timestamp
+        return (2000 + year, month, day, hours, minutes, int(seconds))
 
     @property
     def timestamp_utc(self):
         """ Return timestamp """
-        return "20{0}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:.0f}Z".format(self.__parser.date[2],
-                                                                       self.__parser.date[1],
-                                                                       self.__parser.date[0],
-                                                                       self.__parser.timestamp[0],
-                                                                       self.__parser.timestamp[1],
-                                                                       self.__parser.timestamp[2])
+        return "20{0}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:.0f}Z".format(self.__fix.date[2],
+                                                                       self.__fix.date[1],
+                                                                       self.__fix.date[0],
+                                                                       self.__fix.timestamp[0],
+                                                                       self.__fix.timestamp[1],
+                                                                       self.__fix.timestamp[2])
 
     def speed(self, unit='kph'):
         """
@@ -199,24 +672,24 @@ class GPS(object):
         """
 
         if unit == 'mph':
-            return self.__parser.speed[1]
+            return self.__fix.speed[1]
 
         if unit == 'knot':
-            return self.__parser.speed[0]
+            return self.__fix.speed[0]
 
-        return self.__parser.speed[2]
+        return self.__fix.speed[2]
 
     @property
     def altitude(self):
         """ Altitude """
-        return self.__parser.altitude
+        return self.__fix.altitude
 
     @property
     def course(self):
         """ Actual course """
-        return self.__parser.course
+        return self.__fix.course
 
     @property
     def direction(self):
         """ Direction """
-        return self.__parser.compass_direction()
+        return self.__fix.direction
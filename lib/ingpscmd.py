@@ -0,0 +1,166 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,C0103,R0913
+
+"""
+InnovateNow GPS receiver command encoder.
+Builds PMTK commands for MTK based receivers like the Quectel L76-L and UBX
+messages for u-blox receivers like the NEO-6M, including their checksums.
+"""
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+# UBX message classes and ids
+UBX_SYNC = b'\xb5\x62'
+UBX_AID_INI = (0x0B, 0x01)
+UBX_MGA_INI = (0x13, 0x40)
+UBX_RXM_PMREQ = (0x02, 0x41)
+
+# UBX-AID-INI flags
+AID_INI_POS_VALID = 0x01
+AID_INI_TIME_VALID = 0x02
+AID_INI_LLA = 0x20
+AID_INI_UTC = 0x400
+
+def nmea_checksum(body):
+    """
+    Return the NMEA checksum of the sentence body between $ and *
+    """
+    crc = 0
+    for c in body.encode():
+        crc ^= c
+    return crc
+
+def nmea(body):
+    """
+    Return the complete sentence for the body as bytes
+    """
+    return '${}*{:02X}\r\n'.format(body, nmea_checksum(body)).encode()
+
+def pmtk(command, *fields):
+    """
+    Return a PMTK command with the fields
+    """
+    body = 'PMTK{:03d}'.format(command)
+    for field in fields:
+        body = body + ',' + str(field)
+    return nmea(body)
+
+def pmtk_test():
+    """
+    Test packet, any byte wakes up the receiver from standby
+    """
+    return pmtk(0)
+
+def pmtk_hot_start():
+    """
+    Restart using all available data
+    """
+    return pmtk(101)
+
+def pmtk_standby():
+    """
+    Enter standby mode, any byte sent wakes up the receiver
+    """
+    return pmtk(161, 0)
+
+def pmtk_backup():
+    """
+    Enter backup mode, only a wake up pin or power cycle wakes up the receiver
+    """
+    return pmtk(225, 4)
+
+def pmtk_reference_position_time(latitude, longitude, altitude, utc):
+    """
+    Set the reference position in degrees and meters and the UTC time
+    (year, month, day, hours, minutes, seconds) for a faster fix
+    """
+    return pmtk(741, '{:.6f}'.format(latitude), '{:.6f}'.format(longitude),
+                int(altitude), utc[0], utc[1], utc[2], utc[3], utc[4], utc[5])
+
+def ubx_checksum(data):
+    """
+    Return the 8 bit Fletcher checksum (ck_a, ck_b) of the data
+    """
+    ck_a = 0
+    ck_b = 0
+    for c in data:
+        ck_a = (ck_a + c) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return ck_a, ck_b
+
+def ubx(message, payload=b''):
+    """
+    Return the UBX message (class, id) with the payload
+    """
+    data = struct.pack('<BBH', message[0], message[1], len(payload)) + payload
+    ck_a, ck_b = ubx_checksum(data)
+    return UBX_SYNC + data + bytes([ck_a, ck_b])
+
+def ubx_aid_ini(latitude, longitude, altitude, utc, position_accuracy=10000,
+                time_accuracy=10000):
+    """
+    UBX-AID-INI with the position in degrees and meters, the UTC time
+    (year, month, day, hours, minutes, seconds), the position accuracy in cm
+    and the time accuracy in ms
+    """
+    flags = AID_INI_POS_VALID | AID_INI_TIME_VALID | AID_INI_LLA | AID_INI_UTC
+    date = (utc[0] - 2000) * 100 + utc[1]
+    day_time = utc[2] * 1000000 + utc[3] * 10000 + utc[4] * 100 + utc[5]
+    payload = struct.pack('<iiiIHHIiIIiII',
+                          int(latitude * 10000000), int(longitude * 10000000),
+                          int(altitude * 100), position_accuracy,
+                          0, date, day_time, 0, time_accuracy, 0, 0, 0, flags)
+    return ubx(UBX_AID_INI, payload)
+
+def ubx_mga_ini_pos_llh(latitude, longitude, altitude, position_accuracy=10000):
+    """
+    UBX-MGA-INI-POS_LLH with the position in degrees and meters and the
+    accuracy in cm
+    """
+    payload = struct.pack('<BBHiiiI', 0x01, 0, 0,
+                          int(latitude * 10000000), int(longitude * 10000000),
+                          int(altitude * 100), position_accuracy)
+    return ubx(UBX_MGA_INI, payload)
+
+def ubx_mga_ini_time_utc(utc, time_accuracy=10):
+    """
+    UBX-MGA-INI-TIME_UTC with the UTC time (year, month, day, hours,
+    minutes, seconds) and the accuracy in seconds
+    """
+    payload = struct.pack('<BBBbHBBBBBBIHHI', 0x10, 0, 0, -128,
+                          utc[0], utc[1], utc[2], utc[3], utc[4], utc[5], 0,
+                          0, time_accuracy, 0, 0)
+    return ubx(UBX_MGA_INI, payload)
+
+def ubx_rxm_pmreq(duration_ms=0):
+    """
+    UBX-RXM-PMREQ backup mode for the duration, 0 is until woken up
+    """
+    return ubx(UBX_RXM_PMREQ, struct.pack('<II', duration_ms, 2))
+
+def ubx_wake():
+    """
+    Dummy bytes, activity on the port wakes up a receiver in backup mode.
+    The receiver misses the bytes while it starts
+    """
+    return b'\xff' * 8
@@ -0,0 +1,204 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,C0103
+
+"""
+InnovateNow GPS power management
+"""
+import time
+
+import ingpscmd
+from ingeo import distance
+from ingps import RECEIVER_UBLOX, RECEIVER_UBLOX_M8
+
+import inlogging as logging
+log = logging.getLogger(__name__)
+
+# Receiver currents in mA for the energy estimate
+ACTIVE_CURRENT = 20.0
+SLEEP_CURRENT = 0.5
+
+# Milliseconds a u-blox receiver needs to start after waking up from backup
+UBLOX_WAKE_TIME = 100
+
+
+class LIS2HH12Motion(object):
+    """
+    Motion input of a LIS2HH12 accelerometer (Pytrack). A motion input has
+    moved() returning if the device moved since the last call
+    """
+
+    def __init__(self, accelerometer, threshold=0.05):
+        """
+        Initialize with the accelerometer and the change in g seen as motion
+        """
+        self.accelerometer = accelerometer
+        self.threshold = threshold
+        self.__last = None
+
+    def moved(self):
+        """
+        Return if the acceleration changed more than the threshold
+        """
+        acceleration = self.accelerometer.acceleration()
+        last = self.__last
+        self.__last = acceleration
+        if last is None:
+            return False
+
+        return max(abs(acceleration[i] - last[i]) for i in range(3)) > self.threshold
+
+
+class GPSPowerManager(object):
+    """
+    Decides each cycle whether to read the GPS. While the device does not
+    move the number of skipped cycles doubles up to max_skip and the receiver
+    sleeps between reads. Motion, a displacement or a speed above the
+    thresholds reads every cycle again
+    """
+
+    def __init__(self, gps, motion=None, max_skip=10, displacement=25, speed=2.0,
+                 cycle_ms=60000):
+        """
+        Initialize for the GPS, displacement in meters, speed in kph and
+        cycle_ms the expected duration of a cycle
+        """
+        self.gps = gps
+        self.motion = motion
+        self.max_skip = max_skip
+        self.displacement = displacement
+        self.speed = speed
+        self.cycle_ms = cycle_ms
+
+        self.reads = 0               # Cycles with a GPS read
+        self.skips = 0               # Cycles without a GPS read
+        self.sleeps = 0              # Times the receiver was put to sleep
+        self.sleep_ms = 0            # Total time the receiver slept
+        self.read_ms = 0             # Total time of blocking reads
+
+        self.__skip = 0              # Cycles to skip after the last read
+        self.__skipped = 0
+        self.__last = None           # Position of the last read
+        self.__sleep_ticks = None    # Ticks the receiver went to sleep
+        self.__service = False       # Background reader stopped for sleep
+
+    def should_read(self):
+        """
+        Return if the GPS should be read this cycle, the receiver is woken up
+        so it can track during the rest of the cycle
+        """
+        moving = self.motion is not None and self.motion.moved()
+        if moving:
+            self.__skip = 0
+
+        if self.__skipped >= self.__skip:
+            self.__skipped = 0
+            self.wake()
+            return True
+
+        self.__skipped += 1
+        self.skips += 1
+        return False
+
+    def read_done(self):
+        """
+        Check the movement of the last read and sleep while static
+        """
+        self.reads += 1
+        service = self.gps.service
+        if service is None or not service.running:
+            self.read_ms += self.gps.reader.read_time_ms
+
+        moved = True
+        fix = self.gps.fix
+        if fix is not None and fix.coords_valid:
+            moved = fix.speed[2] > self.speed
+            if self.__last is not None:
+                moved = moved or distance(self.__last[0], self.__last[1],
+                                          fix.lat, fix.lon) > self.displacement
+            self.__last = (fix.lat, fix.lon)
+
+        if moved:
+            self.__skip = 0
+        else:
+            self.__skip = min(max(1, self.__skip * 2), self.max_skip)
+            self.sleep()
+
+    def sleep(self):
+        """
+        Put the receiver to sleep until the next read
+        """
+        if self.__sleep_ticks is not None:
+            return
+
+        service = self.gps.service
+        if service is not None and service.running:
+            self.gps.stop_service()
+            self.__service = True
+
+        if self.gps.receiver in (RECEIVER_UBLOX, RECEIVER_UBLOX_M8):
+            # Wakes up by itself just before the next read
+            self.gps.send(ingpscmd.ubx_rxm_pmreq(max(self.__skip * self.cycle_ms - 1000, 1000)))
+        else:
+            self.gps.send(ingpscmd.pmtk_standby())
+
+        log.debug('GPS sleeps for {} cycles', self.__skip)
+        self.sleeps += 1
+        self.__sleep_ticks = time.ticks_ms()
+
+    def wake(self):
+        """
+        Wake up the receiver
+        """
+        if self.__sleep_ticks is None:
+            return
+
+        if self.gps.receiver in (RECEIVER_UBLOX, RECEIVER_UBLOX_M8):
+            # Still in backup when woken up before the requested duration,
+            # like after motion
+            self.gps.send(ingpscmd.ubx_wake())
+            time.sleep_ms(UBLOX_WAKE_TIME)
+        else:
+            self.gps.send(ingpscmd.pmtk_test())
+
+        self.sleep_ms += time.ticks_diff(time.ticks_ms(), self.__sleep_ticks)
+        self.__sleep_ticks = None
+
+        if self.__service:
+            self.gps.service.latest = None   # Do not use a fix from before the sleep
+            self.gps.start_service()
+            self.__service = False
+
+    @property
+    def saved_ms(self):
+        """
+        Return the estimated read time saved by skipped cycles
+        """
+        if not self.reads:
+            return 0
+
+        return self.skips * self.read_ms // self.reads
+
+    @property
+    def saved_mah(self):
+        """
+        Return the estimated receiver energy saved by sleeping
+        """
+        return self.sleep_ms * (ACTIVE_CURRENT - SLEEP_CURRENT) / 3600000
@@ -0,0 +1,153 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,C0103
+
+"""
+InnovateNow I2C
+"""
+import time
+import _thread
+
+# Initialize logging
+import inlogging as logging
+log = logging.getLogger(__name__)
+
+I2C_RETRIES = 2              # Retries of a transaction after a NACK
+I2C_BACKOFF = 2              # Milliseconds before the first retry, doubles
+
+
+class DeviceStatistics(object):
+    """
+    Transaction statistics of a device
+    """
+
+    def __init__(self):
+        self.transactions = 0
+        self.errors = 0              # Transactions failed after all retries
+        self.retries = 0
+        self.time_us = 0             # Total time of the transactions
+
+    def __repr__(self):
+        return '{} transactions, {} errors, {} retries, {}us'.format(
+            self.transactions, self.errors, self.retries, self.time_us)
+
+
+class I2CBus(object):
+    """
+    Owns the I2C bus shared by the GPS and the sensors. Transactions of
+    threads and timers are serialized with a lock, retried with backoff
+    after a NACK and counted per device. It has the machine.I2C methods
+    the drivers use, so it can replace the bus for them. Hold lock to keep
+    several transactions together
+    """
+
+    def __init__(self, i2c, retries=I2C_RETRIES, backoff=I2C_BACKOFF):
+        self.i2c = i2c
+        self.retries = retries
+        self.backoff = backoff
+        self.lock = _thread.allocate_lock()
+        self.statistics = dict()     # Statistics per address
+        self.__addresses = None
+
+    def scan(self, refresh=False):
+        """
+        Return the addresses of the devices, scanned once
+        """
+        if self.__addresses is None or refresh:
+            with self.lock:
+                self.__addresses = self.i2c.scan()
+            log.debug('I2C addresses [{}]', self.__addresses)
+
+        return self.__addresses
+
+    def __transaction(self, address, method, args, locked=False):
+        """
+        Run the bus method for the device, locked tells the caller already
+        holds the lock
+        """
+        statistics = self.statistics.get(address)
+        if statistics is None:
+            statistics = self.statistics[address] = DeviceStatistics()
+
+        backoff = self.backoff
+        for attempt in range(self.retries + 1):
+            start = time.ticks_us()
+            try:
+                if locked:
+                    return method(address, *args)
+                with self.lock:
+                    return method(address, *args)
+            except OSError:
+                if attempt == self.retries:
+                    statistics.errors += 1
+                    raise
+                statistics.retries += 1
+            finally:
+                statistics.transactions += 1
+                statistics.time_us += time.ticks_diff(time.ticks_us(), start)
+
+            time.sleep_ms(backoff)
+            backoff *= 2
+
+    def readfrom_mem(self, address, register, size):
+        """
+        Return size bytes read from the register of the device
+        """
+        return self.__transaction(address, self.i2c.readfrom_mem, (register, size))
+
+    def readfrom_mem_into(self, address, register, buf):
+        """
+        Read from the register of the device into the buffer
+        """
+        return self.__transaction(address, self.i2c.readfrom_mem_into, (register, buf))
+
+    def writeto_mem(self, address, register, buf):
+        """
+        Write the buffer to the register of the device
+        """
+        return self.__transaction(address, self.i2c.writeto_mem, (register, buf))
+
+    def readfrom(self, address, size):
+        """
+        Return size bytes read from the device
+        """
+        return self.__transaction(address, self.i2c.readfrom, (size,))
+
+    def readfrom_into(self, address, buf):
+        """
+        Read from the device into the buffer
+        """
+        return self.__transaction(address, self.i2c.readfrom_into, (buf,))
+
+    def writeto(self, address, buf):
+        """
+        Write the buffer to the device
+        """
+        return self.__transaction(address, self.i2c.writeto, (buf,))
+
+    def read_registers(self, address, reads):
+        """
+        Read the (register, buffer) pairs of the device while holding the
+        bus, so no other transaction comes in between
+        """
+        with self.lock:
+            for register, buf in reads:
+                self.__transaction(address, self.i2c.readfrom_mem_into, (register, buf),
+                                   locked=True)
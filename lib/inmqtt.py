@@ -0,0 +1,288 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=C0103
+
+"""
+InnovateNow MQTT publish pipeline.
+Keeps several QoS 1 PUBLISH packets in flight on the connection of the MQTT
+client. The packets are encoded here and handed to the send queue of the
+message handler, the PUBACKs are taken from its receive path, so the client
+library does not need an asynchronous publish.
+"""
+import time
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+# Initialize logging
+import inlogging as logging
+log = logging.getLogger(__name__)
+
+# MQTT control packet types and flags
+MQTT_PUBLISH = 0x30
+MQTT_PUBACK = 0x40
+MQTT_DUP = 0x08
+MQTT_QOS1 = 0x02
+MQTT_RETAIN = 0x01
+
+# Packet identifiers of the pipeline. The upper half keeps them apart from
+# the identifiers the MQTT client assigns to its own packets
+PACKET_ID_FIRST = 0x8000
+PACKET_ID_LAST = 0xFFFF
+
+def encode_publish(topic, payload, packet_id, dup=False, retain=False):
+    """
+    Encode a QoS 1 PUBLISH packet
+    """
+    if isinstance(topic, str):
+        topic = topic.encode()
+    if isinstance(payload, str):
+        payload = payload.encode()
+
+    header = MQTT_PUBLISH | MQTT_QOS1
+    if dup:
+        header |= MQTT_DUP
+    if retain:
+        header |= MQTT_RETAIN
+
+    # Remaining length in the variable length encoding
+    size = 2 + len(topic) + 2 + len(payload)
+    packet = bytearray([header])
+    while True:
+        byte = size & 0x7F
+        size >>= 7
+        if size:
+            packet.append(byte | 0x80)
+        else:
+            packet.append(byte)
+            break
+
+    packet.extend(struct.pack('!H', len(topic)))
+    packet.extend(topic)
+    packet.extend(struct.pack('!H', packet_id))
+    packet.extend(payload)
+    return packet
+
+def puback_id(message):
+    """
+    Return the packet identifier of a PUBACK or None for other packets.
+    Accepts the raw packet or a message of the MQTT library which has the
+    packet type and the variable header as payload
+    """
+    if isinstance(message, (bytes, bytearray)):
+        if len(message) == 4 and message[0] == MQTT_PUBACK and message[1] == 2:
+            return struct.unpack('!H', message[2:4])[0]
+        return None
+
+    if getattr(message, 'type', None) != MQTT_PUBACK:
+        return None
+
+    payload = getattr(message, 'payload', None)
+    if payload is None or len(payload) < 2:
+        return None
+    return struct.unpack('!H', bytes(payload[0:2]))[0]
+
+class InflightWindow(object):
+    """
+    Window of outstanding QoS 1 publishes tracked by packet id.
+    Entries complete in publish order; an entry which is not acknowledged
+    within the timeout is sent again with the same packet id until the
+    retries are used up, so a late PUBACK of an earlier attempt still
+    completes it.
+    """
+
+    def __init__(self, size=1, timeout=10, retries=3):
+        """
+        Initialize the in-flight window
+        """
+        self.size = size
+        self.timeout_ms = timeout * 1000
+        self.retries = retries
+        self._pending = []  # [packet_id, topic, payload, first, sent, attempts, acked, callback]
+        self._by_id = dict()
+        self._latency_ms = None  # Send to acknowledge time not yet taken
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, packet_id):
+        return packet_id in self._by_id
+
+    @property
+    def is_full(self):
+        """
+        Return if no more publishes are allowed in flight
+        """
+        return len(self._pending) >= self.size
+
+    def add(self, packet_id, topic, payload, callback=None):
+        """
+        Register a publish which has been sent
+        """
+        now = time.ticks_ms()
+        entry = [packet_id, topic, payload, now, now, 1, False, callback]
+        self._pending.append(entry)
+        self._by_id[packet_id] = entry
+
+    def resent(self, entry):
+        """
+        Register the retransmission of an entry
+        """
+        entry[4] = time.ticks_ms()
+        entry[5] += 1
+
+    def ack(self, packet_id):
+        """
+        Mark the publish with the packet id as acknowledged.
+        Returns False when the packet id is not in flight
+        """
+        entry = self._by_id.pop(packet_id, None)
+        if entry is None:
+            return False
+
+        entry[6] = True
+        # Measured from the first attempt, retransmissions are part of it
+        self._latency_ms = time.ticks_diff(time.ticks_ms(), entry[3])
+        return True
+
+    def take_latency(self):
+        """
+        Return the latency of the last acknowledge since the previous call
+        or None when nothing was acknowledged in between
+        """
+        latency_ms = self._latency_ms
+        self._latency_ms = None
+        return latency_ms
+
+    def expired(self):
+        """
+        Return the unacknowledged entries which passed their timeout
+        """
+        now = time.ticks_ms()
+        return [entry for entry in self._pending
+                if not entry[6] and time.ticks_diff(now, entry[4]) > self.timeout_ms]
+
+    def complete(self):
+        """
+        Remove the finished entries at the head of the window and call
+        their callbacks in publish order
+        """
+        while self._pending:
+            entry = self._pending[0]
+            if entry[6]:
+                succeeded = True
+            elif entry[5] > self.retries and \
+                 time.ticks_diff(time.ticks_ms(), entry[4]) > self.timeout_ms:
+                succeeded = False
+                self._by_id.pop(entry[0], None)
+            else:
+                break
+
+            self._pending.pop(0)
+            if entry[7]:
+                entry[7](entry[2], succeeded)
+
+class PublishPipeline(object):
+    """
+    QoS 1 publisher on a packet send function, like the send queue of the
+    message handler of the MQTT library. Received packets are passed to
+    received() which takes the PUBACKs of the pipeline.
+    """
+
+    def __init__(self, send, size=1, timeout=10, retries=3):
+        """
+        Initialize the pipeline
+        """
+        self._send = send
+        self.window = InflightWindow(size=size, timeout=timeout, retries=retries)
+        self._packet_id = PACKET_ID_LAST
+
+    def _next_packet_id(self):
+        """
+        Return the next packet identifier which is not in flight
+        """
+        while True:
+            self._packet_id += 1
+            if self._packet_id > PACKET_ID_LAST:
+                self._packet_id = PACKET_ID_FIRST
+            if self._packet_id not in self.window:
+                return self._packet_id
+
+    def publish(self, topic, payload, callback=None, timeout=None):
+        """
+        Send the publish when there is room in the window.
+        Returns False when the window stayed full for the timeout in seconds
+        """
+        start = time.ticks_ms()
+        while True:
+            self.service()
+            if not self.window.is_full:
+                break
+            if timeout is not None and \
+               time.ticks_diff(time.ticks_ms(), start) > timeout * 1000:
+                return False
+            time.sleep_ms(10)
+
+        # Registered first, the PUBACK can arrive before the send returns
+        packet_id = self._next_packet_id()
+        self.window.add(packet_id, topic, payload, callback)
+        self._send(encode_publish(topic, payload, packet_id))
+        return True
+
+    def received(self, message):
+        """
+        Take a received packet, returns True when it was a PUBACK of a
+        publish in flight. Other packets are for the MQTT library
+        """
+        packet_id = puback_id(message)
+        if packet_id is None or packet_id < PACKET_ID_FIRST:
+            return False
+
+        return self.window.ack(packet_id)
+
+    def service(self):
+        """
+        Retransmit timed out publishes and complete the acknowledged ones
+        """
+        for entry in self.window.expired():
+            if entry[5] > self.window.retries:
+                continue
+            log.warning('Publish [{}] not acknowledged, retry {}', entry[0], entry[5])
+            self._send(encode_publish(entry[1], entry[2], entry[0], dup=True))
+            self.window.resent(entry)
+
+        self.window.complete()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all publishes in flight are completed.
+        Returns False when the timeout in seconds expired first
+        """
+        start = time.ticks_ms()
+        while len(self.window):
+            self.service()
+            if timeout is not None and \
+               time.ticks_diff(time.ticks_ms(), start) > timeout * 1000:
+                return False
+            time.sleep_ms(10)
+
+        return True
@@ -17,13 +17,65 @@
 # THE SOFTWARE.
 
 # Linter
-# pylint: disable=R0913,R0902,W0622,C0103
+# pylint: disable=R0913,R0902,W0622,W0603,C0103
 
 """
 InnovateNow Message module
 """
 import json
-import time
+
+import innvram
+from intimebase import timebase
+
+# NVRAM keys
+NVRAM_BOOT_ID = 'msg_boot_id'
+NVRAM_SEQUENCE = 'msg_seq'
+
+# Sequence numbers reserved in NVRAM per write
+SEQUENCE_BLOCK = 64
+
+class MessageSequence(object):
+    """
+    Monotonic message sequence number and boot id persisted in NVRAM.
+    Sequence numbers are reserved in blocks so the NVRAM is written once per
+    SEQUENCE_BLOCK messages; after a reset numbering continues after the
+    reserved block and the boot id is incremented.
+    """
+
+    def __init__(self, block=SEQUENCE_BLOCK):
+        """
+        Initialize the sequence and start a new boot
+        """
+        self.block = block
+        self.boot_id = innvram.load(NVRAM_BOOT_ID, 0) + 1
+        innvram.store(NVRAM_BOOT_ID, self.boot_id)
+
+        self._next = innvram.load(NVRAM_SEQUENCE, 0)
+        self._reserved = self._next
+
+    def next(self):
+        """
+        Return the next sequence number
+        """
+        if self._next >= self._reserved:
+            self._reserved = self._next + self.block
+            innvram.store(NVRAM_SEQUENCE, self._reserved)
+
+        seq = self._next
+        self._next += 1
+        return seq
+
+_sequence = None
+
+def next_sequence():
+    """
+    Return the boot id and the next message sequence number
+    """
+    global _sequence
+    if _sequence is None:
+        _sequence = MessageSequence()
+    return _sequence.boot_id, _sequence.next()
+
 
 class Message(object):
     """
@@ -54,10 +106,16 @@ class GPSMessage(Message):
     GPS message
     """
     def __init__(self, id=None, latitude=None, longitude=None, speed=None,
-                 course=None, altitude=None, direction=None):
+                 course=None, altitude=None, direction=None, accuracy=None, ticks=None,
+                 zones=None, zone_events=None):
 
         super(GPSMessage, self).__init__()
 
+        self.ticks = ticks
+        self.accuracy = accuracy
+        self.zones = zones
+        self.zone_events = zone_events
+
         self.id = id
         self.latitude = latitude
         self.longitude = longitude
@@ -93,6 +151,19 @@ class GPSMessage(Message):
         if self.altitude:
             self.message['altitude'] = self.altitude
 
+        if self.accuracy is not None:
+            self.message['accuracy'] = round(self.accuracy, 1)
+
+        if self.zones is not None:
+            self.message['zones'] = list(self.zones)
+
+        if self.zone_events:
+            self.message['zoneEvents'] = [{'event': event, 'zone': zone}
+                                          for event, zone in self.zone_events]
+
+        if self.ticks is not None:
+            self.message['timeMs'] = timebase.to_utc_ms(self.ticks)
+
         return self.message
 
 
@@ -101,10 +172,15 @@ class EnvironMessage(Message):
     Environmental messge
     """
     def __init__(self, id=None, temperature=None, humidity=None,\
-                 barometric_pressure=None):
+                 barometric_pressure=None, ticks=None, statistics=None, lux=None):
 
         super(EnvironMessage, self).__init__()
 
+        self.lux = lux
+
+        self.ticks = ticks
+        self.statistics = statistics
+
         self.id = id
         self.temperature = temperature
         self.humidity = humidity
@@ -128,6 +204,16 @@ class EnvironMessage(Message):
         if self.barometric_pressure:
             self.message['barometricPressure'] = round(self.barometric_pressure, 0)
 
+        if self.lux is not None:
+            self.message['lux'] = round(self.lux, 1)
+
+        if self.statistics:
+            for name in self.statistics:
+                self.message[name + 'Stats'] = self.statistics[name].to_dict()
+
+        if self.ticks is not None:
+            self.message['timeMs'] = timebase.to_utc_ms(self.ticks)
+
         return self.message
 
 class AliveMessage(Message):
@@ -143,6 +229,8 @@ class AliveMessage(Message):
 
         self.customer = customer
         self.device_id = device_id
+        self.boot_id, self.seq = next_sequence()
+        self.ticks = timebase.stamp()
 
     def to_dict(self):
         """
@@ -152,7 +240,9 @@ class AliveMessage(Message):
 
         self.message['customer'] = self.customer
         self.message['devId'] = self.device_id
-        self.message['time'] = time.time()
+        self.message['bootId'] = self.boot_id
+        self.message['seq'] = self.seq
+        self.message['time'] = timebase.to_utc(self.ticks)
 
         return self.message
 
@@ -162,7 +252,8 @@ class AWSMessage(Message):
     """
 
     def __init__(self, customer=None, device_id=None,\
-                 environ_message=None, gps_message=None, beacons=None, tags=None):
+                 environ_message=None, gps_message=None, beacons=None, tags=None,
+                 beacon_ticks=None, tag_ticks=None):
         """
         Initialize AWS message
         """
@@ -174,6 +265,10 @@ class AWSMessage(Message):
         self.gps_message = gps_message
         self.beacons = beacons
         self.tags = tags
+        self.beacon_ticks = beacon_ticks
+        self.tag_ticks = tag_ticks
+        self.boot_id, self.seq = next_sequence()
+        self.ticks = timebase.stamp()
 
     def to_dict(self):
         """
@@ -183,7 +278,9 @@ class AWSMessage(Message):
 
         self.message['customer'] = self.customer
         self.message['devId'] = self.device_id
-        self.message['time'] = time.time()
+        self.message['bootId'] = self.boot_id
+        self.message['seq'] = self.seq
+        self.message['time'] = timebase.to_utc(self.ticks)
 
         self.message['sensors'] = list()
 
@@ -195,8 +292,12 @@ class AWSMessage(Message):
 
         if self.beacons:
             self.message['beacons'] = self.beacons
+            if self.beacon_ticks:
+                self.message['beaconTimesMs'] = [timebase.to_utc_ms(t) for t in self.beacon_ticks]
 
         if self.tags:
             self.message['tags'] = self.tags
+            if self.tag_ticks:
+                self.message['tagTimesMs'] = [timebase.to_utc_ms(t) for t in self.tag_ticks]
 
         return self.message
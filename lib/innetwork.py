@@ -17,7 +17,7 @@
 # THE SOFTWARE.
 
 # Linter
-# pylint: disable=E0401,C0103,R0903
+# pylint: disable=E0401,C0103,R0903,R0902,W0703
 
 """
 InnovateNow Core Network Library
@@ -25,27 +25,112 @@ InnovateNow Core Network Library
 
 import sys
 import time
-import machine
 
-from network import WLAN
+try:
+    import machine
+    from network import WLAN
+except ImportError:
+    machine = None
+    WLAN = None
+
+import innvram
+from intimer import Timer, Deadline
 
 # Initialize logging
 import inlogging as logging
 log = logging.getLogger(__name__)
 
+# NVRAM keys of the cached access point
+NVRAM_WLAN_SSID = 'wlan_ssid'
+NVRAM_WLAN_BSSID_HI = 'wlan_bssid_hi'
+NVRAM_WLAN_BSSID_LO = 'wlan_bssid_lo'
+NVRAM_WLAN_CHANNEL = 'wlan_channel'
+NVRAM_WLAN_SEC = 'wlan_sec'
+
+# Timeout in ms for joining the network
+WLAN_CONNECT_TIMEOUT = 10000
+
+# Timeout in ms for the whole connect phase, every join gets the time left
+WLAN_CONNECT_PHASE_TIMEOUT = 30000
+
+# Timeout in ms for joining the cached access point before scanning
+WLAN_FAST_CONNECT_TIMEOUT = 5000
+
+# Roaming thresholds, a roam is requested after WLAN_ROAM_CHECKS consecutive
+# link checks below the RSSI or publishes above the latency
+WLAN_ROAM_RSSI_THRESHOLD = -80      # dBm
+WLAN_ROAM_LATENCY_THRESHOLD = 5000  # ms
+WLAN_ROAM_CHECK_SECONDS = 60
+WLAN_ROAM_CHECKS = 3
+
+# Timeout in seconds for the NTP synchronization
+NTP_SYNC_TIMEOUT = 30
+
+# Failure reasons
+REASON_NO_ACCESS_POINT = 'no_access_point'
+REASON_JOIN_TIMEOUT = 'join_timeout'
+REASON_NTP_TIMEOUT = 'ntp_timeout'
+
+class NetworkError(IOError):
+    """
+    Network failure with the reason and the phase duration in ms
+    """
+
+    def __init__(self, message, reason=None, elapsed_ms=None):
+        super(NetworkError, self).__init__(message)
+        self.reason = reason
+        self.elapsed_ms = elapsed_ms
+
+def ssid_hash(ssid):
+    """
+    Return a 32 bit FNV-1a hash of the SSID
+    """
+    value = 0x811C9DC5
+    for c in ssid.encode():
+        value = ((value ^ c) * 0x01000193) & 0xFFFFFFFF
+    return value
+
 class WLANNetwork(object):
     """
-    Class manage the WLAN network
+    Class manage the WLAN network.
+    The network is selected from a list of (ssid, key, priority) profiles,
+    scan results are ranked on priority and signal strength.
     """
 
-    def __init__(self, ssid=None, key=None, antenna=WLAN.INT_ANT):
+    def __init__(self, ssid=None, key=None, antenna=None, profiles=None,
+                 min_rssi=WLAN_ROAM_RSSI_THRESHOLD, max_latency=WLAN_ROAM_LATENCY_THRESHOLD,
+                 connect_timeout=WLAN_CONNECT_TIMEOUT,
+                 phase_timeout=WLAN_CONNECT_PHASE_TIMEOUT, feed=None):
         """
-        Initialization of the WLAN network
+        Initialization of the WLAN network, feed is called while waiting
+        for the connection to keep the watchdog alive. connect_timeout
+        bounds a join and phase_timeout all joins of a connect
         """
-        self.ssid = ssid
-        self.key = key
+        if antenna is None:
+            antenna = WLAN.INT_ANT
+        if profiles is None:
+            profiles = [(ssid, key, 0)]
+
+        self.profiles = profiles
+        self.ssid = profiles[0][0]   # SSID of the current connection
+        self.key = profiles[0][1]
+        self.bssid = None
         self.antenna = antenna
         self.wlan = None
+        self.connect_time_ms = None  # Duration of the last connect
+        self.fast_connect = False    # Last connect used the cached access point
+        self.connect_timeout = connect_timeout
+        self.phase_timeout = phase_timeout
+        self.feed = feed
+
+        # Link quality monitoring
+        self.min_rssi = min_rssi
+        self.max_latency = max_latency
+        self.rssi = None
+        self.roam_requested = False
+        self._weak_checks = 0
+        self._slow_publishes = 0
+        self._monitor = None
 
     @property
     def is_connected(self):
@@ -54,35 +139,211 @@ class WLANNetwork(object):
         """
         return self.wlan.isconnected()
 
-    def connect(self):
+    def connect(self, use_cache=True):
         """
-        Establish a WLAN connection to the specified SSID
+        Establish a WLAN connection to the best available profile
         """
-        log.info('Connect to WLAN [' + self.ssid + ']')
+        log.info('Connect to WLAN [' + ','.join([p[0] for p in self.profiles]) + ']')
 
         if self.wlan is None:
+            phase = Deadline(self.phase_timeout)
+            self.fast_connect = False
 
             # Init WLAN
             wlan = WLAN(mode=WLAN.STA, antenna=self.antenna)
 
-            # Scan for available accesspoints
-            nets = wlan.scan()
+            # Try the access point of the last connection without scanning
+            cached = self._load_access_point() if use_cache else None
+            if cached:
+                profile, bssid, channel, sec = cached
+                log.info('Connect to cached access point of [{}] on channel {}',
+                         profile[0], channel)
+                if self._join(wlan, profile, sec, bssid,
+                              min(WLAN_FAST_CONNECT_TIMEOUT, phase.remaining)):
+                    self.wlan = wlan
+                    self.fast_connect = True
+                else:
+                    log.info('Cached access point not available, scanning')
+                    wlan.disconnect()
+
+            reason = REASON_NO_ACCESS_POINT
+            if self.wlan is None and not phase.expired:
 
-            for net in nets:
-                if net.ssid == self.ssid:
+                # Scan for available accesspoints and try the best first
+                for profile, net in self.rank(wlan.scan()):
+                    if phase.expired:
+                        log.warning('WLAN connect phase timeout, remaining access points skipped')
+                        break
 
                     # Connect to the network
-                    wlan.connect(self.ssid, (net.sec, self.key), timeout=10000)
-                    while not wlan.isconnected():
-                        machine.idle() # Save power while waiting
+                    if self._join(wlan, profile, net.sec, net.bssid,
+                                  min(self.connect_timeout, phase.remaining)):
+                        self.wlan = wlan
+                        self.rssi = net.rssi
+                        self._store_access_point(net.bssid, net.channel, net.sec)
+                        break
 
-                    self.wlan = wlan
-                    log.debug("ipconfig:" + str(self.wlan.ifconfig()))
-                    break
+                    reason = REASON_JOIN_TIMEOUT
+                    wlan.disconnect()
+
+            if self.wlan is None and phase.expired:
+                reason = REASON_JOIN_TIMEOUT
+            self.connect_time_ms = phase.elapsed
 
             if self.wlan is None:
-                log.error('Error establishing connection to wlan [' + self.ssid + ']')
-                raise IOError('Network connection to wlan [' + self.ssid + '] failed')
+                log.error('Error establishing connection to wlan [{}]', reason)
+                raise NetworkError('Network connection to wlan failed', reason,
+                                   self.connect_time_ms)
+
+            self.roam_requested = False
+            self._weak_checks = 0
+            self._slow_publishes = 0
+            log.info('WLAN [{}] connected in {}ms (cached access point: {})',
+                     self.ssid, self.connect_time_ms, self.fast_connect)
+            log.debug("ipconfig:" + str(self.wlan.ifconfig()))
+
+    def rank(self, nets):
+        """
+        Return (profile, net) for the scan results matching a profile, best
+        first. Access points above the minimum RSSI go first, then the
+        highest priority and the strongest signal
+        """
+        candidates = []
+        for net in nets:
+            for profile in self.profiles:
+                if net.ssid == profile[0]:
+                    candidates.append((net.rssi >= self.min_rssi, profile[2], net.rssi,
+                                       profile, net))
+                    break
+
+        candidates.sort(key=lambda c: (c[0], c[1], c[2]), reverse=True)
+        return [(c[3], c[4]) for c in candidates]
+
+    def _join(self, wlan, profile, sec, bssid, timeout):
+        """
+        Join the access point, returns False when not connected within
+        the timeout in ms
+        """
+        self.ssid = profile[0]
+        self.key = profile[1]
+        self.bssid = bssid
+        wlan.connect(self.ssid, (sec, self.key), bssid=bssid, timeout=timeout)
+
+        # Save power while waiting
+        return Deadline(timeout).wait(wlan.isconnected, feed=self.feed)
+
+    def _load_access_point(self):
+        """
+        Return the cached (profile, bssid, channel, sec) or None
+        """
+        cached_ssid = innvram.load(NVRAM_WLAN_SSID)
+        for profile in self.profiles:
+            if cached_ssid == ssid_hash(profile[0]):
+                break
+        else:
+            return None
+
+        hi = innvram.load(NVRAM_WLAN_BSSID_HI)
+        lo = innvram.load(NVRAM_WLAN_BSSID_LO)
+        if hi is None or lo is None:
+            return None
+
+        bssid = bytes([(hi >> 8) & 0xFF, hi & 0xFF,
+                       (lo >> 24) & 0xFF, (lo >> 16) & 0xFF, (lo >> 8) & 0xFF, lo & 0xFF])
+        return profile, bssid, innvram.load(NVRAM_WLAN_CHANNEL), innvram.load(NVRAM_WLAN_SEC)
+
+    def _store_access_point(self, bssid, channel, sec):
+        """
+        Cache the access point in NVRAM for the next connect
+        """
+        innvram.store(NVRAM_WLAN_SSID, ssid_hash(self.ssid))
+        innvram.store(NVRAM_WLAN_BSSID_HI, (bssid[0] << 8) | bssid[1])
+        innvram.store(NVRAM_WLAN_BSSID_LO, (bssid[2] << 24) | (bssid[3] << 16) |
+                      (bssid[4] << 8) | bssid[5])
+        innvram.store(NVRAM_WLAN_CHANNEL, channel)
+        innvram.store(NVRAM_WLAN_SEC, sec)
+
+    def start_monitor(self, seconds=WLAN_ROAM_CHECK_SECONDS):
+        """
+        Check the signal strength of the connection periodically
+        """
+        if self._monitor is None:
+            self._monitor = Timer(seconds, self._check_link, periodic=True)
+
+    def stop_monitor(self):
+        """
+        Stop checking the signal strength
+        """
+        if self._monitor:
+            self._monitor.cancel()
+            self._monitor = None
+
+    def _check_link(self, alarm):
+        """
+        Request a roam when the signal stays below the minimum RSSI
+        """
+        if self.wlan is None or not hasattr(self.wlan, 'joined_ap_info'):
+            return
+
+        try:
+            self.rssi = self.wlan.joined_ap_info()[3]
+        except Exception:
+            return
+
+        if self.rssi < self.min_rssi:
+            self._weak_checks += 1
+            if self._weak_checks >= WLAN_ROAM_CHECKS:
+                log.info('Weak WLAN signal {}dBm, roam requested', self.rssi)
+                self.roam_requested = True
+        else:
+            self._weak_checks = 0
+
+    def report_latency(self, latency_ms):
+        """
+        Report the latency of a publish, consecutive slow publishes
+        request a roam
+        """
+        if latency_ms is None:
+            return
+
+        if latency_ms > self.max_latency:
+            self._slow_publishes += 1
+            if self._slow_publishes >= WLAN_ROAM_CHECKS:
+                log.info('Slow publishes {}ms, roam requested', latency_ms)
+                self.roam_requested = True
+        else:
+            self._slow_publishes = 0
+
+    def roam(self):
+        """
+        Move to a better access point when one is available, when joining
+        it fails the previous access point is joined again.
+        Returns True when the connection changed
+        """
+        self.roam_requested = False
+        self._weak_checks = 0
+        self._slow_publishes = 0
+
+        if self.wlan is None:
+            self.connect()
+            return True
+
+        ranked = self.rank(self.wlan.scan())
+        if not ranked or ranked[0][1].bssid == self.bssid:
+            log.info('No better access point available')
+            return False
+
+        log.info('Roam to [{}] with {}dBm', ranked[0][0][0], ranked[0][1].rssi)
+        self.disconnect()
+        try:
+            self.connect(use_cache=False)
+        except NetworkError as e:
+            # The cached access point is still the one of the previous connection
+            log.warning('Roam failed [{}], back to the previous access point', e.reason)
+            self.connect()
+            return False
+
+        return True
 
     def disconnect(self):
         """
@@ -93,8 +354,8 @@ class WLANNetwork(object):
         if self.wlan:
             if self.wlan.isconnected():
                 self.wlan.disconnect()
-                self.wlan.deinit()
-                self.wlan = None
+            self.wlan.deinit()
+            self.wlan = None
 
     def reconnect(self):
         """
@@ -108,17 +369,40 @@ class NTP(object):
     """
     Class for syncing device time with the NTP
     """
-    def __init__(self, ntp_pool_server='pool.ntp.org'):
+    def __init__(self, ntp_pool_server='pool.ntp.org', timeout=NTP_SYNC_TIMEOUT, feed=None):
         """
-        Initialize time via NTP
+        Initialize time via NTP, feed is called while waiting for the
+        synchronization to keep the watchdog alive
         """
         self.ntp_pool_server = ntp_pool_server
+        self.timeout = timeout
+        self.feed = feed
+        self.rtc = None
+
+    def start(self):
+        """
+        Start the synchronization in the background
+        """
+        self.rtc = machine.RTC()
+        self.rtc.ntp_sync(self.ntp_pool_server, update_period=3600)
+
+    @property
+    def synced(self):
+        """
+        Return if the time is synchronized with NTP
+        """
+        return self.rtc is not None and self.rtc.synced()
 
     def sync(self):
         """
-        Sync with network time
+        Sync with network time, raises NetworkError when the time is not
+        synchronized within the timeout
         """
-        rtc = machine.RTC()
-        rtc.ntp_sync(self.ntp_pool_server, update_period=3600)
-        while not rtc.synced():
-            time.sleep(1)
+        self.start()
+        rtc = self.rtc
+
+        deadline = Deadline(self.timeout * 1000)
+        if not deadline.wait(rtc.synced, feed=self.feed, idle=lambda: time.sleep_ms(100)):
+            log.error('NTP synchronization with [{}] timed out', self.ntp_pool_server)
+            raise NetworkError('NTP synchronization failed', REASON_NTP_TIMEOUT,
+                               deadline.elapsed)
@@ -0,0 +1,88 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,C0103
+
+"""
+InnovateNow non volatile memory module.
+Values are stored as 32 bit integers in the Pycom NVRAM, on other platforms
+they are kept in memory only.
+"""
+try:
+    import pycom
+except ImportError:
+    pycom = None
+
+# Fallback storage when NVRAM is not available
+_memory = dict()
+
+def load(key, default=None):
+    """
+    Return the integer stored under the key or the default
+    """
+    if pycom is None:
+        return _memory.get(key, default)
+
+    try:
+        value = pycom.nvs_get(key)
+    except ValueError:  # Key not found
+        return default
+
+    if value is None:
+        return default
+    return value
+
+def store(key, value):
+    """
+    Store an unsigned integer under the key
+    """
+    if pycom is None:
+        _memory[key] = value
+    else:
+        pycom.nvs_set(key, value)
+
+def load_signed(key, default=None):
+    """
+    Return the signed integer stored under the key or the default
+    """
+    value = load(key)
+    if value is None:
+        return default
+    if value & 0x80000000:
+        return value - 0x100000000
+    return value
+
+def store_signed(key, value):
+    """
+    Store a signed integer under the key
+    """
+    store(key, value & 0xFFFFFFFF)
+
+def erase(key):
+    """
+    Remove the key
+    """
+    if pycom is None:
+        _memory.pop(key, None)
+        return
+
+    try:
+        pycom.nvs_erase(key)
+    except (ValueError, KeyError):
+        pass
@@ -0,0 +1,178 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,E1101,C0103
+
+"""
+InnovateNow position estimator
+"""
+import math
+import time
+
+from ingeo import EARTH_RADIUS
+
+import inlogging as logging
+log = logging.getLogger(__name__)
+
+UERE = 5.0                     # User equivalent range error in meters
+UNKNOWN_HDOP = 10.0            # HDOP used when the receiver reports none
+MIN_GOOD_SATELLITES = 6        # Below this the error grows with fewer satellites
+
+
+class PositionEstimator(object):
+    """
+    Kalman filter for a (nearly) constant position. Each fix is weighted by
+    its HDOP and number of satellites in use, fixes far outside the
+    uncertainty are rejected until max_rejects in a row show the device moved
+    """
+
+    def __init__(self, process_noise=0.5, uere=UERE, gate=3.0, max_rejects=5):
+        """
+        process_noise is the expected movement in m/s, gate the number of
+        standard deviations a fix may differ from the estimate
+        """
+        self.process_noise = process_noise
+        self.uere = uere
+        self.gate = gate
+        self.max_rejects = max_rejects
+
+        self.updates = 0             # Accepted fixes
+        self.rejected = 0            # Rejected fixes
+
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the estimate
+        """
+        self.__origin = None         # (latitude, longitude, meters per degree longitude)
+        self.__north = 0.0           # Meters from the origin
+        self.__east = 0.0
+        self.__variance = None       # Per axis in square meters
+        self.__ticks = None
+        self.__rejects = 0
+
+    def measurement_variance(self, hdop, satellites):
+        """
+        Return the variance per axis in square meters of a fix
+        """
+        sigma = self.uere * (hdop if hdop else UNKNOWN_HDOP)
+        if 0 < satellites < MIN_GOOD_SATELLITES:
+            sigma = sigma * MIN_GOOD_SATELLITES / satellites
+
+        return sigma * sigma
+
+    def __start(self, latitude, longitude, variance, ticks):
+        """
+        Start the estimate at the fix
+        """
+        self.__origin = (latitude, longitude,
+                         math.radians(EARTH_RADIUS) * math.cos(math.radians(latitude)))
+        self.__north = 0.0
+        self.__east = 0.0
+        self.__variance = variance
+        self.__ticks = ticks
+        self.__rejects = 0
+        self.updates += 1
+
+    def update(self, latitude, longitude, hdop=0.0, satellites=0, ticks=None):
+        """
+        Update the estimate with a fix in signed decimal degrees.
+        Returns if the fix was used
+        """
+        if ticks is None:
+            ticks = time.ticks_ms()
+
+        if ticks == self.__ticks:
+            return False             # Same fix again
+
+        variance = self.measurement_variance(hdop, satellites)
+        if self.__origin is None:
+            self.__start(latitude, longitude, variance, ticks)
+            return True
+
+        # Uncertainty grows with the time since the last fix
+        elapsed = time.ticks_diff(ticks, self.__ticks) / 1000
+        self.__ticks = ticks
+        self.__variance += self.process_noise * self.process_noise * abs(elapsed)
+
+        north = math.radians(latitude - self.__origin[0]) * EARTH_RADIUS
+        east = (longitude - self.__origin[1]) * self.__origin[2]
+        d_north = north - self.__north
+        d_east = east - self.__east
+        innovation = self.__variance + variance
+
+        if d_north * d_north + d_east * d_east > self.gate * self.gate * innovation:
+            self.rejected += 1
+            self.__rejects += 1
+            log.debug('Position {}m off rejected', math.sqrt(d_north * d_north + d_east * d_east))
+
+            # When the fixes are often too far off the device moved
+            if self.__rejects > self.max_rejects:
+                log.info('Position moved, restart estimate')
+                self.__start(latitude, longitude, variance, ticks)
+                return True
+
+            return False
+
+        gain = self.__variance / innovation
+        self.__north += gain * d_north
+        self.__east += gain * d_east
+        self.__variance = (1 - gain) * self.__variance
+        self.__rejects = 0
+        self.updates += 1
+
+        return True
+
+    @property
+    def valid(self):
+        """
+        Return if there is an estimate
+        """
+        return self.__origin is not None
+
+    @property
+    def latitude(self):
+        """
+        Return the estimated latitude in signed decimal degrees
+        """
+        if self.__origin is None:
+            return None
+
+        return self.__origin[0] + math.degrees(self.__north / EARTH_RADIUS)
+
+    @property
+    def longitude(self):
+        """
+        Return the estimated longitude in signed decimal degrees
+        """
+        if self.__origin is None:
+            return None
+
+        return self.__origin[1] + self.__east / self.__origin[2]
+
+    @property
+    def accuracy(self):
+        """
+        Return the uncertainty radius (distance root mean square) in meters
+        """
+        if self.__variance is None:
+            return None
+
+        return math.sqrt(2 * self.__variance)
@@ -0,0 +1,201 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,W0703,C0103
+
+"""
+InnovateNow runtime configuration.
+Settings from config.py can be changed without rebooting by a message on the
+device configuration topic. Accepted settings are applied to the config
+module and persisted to flash so they survive a reset.
+"""
+import json
+import os
+
+# Initialize logging
+import inlogging as logging
+log = logging.getLogger(__name__)
+
+# Longest scan in seconds. The scan blocks without feeding the watchdog of
+# 300 seconds, a longer scan resets the device
+MAX_SCAN_TIME_IN_SECONDS = 270
+
+# Settings which can be changed at runtime with type and allowed range
+RUNTIME_SETTINGS = {
+    'SCAN_TIME_IN_SECONDS': (int, 10, MAX_SCAN_TIME_IN_SECONDS),
+    'LOG_LEVEL': (int, logging.DEBUG, logging.CRITICAL),
+    'GPS_POSITION_NOISE': (float, 0.0, 100.0),
+    'GPS_POSITION_GATE': (float, 1.0, 100.0),
+    'GPS_FIXED_LATITUDE': (float, -90.0, 90.0),
+    'GPS_FIXED_LONGITUDE': (float, -180.0, 180.0),
+}
+
+class RuntimeConfig(object):
+    """
+    Validate, apply and persist runtime configuration updates
+    """
+
+    def __init__(self, config=None, path=None, settings=RUNTIME_SETTINGS):
+        """
+        Initialize the runtime configuration for the config module
+        """
+        self.config = config
+        self.path = path
+        self.settings = settings
+
+    def validate(self, values):
+        """
+        Return the validated settings or raise ValueError
+        """
+        if not isinstance(values, dict):
+            raise ValueError('Configuration must be an object')
+
+        validated = dict()
+        for name in values:
+            if name not in self.settings:
+                raise ValueError('Unknown setting [' + str(name) + ']')
+
+            value_type, minimum, maximum = self.settings[name]
+            value = values[name]
+            if value is None and value_type is float:
+                validated[name] = None
+                continue
+
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError('Setting [' + name + '] must be a number')
+
+            value = value_type(value)
+            if value < minimum or value > maximum:
+                raise ValueError('Setting [' + name + '] out of range')
+            validated[name] = value
+
+        return validated
+
+    def apply(self, values):
+        """
+        Apply validated settings to the config module
+        """
+        for name in values:
+            setattr(self.config, name, values[name])
+
+            if name == 'LOG_LEVEL':
+                logging.basicConfig(level=values[name])
+
+            log.info('Setting [{}] changed to [{}]', name, values[name])
+
+    def load(self):
+        """
+        Apply the settings persisted on flash. Settings which are unknown,
+        like those removed in a newer version, or invalid are dropped from
+        the file instead of rejecting all persisted settings
+        """
+        if not self.path:
+            return
+
+        try:
+            with open(self.path) as f:
+                values = json.load(f)
+        except OSError:
+            return  # Nothing persisted yet
+        except ValueError as e:
+            log.error('Ignoring persisted configuration {}', e)
+            return
+
+        if not isinstance(values, dict):
+            log.error('Ignoring persisted configuration, not an object')
+            return
+
+        validated = dict()
+        for name in values:
+            try:
+                validated.update(self.validate({name: values[name]}))
+            except ValueError as e:
+                log.warning('Dropping persisted setting {}', e)
+
+        self.apply(validated)
+
+        if len(validated) != len(values):
+            try:
+                self._write(validated)
+            except OSError as e:
+                log.error('Unable to persist configuration {}', e)
+
+    def save(self, values):
+        """
+        Persist the settings on flash together with the earlier accepted ones
+        """
+        if not self.path:
+            return
+
+        persisted = dict()
+        try:
+            with open(self.path) as f:
+                persisted = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        if not isinstance(persisted, dict):
+            persisted = dict()
+
+        # Only keep the settings of this version
+        persisted = dict((name, persisted[name]) for name in persisted if name in self.settings)
+        persisted.update(values)
+        self._write(persisted)
+
+    def _write(self, values):
+        """
+        Replace the persisted settings
+        """
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(values, f)
+        os.rename(tmp_path, self.path)
+
+    def update(self, payload):
+        """
+        Handle a configuration update, either a plain object with settings or
+        a device shadow delta. Returns True when the update is accepted
+        """
+        try:
+            values = json.loads(payload)
+            if isinstance(values, dict) and 'state' in values:
+                values = values['state']
+            values = self.validate(values)
+        except ValueError as e:
+            log.error('Configuration update rejected {}', e)
+            return False
+
+        self.apply(values)
+
+        try:
+            self.save(values)
+        except OSError as e:
+            log.error('Unable to persist configuration {}', e)
+
+        return True
+
+    def mqtt_callback(self, client, userdata, message):
+        """
+        Subscription callback for the configuration topic
+        """
+        log.info('Configuration update received [{}]', message.payload)
+        try:
+            self.update(message.payload)
+        except Exception as e:
+            log.error('Configuration update failed {}', e)
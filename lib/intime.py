@@ -0,0 +1,204 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,C0103,R0902
+
+"""
+InnovateNow time service.
+Keeps track of the validity of the RTC across warm boots, uses GPS time
+when it is available and synchronizes with NTP in the background.
+"""
+import time
+
+try:
+    import machine
+except ImportError:
+    machine = None
+
+import innvram
+from intimebase import timebase
+
+# Initialize logging
+import inlogging as logging
+log = logging.getLogger(__name__)
+
+# NVRAM keys
+NVRAM_TIME_SYNCED = 'time_synced'
+NVRAM_TIME_SOURCE = 'time_source'
+NVRAM_TIME_DRIFT = 'time_drift'
+
+# Time sources
+SOURCE_NONE = 0
+SOURCE_NTP = 1
+SOURCE_GPS = 2
+SOURCE_NAMES = ('none', 'ntp', 'gps')
+
+# Times before 2018-01-01 are never valid
+MIN_VALID_TIME = 1514764800
+
+# Seconds a synchronized RTC is trusted after a warm boot
+MAX_SYNC_AGE = 86400
+
+# GPS time only corrects the clock when it is off by more seconds
+GPS_CORRECTION_THRESHOLD = 2
+
+# Larger drift estimates are measurement errors
+MAX_DRIFT_PPM = 1000
+
+# Milliseconds after which the timebase is anchored to the RTC again
+TIMEBASE_ANCHOR_INTERVAL = 3600000
+
+class TimeService(object):
+    """
+    Time service with NTP and GPS as sources
+    """
+
+    def __init__(self, ntp=None, rtc=None):
+        """
+        Initialize the time service with the NTP synchronizer
+        """
+        self.ntp = ntp
+        self.rtc = rtc if rtc is not None else machine.RTC()
+        self.source = innvram.load(NVRAM_TIME_SOURCE, SOURCE_NONE)
+        self.last_sync = innvram.load(NVRAM_TIME_SYNCED, 0)
+        self.drift_ppm = innvram.load_signed(NVRAM_TIME_DRIFT, 0)
+        self._ntp_pending = False
+        self._anchor = None  # (rtc time, ticks, valid) when NTP was started
+
+    @property
+    def is_valid(self):
+        """
+        Return if the current time can be trusted
+        """
+        now = time.time()
+        # The RTC starts at 1970 after a power on reset
+        if now < MIN_VALID_TIME or not self.last_sync:
+            return False
+
+        return self.last_sync <= now < self.last_sync + MAX_SYNC_AGE
+
+    @property
+    def source_name(self):
+        """
+        Return the name of the last synchronization source
+        """
+        return SOURCE_NAMES[self.source]
+
+    def start(self):
+        """
+        Start the NTP synchronization in the background. Only waits for
+        NTP when there is no trustworthy time yet, a failed wait is not fatal
+        """
+        warm = self.is_valid
+        if warm:
+            self.anchor()
+        else:
+            # A previous sync is not valid anymore
+            self.source = SOURCE_NONE
+
+        if self.ntp is None:
+            return
+
+        self._anchor = (time.time(), time.ticks_ms(), warm)
+        self._ntp_pending = True
+
+        if warm:
+            log.info('Time valid from {}, NTP synchronization in background',
+                     self.source_name)
+            self.ntp.start()
+        else:
+            log.info('No valid time, waiting for NTP')
+            try:
+                self.ntp.sync()
+            except OSError as e:
+                # Keep running unsynchronized, the synchronization continues
+                # in the background and GPS time is used when it comes first
+                log.warning('NTP not available, continue without valid time ({})', e)
+                return
+            self.service()
+
+    def service(self):
+        """
+        Record a completed background NTP synchronization and keep the
+        timebase anchored to the RTC, which NTP keeps synchronized
+        """
+        if self._ntp_pending and self.ntp.synced:
+            self._ntp_pending = False
+            rtc_time, ticks, valid = self._anchor
+            expected = rtc_time + time.ticks_diff(time.ticks_ms(), ticks) // 1000
+            self._synced(SOURCE_NTP, time.time() - expected, valid)
+
+        elif self.source != SOURCE_NONE and \
+             (timebase.anchor_age is None or timebase.anchor_age > TIMEBASE_ANCHOR_INTERVAL):
+            self.anchor()
+
+    def anchor(self):
+        """
+        Anchor the timebase to the RTC with millisecond resolution
+        """
+        now = self.rtc.now()
+        ticks = time.ticks_ms()
+        timebase.anchor(time.mktime(now[:6] + (0, 0)) * 1000 + now[6] // 1000, ticks)
+
+    def from_gps(self, gps):
+        """
+        Use the GPS time when the clock is not synchronized by NTP and off
+        by more than GPS_CORRECTION_THRESHOLD seconds
+        """
+        if gps is None or not gps.coords_valid:
+            return
+
+        gps_datetime = gps.datetime
+        if gps_datetime is None:
+            return
+
+        if self.source == SOURCE_NTP and self.is_valid:
+            return
+
+        offset = time.mktime(gps_datetime + (0, 0)) - time.time()
+        if self.source == SOURCE_GPS and abs(offset) < GPS_CORRECTION_THRESHOLD:
+            return
+
+        valid = self.source != SOURCE_NONE and self.is_valid
+        log.info('Set time from GPS, offset {}s', offset)
+        self.rtc.init(gps_datetime)
+        self._synced(SOURCE_GPS, offset, valid)
+
+    def _synced(self, source, offset, valid):
+        """
+        Record a synchronization with the measured clock offset in seconds.
+        The drift is only estimated when the clock was valid before the
+        synchronization, after a cold boot the offset is the time since 1970
+        """
+        now = int(time.time())
+        if valid and self.last_sync and MIN_VALID_TIME < self.last_sync < now:
+            drift_ppm = int(offset * 1000000 / (now - self.last_sync))
+            if abs(drift_ppm) <= MAX_DRIFT_PPM:
+                self.drift_ppm = drift_ppm
+                innvram.store_signed(NVRAM_TIME_DRIFT, drift_ppm)
+            else:
+                log.warning('Ignoring implausible drift {}ppm', drift_ppm)
+
+        self.source = source
+        self.last_sync = now
+        self.anchor()
+        innvram.store(NVRAM_TIME_SOURCE, source)
+        innvram.store(NVRAM_TIME_SYNCED, now)
+        log.info('Time synchronized from {}, offset {}s, drift {}ppm',
+                 self.source_name, offset, self.drift_ppm)
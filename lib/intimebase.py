@@ -0,0 +1,107 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=C0103
+
+"""
+InnovateNow timebase.
+Monotonic clock on the ticks counter which is anchored to wall time at every
+time synchronization. Sightings are stamped with the cheap ticks counter and
+only converted to UTC when a message is encoded.
+"""
+import time
+
+# Minimal milliseconds between two anchors for measuring the drift
+MIN_DRIFT_INTERVAL = 600000
+
+# Measured drift outside this range is ignored
+MAX_DRIFT_PPM = 1000
+
+class Timebase(object):
+    """
+    Ticks based clock anchored to UTC in milliseconds
+    """
+
+    def __init__(self):
+        """
+        Initialize an unanchored timebase
+        """
+        self._wall_ms = None
+        self._ticks = None
+        self.drift_ppm = 0
+
+    @property
+    def is_anchored(self):
+        """
+        Return if the timebase is anchored to wall time
+        """
+        return self._wall_ms is not None
+
+    @property
+    def anchor_age(self):
+        """
+        Return the milliseconds since the last anchor or None
+        """
+        if self._ticks is None:
+            return None
+        return time.ticks_diff(time.ticks_ms(), self._ticks)
+
+    def stamp(self):
+        """
+        Return a timestamp in ticks
+        """
+        return time.ticks_ms()
+
+    def anchor(self, wall_ms, ticks=None):
+        """
+        Anchor the timebase to the UTC time in milliseconds at the ticks,
+        the drift of the ticks counter is measured against the previous anchor
+        """
+        if ticks is None:
+            ticks = time.ticks_ms()
+
+        if self._ticks is not None:
+            elapsed = time.ticks_diff(ticks, self._ticks)
+            if elapsed >= MIN_DRIFT_INTERVAL:
+                error = wall_ms - self.to_utc_ms(ticks)
+                drift_ppm = self.drift_ppm + error * 1000000 // elapsed
+                if -MAX_DRIFT_PPM <= drift_ppm <= MAX_DRIFT_PPM:
+                    self.drift_ppm = drift_ppm
+
+        self._wall_ms = wall_ms
+        self._ticks = ticks
+
+    def to_utc_ms(self, ticks):
+        """
+        Return the UTC time in milliseconds of the ticks stamp
+        """
+        if self._wall_ms is None:
+            return int(time.time()) * 1000 - time.ticks_diff(time.ticks_ms(), ticks)
+
+        elapsed = time.ticks_diff(ticks, self._ticks)
+        return self._wall_ms + elapsed + elapsed * self.drift_ppm // 1000000
+
+    def to_utc(self, ticks):
+        """
+        Return the UTC time in seconds of the ticks stamp
+        """
+        return self.to_utc_ms(ticks) // 1000
+
+# Timebase shared by the scanner, sensors and messages
+timebase = Timebase()
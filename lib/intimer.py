@@ -17,13 +17,26 @@
 # THE SOFTWARE.
 
 # Linter
-# pylint: disable=E0401,R0903,R0201,C0103
+# pylint: disable=E0401,R0903,R0201,C0103,R1710
 
 """
 InnovateNow timer module
 """
 import sys
-import machine
+import time
+
+try:
+    import machine
+    idle = machine.idle
+except ImportError:
+    # Host side tests and tools
+    machine = None
+
+    def idle():
+        """
+        Stand-in for machine.idle
+        """
+        time.sleep_ms(1)
 
 # Initialize logging
 import inlogging as logging
@@ -33,11 +46,17 @@ class Timer(object):
     """
     Timer class
     """
-    def __init__(self, seconds=0, callback=None):
+    def __init__(self, seconds=0, callback=None, periodic=False):
         """
         Init timer
         """
-        self._alarm = machine.Timer.Alarm(handler=callback, s=seconds)
+        self._alarm = machine.Timer.Alarm(handler=callback, s=seconds, periodic=periodic)
+
+    def cancel(self):
+        """
+        Cancel the timer
+        """
+        self._alarm.cancel()
 
 class ResetTimer(Timer):
     """
@@ -57,3 +76,72 @@ class ResetTimer(Timer):
         if alarm:
             log.info("Resetting the device...")
             machine.reset()
+
+
+class Deadline(object):
+    """
+    Deadline in milliseconds based on the ticks counter
+    """
+
+    def __init__(self, timeout_ms):
+        """
+        Start the deadline
+        """
+        self.timeout_ms = timeout_ms
+        self._start = time.ticks_ms()
+
+    @property
+    def elapsed(self):
+        """
+        Return the milliseconds since the start
+        """
+        return time.ticks_diff(time.ticks_ms(), self._start)
+
+    @property
+    def remaining(self):
+        """
+        Return the milliseconds left, 0 when expired
+        """
+        return max(0, self.timeout_ms - self.elapsed)
+
+    @property
+    def expired(self):
+        """
+        Return if the deadline passed
+        """
+        return self.elapsed >= self.timeout_ms
+
+    def wait(self, condition, feed=None, idle=idle):
+        """
+        Wait until the condition returns True or the deadline passes.
+        The watchdog feed function is only called while the deadline has
+        not passed so a stuck wait always ends before the watchdog resets.
+        Returns if the condition was met
+        """
+        while not condition():
+            if self.expired:
+                return False
+            if feed:
+                feed()
+            idle()
+        return True
+
+def retry(function, attempts=3, delay_ms=1000, feed=None, exceptions=(OSError,)):
+    """
+    Call the function until it succeeds, waiting delay_ms between the
+    attempts and doubling it after every failure. The last exception is
+    raised when all attempts failed
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return function()
+        except exceptions as e:
+            log.warning('Attempt {} of {} failed: {}', attempt, attempts,
+                        getattr(e, 'reason', e))
+            if attempt == attempts:
+                raise
+
+        if feed:
+            feed()
+        time.sleep_ms(delay_ms)
+        delay_ms = delay_ms * 2
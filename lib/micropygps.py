@@ -10,7 +10,8 @@ import time
 
 class MicropyGPS(object):
     """GPS NMEA Sentence Parser. Creates object that stores all relevant GPS data and statistics.
-    Parses sentences one character at a time using update(). """
+    Parses sentences one character at a time using update() or a complete sentence at once using
+    update_sentence(). """
 
     # Max Number of Characters a valid sentence can be (based on GGA sentence)
     SENTENCE_LIMIT = 76
@@ -49,6 +50,7 @@ class MicropyGPS(object):
         self.crc_fails = 0
         self.clean_sentences = 0
         self.parsed_sentences = 0
+        self.truncated_sentences = 0
 
         #####################
         # Logging Related
@@ -75,9 +77,11 @@ class MicropyGPS(object):
         self.satellites_in_view = 0
         self.satellites_in_use = 0
         self.satellites_used = []
-        self.last_sv_sentence = 0
-        self.total_sv_sentences = 0
+        self.last_sv_sentence = dict()
+        self.total_sv_sentences = dict()
         self.satellite_data = dict()
+        self.satellite_data_by_talker = dict()
+        self.satellites_in_view_by_talker = dict()
         self.hdop = 0.0
         self.pdop = 0.0
         self.vdop = 0.0
@@ -505,17 +509,29 @@ class MicropyGPS(object):
             # Add Satellite Data to Sentence Dict
             satellite_dict[sat_id] = (elevation, azimuth, snr)
 
-        # Update Object Data
-        self.total_sv_sentences = num_sv_sentences
-        self.last_sv_sentence = current_sv_sentence
-        self.satellites_in_view = sats_in_view
+        # Satellites and GSV groups are kept per constellation, receivers interleave the GSV groups of the
+        # talkers
+        talker = self.gps_segments[0][:2]
+        self.total_sv_sentences[talker] = num_sv_sentences
+        self.last_sv_sentence[talker] = current_sv_sentence
+        self.satellites_in_view_by_talker[talker] = sats_in_view
+        self.satellites_in_view = sum(self.satellites_in_view_by_talker.values())
 
         # For a new set of sentences, we either clear out the existing sat data or
         # update it as additional SV sentences are parsed
-        if current_sv_sentence == 1:
-            self.satellite_data = satellite_dict
+        if current_sv_sentence == 1 or talker not in self.satellite_data_by_talker:
+            self.satellite_data_by_talker[talker] = satellite_dict
         else:
-            self.satellite_data.update(satellite_dict)
+            self.satellite_data_by_talker[talker].update(satellite_dict)
+
+        # Combine the constellations when a group is complete, keyed by (talker, PRN) because PRNs of
+        # different talkers overlap
+        if num_sv_sentences == current_sv_sentence:
+            satellite_data = dict()
+            for talker_id, talker_data in self.satellite_data_by_talker.items():
+                for sat_id in talker_data:
+                    satellite_data[(talker_id, sat_id)] = talker_data[sat_id]
+            self.satellite_data = satellite_data
 
         return True
 
@@ -598,7 +614,7 @@ class MicropyGPS(object):
                     if self.gps_segments[0] in self.supported_sentences:
 
                         # parse the Sentence Based on the message type, return True if parse is clean
-                        if self.supported_sentences[self.gps_segments[0]](self):
+                        if self.parse_segments():
 
                             # Let host know that the GPS object was updated by returning parsed sentence type
                             self.parsed_sentences += 1
@@ -611,6 +627,76 @@ class MicropyGPS(object):
         # Tell Host no new sentence was parsed
         return None
 
+    def update_sentence(self, sentence):
+        """Process a complete NMEA sentence ($...*hh) given as str, bytes, bytearray or memoryview.
+        The checksum is validated in one pass and the fields are split once before the sentence is dispatched
+        to the sentence parser. Returns sentence type on successful parse, None otherwise"""
+
+        if isinstance(sentence, str):
+            sentence = sentence.encode()
+        elif not isinstance(sentence, (bytes, bytearray)):
+            sentence = bytes(sentence)
+
+        start = sentence.find(b'$')
+        star = sentence.find(b'*', start + 1)
+        if start < 0 or star < 0 or len(sentence) < star + 3:
+            return None
+
+        # Same length limit as the character parser: the body may use SENTENCE_LIMIT - 2 characters
+        if star - start - 1 > self.SENTENCE_LIMIT - 2:
+            return None
+
+        # Calculate the CRC over all characters between $ and *
+        crc_xor = 0
+        for i in range(start + 1, star):
+            ascii_char = sentence[i]
+            if not 32 <= ascii_char <= 126:
+                return None
+            crc_xor ^= ascii_char
+
+        try:
+            crc_string = sentence[star + 1:star + 3].decode()
+            final_crc = int(crc_string, 16)
+        except (ValueError, UnicodeError):
+            return None  # CRC Value was deformed and could not have been correct
+
+        self.char_count = star + 3 - start
+
+        if crc_xor != final_crc:
+            self.crc_fails += 1
+            return None
+
+        # Write sentence to log file if enabled
+        if self.log_en:
+            self.write_log(sentence[start:star + 3].decode())
+
+        # Split the fields once, the CRC is kept as last segment like the character parser does
+        self.gps_segments = sentence[start + 1:star].decode().split(',')
+        self.gps_segments.append(crc_string)
+        self.active_segment = len(self.gps_segments) - 1
+        self.sentence_active = False
+        self.clean_sentences += 1
+
+        if self.gps_segments[0] in self.supported_sentences:
+
+            # parse the Sentence Based on the message type, return True if parse is clean
+            if self.parse_segments():
+
+                # Let host know that the GPS object was updated by returning parsed sentence type
+                self.parsed_sentences += 1
+                return self.gps_segments[0]
+
+        return None
+
+    def parse_segments(self):
+        """Parse the segments with the sentence parser of their type. Sentences with a valid CRC but missing
+        fields are counted as truncated instead of raising IndexError. Returns True if parse is clean"""
+        try:
+            return self.supported_sentences[self.gps_segments[0]](self)
+        except IndexError:
+            self.truncated_sentences += 1
+            return False
+
     def new_fix_time(self):
         """Updates a high resolution counter with current time when fix is updated. Currently only triggered from
         GGA, GSA and RMC sentences"""
@@ -621,19 +707,25 @@ class MicropyGPS(object):
     # These functions make working with the GPS object data easier
     #########################################
 
-    def satellite_data_updated(self):
+    def satellite_data_updated(self, talker=None):
         """
-        Checks if the all the GSV sentences in a group have been read, making satellite data complete
+        Checks if the all the GSV sentences in the group of the talker, or of every talker, have been read,
+        making satellite data complete
         :return: boolean
         """
-        if self.total_sv_sentences > 0 and self.total_sv_sentences == self.last_sv_sentence:
-            return True
-        else:
+        talkers = list(self.total_sv_sentences) if talker is None else [talker]
+        if not talkers:
             return False
 
+        for talker_id in talkers:
+            total = self.total_sv_sentences.get(talker_id, 0)
+            if total == 0 or total != self.last_sv_sentence.get(talker_id):
+                return False
+        return True
+
     def satellites_visible(self):
         """
-        Returns a list of of the satellite PRNs currently visible to the receiver
+        Returns a list of the (talker, PRN) of the satellites currently visible to the receiver
         :return: list
         """
         return list(self.satellite_data.keys())
@@ -779,14 +871,19 @@ class MicropyGPS(object):
 
         return date_string
 
-    # All the currently supported NMEA sentences
-    supported_sentences = {'GPRMC': gprmc, 'GLRMC': gprmc,
-                           'GPGGA': gpgga, 'GLGGA': gpgga,
-                           'GPVTG': gpvtg, 'GLVTG': gpvtg,
-                           'GPGSA': gpgsa, 'GLGSA': gpgsa,
-                           'GPGSV': gpgsv, 'GLGSV': gpgsv,
-                           'GPGLL': gpgll, 'GLGLL': gpgll,
-                          }
+    # Talker IDs: GPS, combined GNSS, GLONASS, Galileo, BeiDou (BD and GB)
+    TALKERS = ('GP', 'GN', 'GL', 'GA', 'BD', 'GB')
+
+    # All the currently supported NMEA sentences for every talker
+    supported_sentences = dict()
+    for _talker in TALKERS:
+        supported_sentences[_talker + 'RMC'] = gprmc
+        supported_sentences[_talker + 'GGA'] = gpgga
+        supported_sentences[_talker + 'VTG'] = gpvtg
+        supported_sentences[_talker + 'GSA'] = gpgsa
+        supported_sentences[_talker + 'GSV'] = gpgsv
+        supported_sentences[_talker + 'GLL'] = gpgll
+    del _talker
 
 if __name__ == "__main__":
     pass
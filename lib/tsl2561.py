@@ -22,7 +22,11 @@
 """ TSL2561 sensor library """
 
 import time
-import ustruct
+
+try:
+    import ustruct
+except ImportError:
+    import struct as ustruct
 
 # TSL2561 default address.
 TSL2561_I2CADDR = 0x39
@@ -76,6 +80,7 @@ class TSL2561(object):
         if not sensor_id & 0x10:
             raise RuntimeError("bad sensor id 0x{:x}".format(sensor_id))
         self._active = False
+        self._started = None
         self._gain = 1
         self._integration_time = 13
         self._update_gain_and_time()
@@ -166,6 +171,39 @@ class TSL2561(object):
             m = 0
         return (max(0, channel0 * b - channel1 * m) + 8192) / 16384
 
+    def start(self):
+        """ Start an integration without waiting for it """
+        self.active(True)
+        self._started = time.ticks_ms()
+
+    def poll(self, autogain=False):
+        """ Return the lux value of the integration started with start()
+            when it is done and None while integrating. When autogain
+            changes the gain a new integration is started """
+        if self._started is None:
+            return None
+        if time.ticks_diff(time.ticks_ms(), self._started) < \
+           _INTEGRATION_TIME[self._integration_time][1]:
+            return None
+
+        broadband = self._register16(_REGISTER_CHANNEL0)
+        ir = self._register16(_REGISTER_CHANNEL1)
+        self._started = None
+        self.active(False)
+
+        if autogain:
+            new_gain = self._gain
+            if broadband < _INTEGRATION_TIME[self._integration_time][3]:
+                new_gain = 16
+            elif broadband > _INTEGRATION_TIME[self._integration_time][4]:
+                new_gain = 1
+            if new_gain != self._gain:
+                self.gain(new_gain)
+                self.start()
+                return None
+
+        return self._lux((broadband, ir))
+
     def read(self, autogain=False, raw=False):
         """ Read the lux value """
         broadband, ir = self._read()
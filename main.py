@@ -25,17 +25,17 @@ InnovateNow Beacon Scanner program
 Steps
 --------------------------------------------
 1. Connect to Wifi
-2. Get time from NTP Server
+2. Get time from NTP Server (in the background when the time is still valid)
 3. Connect to AWS Yeezz IoT environment
-4. Send alive signal
-5. Scan for Beacons / Tags for the specified amount of time
-6. Initialize GPS
-7. Initialize Environment sensor
-8. Send message to AWS InnovateNow Environment
+4. Subscribe to runtime configuration updates for this device
+5. Send alive signal
+6. Scan for Beacons / Tags for the specified amount of time
+7. Initialize GPS
+8. Initialize Environment sensor
+9. Send message to AWS InnovateNow Environment
 ---------------------------------------------
 Next version items
 ---------------------------------------------
-9. Retrieve messages from AWS IoT Environment for this device
 10. Check for OTA updates (once a day)
 """
 
@@ -52,14 +52,14 @@ from inaws import AWS
 from inble import BLEScanner
 from inmsg import AliveMessage, GPSMessage, EnvironMessage, AWSMessage
 from ingps import GPS
-from inenvsensor import Environment
-from intimer import ResetTimer
-from haversine import Haversine
-
-# Latitude / Longitude 
-cur_lat = None
-cur_lon = None
-location_counter = 0
+from inenvsensor import Environment, EnvironmentSampler
+from intimer import ResetTimer, retry
+from intime import TimeService
+from inruntime import RuntimeConfig
+from inposition import PositionEstimator
+from ingeofence import Geofence
+from ingpspower import GPSPowerManager, LIS2HH12Motion
+from ini2c import I2CBus
 
 # Initialize logging
 import inlogging as logging
@@ -70,6 +70,10 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# Apply the runtime configuration persisted on flash
+runtime_config = RuntimeConfig(config=config, path=config.RUNTIME_CONFIG_FILE)
+runtime_config.load()
+
 # Led orange
 pycom.heartbeat(False)
 pycom.rgbled(config.LED_COLOR_WARNING)
@@ -84,26 +88,40 @@ wdt = machine.WDT(timeout=300000)
 if config.DEVICE_RESET_AFTER_SECONDS:
     reset_timer = ResetTimer(config.DEVICE_RESET_AFTER_SECONDS)
 
+aws = None
+
 try:
 
     # Start network
-    log.info('Start WLAN network [{}]', config.WLAN_SSID)
-    network = WLANNetwork(ssid=config.WLAN_SSID, key=config.WLAN_KEY)
-    network.connect()
+    log.info('Start WLAN network')
+    network = WLANNetwork(profiles=config.WLAN_PROFILES,
+                          min_rssi=config.WLAN_ROAM_RSSI_THRESHOLD,
+                          max_latency=config.WLAN_ROAM_LATENCY_THRESHOLD,
+                          connect_timeout=config.WLAN_CONNECT_TIMEOUT,
+                          phase_timeout=config.WLAN_CONNECT_PHASE_TIMEOUT,
+                          feed=wdt.feed)
+    retry(network.connect, attempts=config.CONNECT_ATTEMPTS, feed=wdt.feed)
+    network.start_monitor(config.WLAN_ROAM_CHECK_SECONDS)
 
     wdt.feed() # Feed
 
-    # Sync correct time with NTP
-    log.info('Sync time with NTP')
-    ntp = NTP(ntp_pool_server=config.NTP_POOL_SERVER)
-    ntp.sync()
+    # Sync correct time with NTP, only waits when the time is not valid
+    log.info('Start time service')
+    ntp = NTP(ntp_pool_server=config.NTP_POOL_SERVER,
+              timeout=config.NTP_SYNC_TIMEOUT,
+              feed=wdt.feed)
+    time_service = TimeService(ntp=ntp)
+    time_service.start()
 
     wdt.feed() # Feed
 
     # Connect to AWS
     log.info('Start connection AWS IoT')
     aws = AWS()
-    aws.connect()
+    retry(aws.connect, attempts=config.CONNECT_ATTEMPTS, feed=wdt.feed)
+
+    # Receive runtime configuration updates
+    aws.subscribe(callback=runtime_config.mqtt_callback)
 
     wdt.feed() # Feed
 
@@ -114,39 +132,66 @@ try:
 
     wdt.feed() # Feed
 
+    # Init the I2C bus shared by the GPS and the environmental sensors
+    i2c = None
+    if (config.GPS_AVAILABLE and config.GPS_PORT == 'I2C') or config.ENVIRONMENT_SENSOR_AVAILABLE:
+        log.info('Initialize I2C bus ' +
+                 str(config.SENSOR_I2C_BUS) + ' on pins (' + config.SENSOR_I2C_SDA_PIN +
+                 ',' + config.SENSOR_I2C_SCL_PIN + ')')
+        i2c = I2CBus(machine.I2C(config.SENSOR_I2C_BUS,
+                                 machine.I2C.MASTER,
+                                 pins=(config.SENSOR_I2C_SDA_PIN, config.SENSOR_I2C_SCL_PIN)))
+        log.info('I2C addresses available [{}]', i2c.scan())
+
     # Init gps
     gps = None
-    i2c = None
     if config.GPS_AVAILABLE and config.GPS_PORT == 'UART':
         log.info('Initialize GPS via Serial')
         uart = machine.UART(1, pins=(config.GPS_UART_TX_PIN, config.GPS_UART_RX_PIN), baudrate=9600)
-        gps = GPS(uart=uart)
+        gps = GPS(uart=uart, receiver=config.GPS_RECEIVER,
+                  hot_start=config.GPS_RECEIVER is not None)
 
     if config.GPS_AVAILABLE and config.GPS_PORT == 'I2C':
-        log.info('Initialize GPS via I2C on bus ' +
-                 str(config.SENSOR_I2C_BUS) + ' and pins (' + config.SENSOR_I2C_SDA_PIN +
-                 ',' + config.SENSOR_I2C_SCL_PIN + ')')
-
-        if not i2c:
-            i2c = machine.I2C(config.SENSOR_I2C_BUS,
-                              machine.I2C.MASTER,
-                              pins=(config.SENSOR_I2C_SDA_PIN, config.SENSOR_I2C_SCL_PIN))
-            log.info('I2C addresses available [{}]', i2c.scan())
-        gps = GPS(i2c=i2c)
+        log.info('Initialize GPS via I2C')
+        gps = GPS(i2c=i2c, receiver=config.GPS_RECEIVER,
+                  hot_start=config.GPS_RECEIVER is not None)
+
+    if config.GPS_AVAILABLE:
+        position = PositionEstimator(max_rejects=config.GPS_POSITION_MAX_REJECTS)
+
+    geofence = None
+    if config.GPS_AVAILABLE and config.GEOFENCE_FILE:
+        geofence = Geofence.load(config.GEOFENCE_FILE)
+
+    if config.GPS_AVAILABLE and config.GPS_BACKGROUND_READER:
+        log.info('Start reading GPS in the background')
+        gps.start_service()
+
+    gps_power = None
+    if config.GPS_AVAILABLE and config.GPS_POWER_SAVE:
+        motion = None
+        if config.ACCELEROMETER_AVAILABLE:
+            from pytrack import Pytrack
+            from LIS2HH12 import LIS2HH12
+            motion = LIS2HH12Motion(LIS2HH12(Pytrack()))
+
+        gps_power = GPSPowerManager(gps, motion=motion,
+                                    max_skip=config.GPS_POWER_MAX_SKIP,
+                                    displacement=config.GPS_POWER_DISPLACEMENT,
+                                    speed=config.GPS_POWER_SPEED,
+                                    cycle_ms=config.SCAN_TIME_IN_SECONDS * 1000)
 
     # Init environmental sensors
     if config.ENVIRONMENT_SENSOR_AVAILABLE:
-        log.info('Initialize Environmental sensor via I2C via bus ' +
-                 str(config.SENSOR_I2C_BUS) + ' and pins (' + config.SENSOR_I2C_SDA_PIN +
-                 ',' + config.SENSOR_I2C_SCL_PIN + ')')
+        log.info('Initialize Environmental sensor via I2C')
+        environ = Environment(i2c=i2c, profile=config.ENVIRONMENT_SENSOR_PROFILE)
 
-        if not i2c:
-            i2c = machine.I2C(config.SENSOR_I2C_BUS,
-                              machine.I2C.MASTER,
-                              pins=(config.SENSOR_I2C_SDA_PIN, config.SENSOR_I2C_SCL_PIN))
-            log.info('I2C addresses available [{}]', i2c.scan())
-
-        environ = Environment(i2c=i2c)
+        sampler = None
+        if config.ENVIRONMENT_SAMPLE_INTERVAL:
+            log.info('Sample the environment every {}s', config.ENVIRONMENT_SAMPLE_INTERVAL)
+            sampler = EnvironmentSampler(environ, interval=config.ENVIRONMENT_SAMPLE_INTERVAL,
+                                         size=config.ENVIRONMENT_SAMPLE_BUFFER)
+            sampler.start()
 
     # Init scanner
     scanner = BLEScanner(max_list_items=50)
@@ -157,18 +202,33 @@ try:
     while True:
 
         log.debug('Memory allocated: ' + str(gc.mem_alloc()) + ' ,free: ' + str(gc.mem_free()))
+        if i2c:
+            log.debug('I2C statistics {}', i2c.statistics)
 
         wdt.feed() # Feed
 
-        # Start Beacon scanning for 2min
-        scanner.start(timeout=config.SCAN_TIME_IN_SECONDS)
+        # Wake up the GPS receiver when it is read this cycle
+        read_gps = config.GPS_AVAILABLE and (gps_power is None or gps_power.should_read())
+
+        # Start Beacon scanning for 2min, publishes in flight are retransmitted
+        # and completed while scanning
+        scanner.start(timeout=config.SCAN_TIME_IN_SECONDS, service=aws.service)
         scanner.stop()
 
         wdt.feed() # Feed
 
         # Read GPS coordinates
-        if config.GPS_AVAILABLE:
+        if read_gps:
             gps.update()
+            time_service.from_gps(gps)
+
+            if gps_power:
+                gps_power.read_done()
+                log.debug('GPS {} reads, {} skips, {}ms read time and {:.3f}mAh saved',
+                          gps_power.reads, gps_power.skips, gps_power.saved_ms,
+                          gps_power.saved_mah)
+
+        time_service.service()
 
         wdt.feed() # Feed
 
@@ -176,33 +236,43 @@ try:
         gps_msg = GPSMessage()
         if config.GPS_AVAILABLE:   
 
-            new_lat = gps.latitude[0]
-            new_lon = gps.longitude[0]
-
-            # Calc distance
-            if gps.coords_valid:
-                distance = 0                
-                if cur_lat and cur_lon:
-                    distance = Haversine([cur_lat,cur_lon], [new_lat,new_lon]).meters
-                    log.debug('Distance: ' + str(distance))
-
-                # Check distance
-                # When the distance is often to far off. Use the new coordinates
-                if distance < config.GPS_COORD_DIFF_UPDATE_RULE or location_counter > 5:  
-                    log.debug('Using the new coordinates')   
-                    location_counter = 0                   
-                    cur_lat = new_lat
-                    cur_lon = new_lon
-                else:
-                    location_counter = location_counter + 1   
-
-            gps_msg = GPSMessage(id=config.GPS_SENSOR_ID,
-                                 latitude=cur_lat,
-                                 longitude=cur_lon,
-                                 altitude=gps.altitude,
-                                 speed=gps.speed(),
-                                 course=gps.course,
-                                 direction=gps.direction)
+            # Stabilize the coordinates
+            position.process_noise = config.GPS_POSITION_NOISE
+            position.gate = config.GPS_POSITION_GATE
+            fix = gps.fix
+            if fix is not None and fix.coords_valid:
+                position.update(fix.lat, fix.lon, hdop=fix.hdop,
+                                satellites=fix.satellites_in_use, ticks=fix.ticks)
+
+            # Zones entered and exited
+            zones = None
+            zone_events = None
+            if geofence and geofence.zones and position.valid:
+                zone_events = geofence.update(position.latitude, position.longitude)
+                zones = geofence.current
+
+            if zones and config.GEOFENCE_ZONE_ONLY:
+                gps_msg = GPSMessage(id=config.GPS_SENSOR_ID,
+                                     zones=zones,
+                                     zone_events=zone_events,
+                                     ticks=gps.fix_ticks)
+            else:
+                gps_msg = GPSMessage(id=config.GPS_SENSOR_ID,
+                                     latitude=position.latitude,
+                                     longitude=position.longitude,
+                                     accuracy=position.accuracy,
+                                     altitude=gps.altitude,
+                                     speed=gps.speed(),
+                                     course=gps.course,
+                                     direction=gps.direction,
+                                     ticks=gps.fix_ticks,
+                                     zones=zones,
+                                     zone_events=zone_events)
+
+            # Nothing changed since the last message
+            if zones is not None and not zone_events and geofence.updates > 1 and \
+               config.GEOFENCE_SKIP_UNCHANGED:
+                gps_msg = None
 
         else:
             gps_msg = GPSMessage(latitude=config.GPS_FIXED_LATITUDE,
@@ -210,17 +280,29 @@ try:
 
         env_msg = EnvironMessage()
         if config.ENVIRONMENT_SENSOR_AVAILABLE:
+            # The sampler keeps the last reading up to date
+            statistics = None
+            if sampler:
+                statistics = sampler.window()
+            else:
+                environ.read()
+
             env_msg = EnvironMessage(id=config.ENVIRONMENT_SENSOR_ID,
                                      temperature=environ.temperature,
                                      humidity=environ.humidity,
-                                     barometric_pressure=environ.barometric_pressure)
+                                     barometric_pressure=environ.barometric_pressure,
+                                     lux=environ.lux,
+                                     ticks=environ.ticks,
+                                     statistics=statistics)
 
         aws_msg = AWSMessage(customer=config.CUSTOMER,
                              device_id=config.DEVICE_ID,
                              environ_message=env_msg.to_dict(),
-                             gps_message=gps_msg.to_dict(),
+                             gps_message=gps_msg.to_dict() if gps_msg else None,
                              beacons=scanner.beacons,
-                             tags=scanner.tags)
+                             tags=scanner.tags,
+                             beacon_ticks=scanner.beacon_ticks,
+                             tag_ticks=scanner.tag_ticks)
 
         # Publish to AWS
         pycom.rgbled(config.LED_COLOR_OK) # Led green
@@ -229,6 +311,12 @@ try:
 
         wdt.feed() # Feed
 
+        # Move to a better access point when the link degraded
+        network.report_latency(aws.publish_time_ms)
+        if network.roam_requested and network.roam():
+            aws.reconnect()
+            wdt.feed() # Feed
+
         # Reset everything
         scanner.reset()
 
@@ -0,0 +1,12 @@
+"""
+InnovateNow host side tests.
+Run with pytest on CPython, they are not uploaded to the device
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'lib'), os.path.join(ROOT, 'tools'), ROOT]
+
+# The MicroPython ticks functions for the modules under test
+import inticks  # pylint: disable=C0413,W0611
@@ -0,0 +1,348 @@
+"""
+InnovateNow host side stand-ins for the device buses
+"""
+import calendar
+import time
+from struct import pack
+
+def sentence(body):
+    """
+    Return the NMEA sentence for the body with its checksum as bytes
+    """
+    crc = 0
+    for c in body.encode():
+        crc ^= c
+    return '${}*{:02X}\r\n'.format(body, crc).encode()
+
+class FakeUART(object):
+    """
+    UART returning the data in reads of the given sizes, the last size
+    repeats. Like the UART it returns None when there is nothing to read
+    """
+
+    def __init__(self, data, sizes=(64,)):
+        self.data = bytes(data)
+        self.sizes = sizes
+        self.position = 0
+        self.reads = 0
+        self.written = []
+
+    def readinto(self, buf):
+        if self.position >= len(self.data):
+            return None
+        size = self.sizes[min(self.reads, len(self.sizes) - 1)]
+        size = min(size, len(buf), len(self.data) - self.position)
+        buf[:size] = self.data[self.position:self.position + size]
+        self.position += size
+        self.reads += 1
+        return size
+
+    def write(self, data):
+        self.written.append(bytes(data))
+
+class FakeGPSI2C(object):
+    """
+    I2C interface of the Quectel L76-L: every read fills the whole buffer,
+    after the available data it is padded with \\n
+    """
+
+    def __init__(self, data, sizes=(64,)):
+        self.uart = FakeUART(data, sizes)
+        self.written = []
+
+    def readfrom_into(self, address, buf):
+        size = self.uart.readinto(buf) or 0
+        for i in range(size, len(buf)):
+            buf[i] = 0x0A
+
+    def writeto(self, address, data):
+        self.written.append((address, bytes(data)))
+
+class FakeReader(object):
+    """
+    Data reader timing of the fake receiver
+    """
+
+    def __init__(self, read_time_ms):
+        self.read_time_ms = read_time_ms
+
+class FakeFix(object):
+    """
+    Fix of the fake receiver, speed in kph
+    """
+
+    def __init__(self, lat, lon, speed=0.0):
+        self.lat = lat
+        self.lon = lon
+        self.speed = (speed / 1.852, speed / 1.852 * 1.151, speed)
+        self.valid = True
+        self.coords_valid = True
+
+class FakeGPS(object):
+    """
+    Receiver which records the commands sent and returns the fix given
+    """
+
+    def __init__(self, receiver=None, read_time_ms=3000):
+        self.receiver = receiver
+        self.service = None
+        self.reader = FakeReader(read_time_ms)
+        self.fix = None
+        self.commands = []
+
+    def send(self, command):
+        self.commands.append(command)
+
+class FakeRTC(object):
+    """
+    RTC of the device. The time functions of the device read the RTC, use
+    install() to let time.time and time.mktime of the host do the same
+    """
+
+    def __init__(self, seconds=0):
+        self.seconds = seconds
+
+    def install(self, monkeypatch):
+        monkeypatch.setattr(time, 'time', lambda: self.seconds)
+        monkeypatch.setattr(time, 'mktime', lambda t: calendar.timegm(t[:6]))
+
+    def now(self):
+        return time.gmtime(self.seconds)[:6] + (0, None)
+
+    def init(self, datetime):
+        self.seconds = calendar.timegm(datetime[:6])
+
+class FakeNTP(object):
+    """
+    NTP synchronizer which corrects the RTC by the offset when it syncs,
+    sync() raises OSError when it fails
+    """
+
+    def __init__(self, rtc, offset, fails=False):
+        self.rtc = rtc
+        self.offset = offset
+        self.fails = fails
+        self.synced = False
+
+    def start(self):
+        self.rtc.seconds += self.offset
+        self.synced = True
+
+    def sync(self):
+        if self.fails:
+            raise OSError('NTP timeout')
+        self.start()
+
+class FakeNet(object):
+    """
+    Scan result of an access point
+    """
+
+    def __init__(self, ssid, bssid, rssi, channel=1, sec=3):
+        self.ssid = ssid
+        self.bssid = bssid
+        self.rssi = rssi
+        self.channel = channel
+        self.sec = sec
+
+class FakeWLAN(object):
+    """
+    WLAN station which finds the nets in a scan but never joins them
+    """
+    STA = 1
+    INT_ANT = 0
+    nets = ()
+
+    def __init__(self, mode=None, antenna=None):
+        self.joins = []
+
+    def scan(self):
+        return list(self.nets)
+
+    def connect(self, ssid, auth, bssid=None, timeout=None):
+        self.joins.append((bssid, timeout))
+
+    def isconnected(self):
+        return False
+
+    def disconnect(self):
+        pass
+
+class FakeBluetooth(object):
+    """
+    Bluetooth which scans for the timeout in seconds without advertisements
+    """
+
+    def __init__(self):
+        self.scan_end = None
+
+    def start_scan(self, timeout):
+        self.scan_end = time.monotonic() + timeout
+
+    def isscanning(self):
+        return time.monotonic() < self.scan_end
+
+    def get_adv(self):
+        time.sleep(0.001)
+
+    def stop_scan(self):
+        self.scan_end = None
+
+# Bosch BME280/BMP280 datasheet compensation example: the raw values give
+# 25.08 degrees and 100653 Pa
+BME280_DATASHEET_CALIBRATION = (27504, 26435, -1000, 36477, -10685, 3024,
+                                2855, 140, -7, 15500, -14600, 6000)
+BME280_DATASHEET_RAW_TEMPERATURE = 519888
+BME280_DATASHEET_RAW_PRESSURE = 415148
+BME280_DATASHEET_TEMPERATURE = 2508          # 0.01 degrees
+BME280_DATASHEET_PRESSURE = 100653           # Pa
+
+# Typical humidity calibration (H1 - H6)
+BME280_TYPICAL_HUMIDITY_CALIBRATION = (75, 362, 0, 324, 50, 30)
+
+class FakeDevice(object):
+    """
+    Register memory of a device on the fake I2C bus. Data without a
+    register (like the GPS stream) is read from stream
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.memory = bytearray(256)
+        self.stream = b''
+        self.writes = []             # (register, data) written
+        self.nacks = 0               # Transactions to fail like a NACK
+
+    def read(self, register, size):
+        """
+        Return size bytes from the register
+        """
+        return bytes(self.memory[register:register + size])
+
+    def write(self, register, data):
+        """
+        Write the data to the register
+        """
+        self.writes.append((register, bytes(data)))
+        self.memory[register:register + len(data)] = data
+
+    def read_stream(self, size):
+        """
+        Return size bytes of the stream, padded with 0x0A like the GPS does
+        """
+        data = self.stream[:size]
+        self.stream = self.stream[size:]
+        return data + b'\n' * (size - len(data))
+
+class FakeBME280(FakeDevice):
+    """
+    BME280 with calibration and raw values in its registers
+    """
+
+    def __init__(self, address=0x76, calibration=BME280_DATASHEET_CALIBRATION,
+                 humidity_calibration=BME280_TYPICAL_HUMIDITY_CALIBRATION):
+        super(FakeBME280, self).__init__(address)
+
+        h1, h2, h3, h4, h5, h6 = humidity_calibration
+        self.memory[0x88:0xA0] = pack('<HhhHhhhhhhhh', *calibration)
+        self.memory[0xA1] = h1
+        self.memory[0xE1:0xE8] = pack('<hBbBbb', h2, h3, h4 >> 4,
+                                      (h4 & 0x0F) | ((h5 & 0x0F) << 4), h5 >> 4, h6)
+        self.memory[0xD0] = 0x60     # Chip id
+
+        self.set_raw(BME280_DATASHEET_RAW_TEMPERATURE, BME280_DATASHEET_RAW_PRESSURE, 30000)
+
+    def set_raw(self, temperature, pressure, humidity):
+        """
+        Set the raw values of the data registers
+        """
+        pressure <<= 4
+        temperature <<= 4
+        self.memory[0xF7:0xFF] = bytes((pressure >> 16, (pressure >> 8) & 0xFF, pressure & 0xFF,
+                                        temperature >> 16, (temperature >> 8) & 0xFF,
+                                        temperature & 0xFF, humidity >> 8, humidity & 0xFF))
+
+class FakeTSL2561(FakeDevice):
+    """
+    TSL2561 with channel values in its registers
+    """
+
+    def __init__(self, address=0x39):
+        super(FakeTSL2561, self).__init__(address)
+        self.memory[0x8A] = 0x50     # Sensor id
+        self.set_channels(1000, 200)
+
+    def set_channels(self, broadband, ir):
+        """
+        Set the broadband and infrared channel values
+        """
+        self.memory[0xAC:0xB0] = pack('<HH', broadband, ir)
+
+class FakeI2C(object):
+    """
+    I2C bus with fake devices and the machine.I2C methods used by the
+    drivers. A missing device or a device with nacks raises OSError like a
+    NACK
+    """
+
+    def __init__(self, devices=()):
+        self.devices = dict()
+        for device in devices:
+            self.devices[device.address] = device
+        self.transactions = 0
+
+    def __device(self, address):
+        """
+        Return the device or raise OSError
+        """
+        self.transactions += 1
+        device = self.devices.get(address)
+        if device is None:
+            raise OSError('I2C bus error')
+        if device.nacks:
+            device.nacks -= 1
+            raise OSError('I2C bus error')
+        return device
+
+    def scan(self):
+        """
+        Return the addresses of the devices
+        """
+        return sorted(self.devices)
+
+    def readfrom_mem(self, address, register, size):
+        """
+        Return size bytes of the register
+        """
+        return self.__device(address).read(register, size)
+
+    def readfrom_mem_into(self, address, register, buf):
+        """
+        Fill the buffer from the register
+        """
+        buf[:] = self.__device(address).read(register, len(buf))
+
+    def writeto_mem(self, address, register, buf):
+        """
+        Write the buffer to the register
+        """
+        self.__device(address).write(register, buf)
+
+    def readfrom(self, address, size):
+        """
+        Return size bytes of the stream
+        """
+        return self.__device(address).read_stream(size)
+
+    def readfrom_into(self, address, buf):
+        """
+        Fill the buffer from the stream
+        """
+        buf[:] = self.__device(address).read_stream(len(buf))
+
+    def writeto(self, address, buf):
+        """
+        Record a write without a register
+        """
+        self.__device(address).writes.append((None, bytes(buf)))
+        return len(buf)
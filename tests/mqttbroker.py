@@ -0,0 +1,74 @@
+"""
+InnovateNow MQTT broker stand-in.
+Takes the packets of the publish pipeline like the send queue of the
+message handler and answers the QoS 1 publishes with a PUBACK after an
+injected latency, delivered from a timer thread like the receive thread of
+the MQTT library.
+"""
+import struct
+import threading
+
+def decode_publish(packet):
+    """
+    Decode a PUBLISH packet into (topic, payload, packet_id, dup)
+    """
+    packet = bytes(packet)
+    assert packet[0] & 0xF0 == 0x30
+
+    size = 0
+    shift = 0
+    index = 1
+    while True:
+        byte = packet[index]
+        size |= (byte & 0x7F) << shift
+        shift += 7
+        index += 1
+        if not byte & 0x80:
+            break
+    assert len(packet) - index == size
+
+    length = struct.unpack('!H', packet[index:index + 2])[0]
+    topic = packet[index + 2:index + 2 + length].decode()
+    index += 2 + length
+    packet_id = struct.unpack('!H', packet[index:index + 2])[0]
+    payload = packet[index + 2:].decode()
+    return topic, payload, packet_id, bool(packet[0] & 0x08)
+
+class Broker(object):
+    """
+    Broker which acknowledges after latency_ms. Transmissions listed in
+    drop as (packet_id, attempt) are lost and never acknowledged
+    """
+
+    def __init__(self, latency_ms=0, drop=()):
+        self.latency_ms = latency_ms
+        self.drop = set(drop)
+        self.receive = None
+        self.published = []
+        self._attempts = dict()
+        self._timers = []
+
+    def send(self, packet):
+        """
+        Take a packet from the client
+        """
+        topic, payload, packet_id, dup = decode_publish(packet)
+        self.published.append((topic, payload, packet_id, dup))
+
+        attempt = self._attempts.get(packet_id, 0) + 1
+        self._attempts[packet_id] = attempt
+        if (packet_id, attempt) in self.drop:
+            return
+
+        puback = bytes([0x40, 0x02]) + struct.pack('!H', packet_id)
+        timer = threading.Timer(self.latency_ms / 1000, self.receive, (puback,))
+        timer.daemon = True
+        self._timers.append(timer)
+        timer.start()
+
+    def wait(self):
+        """
+        Wait until all acknowledges are delivered
+        """
+        for timer in self._timers:
+            timer.join()
@@ -0,0 +1,43 @@
+"""
+Tests of the BME280 compensation against the datasheet example
+"""
+import math
+from array import array
+
+import pytest
+
+import bme280
+from fakes import FakeI2C, FakeBME280, BME280_DATASHEET_TEMPERATURE, \
+    BME280_DATASHEET_PRESSURE
+
+def datasheet_sensor():
+    i2c = FakeI2C([FakeBME280()])
+    return bme280.BME280(i2c=i2c)
+
+def test_compensation_matches_datasheet():
+    temperature, pressure, _ = datasheet_sensor().read_compensated_data()
+    assert temperature == BME280_DATASHEET_TEMPERATURE
+    # Pressure is Q24.8 Pa
+    assert pressure // 256 == BME280_DATASHEET_PRESSURE
+
+def test_values_match_datasheet():
+    result = datasheet_sensor().read_values(array('f', [0.0] * 3))
+    assert result[0] == pytest.approx(BME280_DATASHEET_TEMPERATURE / 100)
+    assert result[1] == pytest.approx(BME280_DATASHEET_PRESSURE / 100)
+
+def test_skipped_channel_has_no_value():
+    i2c = FakeI2C([FakeBME280()])
+    sensor = bme280.BME280(i2c=i2c, profile=bme280.BME280_PROFILE_HUMIDITY)
+    temperature, pressure, humidity = sensor.read_compensated_data()
+    assert temperature == BME280_DATASHEET_TEMPERATURE
+    assert pressure is None
+    assert humidity is not None
+    assert sensor.pressure is None
+
+    result = sensor.read_values(array('f', [0.0] * 3))
+    assert math.isnan(result[1])
+
+def test_temperature_can_not_be_skipped():
+    with pytest.raises(ValueError):
+        bme280.BME280(i2c=FakeI2C([FakeBME280()]),
+                      temperature_oversample=bme280.BME280_OSAMPLE_SKIP)
@@ -0,0 +1,33 @@
+"""
+Tests of the service calls while scanning
+"""
+import inble
+from inble import BLEScanner
+from inmqtt import PublishPipeline, PACKET_ID_FIRST
+from mqttbroker import Broker
+from fakes import FakeBluetooth
+
+def scanner(monkeypatch, interval=20):
+    monkeypatch.setattr(inble, 'SERVICE_INTERVAL', interval)
+    ble_scanner = BLEScanner()
+    ble_scanner._ble = FakeBluetooth()
+    return ble_scanner
+
+def test_service_called_while_scanning(monkeypatch):
+    calls = []
+    scanner(monkeypatch).start(timeout=0.2, service=lambda: calls.append(1))
+    assert 5 <= len(calls) <= 10
+
+def test_publish_retransmitted_during_scan(monkeypatch):
+    broker = Broker(drop=[(PACKET_ID_FIRST, 1)])
+    publisher = PublishPipeline(broker.send, size=4, timeout=0.05)
+    broker.receive = publisher.received
+    results = []
+
+    publisher.publish('t', 'a', lambda p, ok: results.append(ok))
+    # Retransmitted and completed within the scan, not on the next publish
+    scanner(monkeypatch).start(timeout=0.3, service=publisher.service)
+
+    assert [dup for _, _, _, dup in broker.published] == [False, True]
+    assert results == [True]
+    assert len(publisher.window) == 0
@@ -0,0 +1,9 @@
+"""
+Benchmark of the environment reading on the fake I2C bus
+"""
+from inenvbench import benchmark
+
+def test_read_is_faster_than_properties():
+    read_us, read_transactions, properties_us, properties_transactions = benchmark(count=20)
+    assert read_transactions * 3 == properties_transactions
+    assert read_us < properties_us
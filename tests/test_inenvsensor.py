@@ -0,0 +1,92 @@
+"""
+Tests of the environment sensor and sampler on the fake I2C bus
+"""
+import math
+import time
+
+import pytest
+
+from inenvsensor import Environment, EnvironmentSampler, TEMPERATURE, BAROMETRIC_PRESSURE, \
+    HUMIDITY, LUX
+from inmsg import EnvironMessage
+from fakes import FakeI2C, FakeBME280, FakeTSL2561
+
+def test_read_takes_one_conversion():
+    i2c = FakeI2C([FakeBME280()])
+    environment = Environment(i2c=i2c)
+    sensor = environment.bme280
+
+    transactions = i2c.transactions
+    values = environment.read()
+    read = i2c.transactions - transactions
+
+    transactions = i2c.transactions
+    properties = (sensor.temperature, sensor.pressure, sensor.humidity)
+    assert read * 3 == i2c.transactions - transactions
+
+    assert values[TEMPERATURE] == pytest.approx(properties[0])
+    assert values[BAROMETRIC_PRESSURE] == pytest.approx(properties[1])
+    assert values[HUMIDITY] == pytest.approx(properties[2])
+    assert environment.temperature == values[TEMPERATURE]
+    assert environment.ticks is not None
+    assert environment.lux is None
+
+def test_no_values_before_a_reading():
+    environment = Environment(i2c=FakeI2C([FakeBME280()]))
+    assert environment.temperature is None
+    assert environment.humidity is None
+
+def test_without_sensor():
+    environment = Environment(i2c=FakeI2C())
+    assert environment.read() is None
+    assert environment.temperature is None
+
+def lux_environment():
+    environment = Environment(i2c=FakeI2C([FakeBME280(), FakeTSL2561()]))
+    return environment, EnvironmentSampler(environment, size=4)
+
+def integration_done(environment):
+    # Move the start of the integration back past the integration time
+    environment.tsl2561._started = time.ticks_add(time.ticks_ms(), -1000)
+
+def test_lux_sampled_only_when_collected():
+    environment, sampler = lux_environment()
+
+    # The first integration is still running
+    sampler._sample()
+    assert 'lux' not in sampler.window()
+    assert math.isnan(sampler.history(LUX)[0])
+
+    integration_done(environment)
+    sampler._sample()
+    # Same lux value, the next integration is still running
+    sampler._sample()
+
+    window = sampler.window()
+    assert window['lux'].count == 1
+    assert window['temperature'].count == 2
+    assert window['lux'].mean == pytest.approx(environment.lux)
+
+    history = sampler.history(LUX)
+    assert history[1] == pytest.approx(environment.lux)
+    assert math.isnan(history[2])
+
+def test_skipped_pressure_is_not_reported():
+    environment = Environment(i2c=FakeI2C([FakeBME280()]), profile='humidity')
+    sampler = EnvironmentSampler(environment, size=4)
+    sampler._sample()
+
+    assert environment.temperature is not None
+    assert environment.barometric_pressure is None
+    assert math.isnan(sampler.history(BAROMETRIC_PRESSURE)[0])
+
+    statistics = sampler.window()
+    assert 'barometricPressure' not in statistics
+
+    message = EnvironMessage(temperature=environment.temperature,
+                             humidity=environment.humidity,
+                             barometric_pressure=environment.barometric_pressure,
+                             statistics=statistics).to_dict()
+    assert 'barometricPressure' not in message
+    assert 'barometricPressureStats' not in message
+    assert 'temperatureStats' in message
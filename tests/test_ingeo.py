@@ -0,0 +1,48 @@
+"""
+Tests of the geodesy functions
+"""
+from array import array
+
+import pytest
+
+import ingeo
+
+def test_haversine_known_distance():
+    # One degree of latitude on the mean earth radius
+    assert ingeo.haversine(52.0, 5.0, 53.0, 5.0) == pytest.approx(111194.9, abs=0.1)
+    assert ingeo.haversine(0.0, 0.0, 0.0, 180.0) == pytest.approx(ingeo.EARTH_RADIUS * 3.14159265, rel=1e-6)
+
+def test_equirectangular_fast_path_accuracy():
+    for meters in (10, 100, 1000, ingeo.EQUIRECTANGULAR_LIMIT):
+        offset = meters / 111194.9
+        exact = ingeo.haversine(52.0, 5.0, 52.0 + offset, 5.0 + offset)
+        assert ingeo.equirectangular(52.0, 5.0, 52.0 + offset, 5.0 + offset) == \
+               pytest.approx(exact, rel=0.001)
+
+def test_distance_uses_haversine_for_long_distances():
+    assert ingeo.distance(52.0, 5.0, 40.0, -74.0) == ingeo.haversine(52.0, 5.0, 40.0, -74.0)
+
+def test_bearing():
+    assert ingeo.bearing(52.0, 5.0, 53.0, 5.0) == pytest.approx(0.0)
+    assert ingeo.bearing(52.0, 5.0, 52.0, 6.0) == pytest.approx(89.6, abs=0.1)
+    assert ingeo.bearing(52.0, 5.0, 51.0, 5.0) == pytest.approx(180.0)
+    assert ingeo.bearing(52.0, 5.0, 52.0, 4.0) == pytest.approx(270.4, abs=0.1)
+
+def test_many_match_single_points():
+    lats = array('f', [52.0 + i * 0.001 for i in range(10)])
+    lons = array('f', [5.0 + i * 0.002 for i in range(10)])
+    out = array('f', bytearray(4 * len(lats)))
+
+    assert ingeo.haversine_many(52.0, 5.0, lats, lons, out) is out
+    near = ingeo.equirectangular_many(52.0, 5.0, lats, lons)
+    for i in range(len(lats)):
+        exact = ingeo.haversine(52.0, 5.0, lats[i], lons[i])
+        assert out[i] == pytest.approx(exact, rel=1e-5, abs=0.01)
+        assert near[i] == pytest.approx(exact, rel=1e-3, abs=0.01)
+
+def test_numpy_variants():
+    numpy = pytest.importorskip('numpy')
+    lats = numpy.array([52.0, 52.001, 52.002])
+    lons = numpy.array([5.0, 5.002, 5.004])
+    assert ingeo.track_distance_np(lats, lons) == \
+           pytest.approx(2 * ingeo.haversine(52.0, 5.0, 52.001, 5.002), rel=1e-6)
@@ -0,0 +1,48 @@
+"""
+Tests of the geofencing
+"""
+import json
+
+import pytest
+
+from ingeofence import Geofence, Zone, EVENT_ENTER, EVENT_EXIT
+
+SQUARE = [[52.0, 5.0], [52.0, 5.1], [52.1, 5.1], [52.1, 5.0]]
+TRIANGLE = [[52.05, 5.05], [52.2, 5.05], [52.05, 5.2]]
+
+def write(tmp_path, data):
+    path = tmp_path / 'zones.json'
+    path.write_text(data if isinstance(data, str) else json.dumps(data))
+    return str(path)
+
+def test_locate_and_events():
+    geofence = Geofence([Zone('square', SQUARE), Zone('triangle', TRIANGLE)])
+    assert geofence.locate(52.02, 5.02) == ('square',)
+    assert set(geofence.locate(52.07, 5.07)) == {'square', 'triangle'}
+    assert geofence.locate(53.0, 5.0) == ()
+
+    assert geofence.update(52.02, 5.02) == [(EVENT_ENTER, 'square')]
+    assert geofence.update(52.15, 5.06) == [(EVENT_EXIT, 'square'), (EVENT_ENTER, 'triangle')]
+    assert geofence.update(52.15, 5.06) == []
+
+def test_zone_needs_three_points():
+    with pytest.raises(ValueError):
+        Zone('line', SQUARE[:2])
+
+def test_load(tmp_path):
+    geofence = Geofence.load(write(tmp_path, {'zones': [{'id': 'square', 'polygon': SQUARE}]}))
+    assert [zone.id for zone in geofence.zones] == ['square']
+
+@pytest.mark.parametrize('data', [
+    '{"zones": [',
+    {'zones': [{'id': 'line', 'polygon': SQUARE[:2]}]},
+    {'zones': [{'polygon': SQUARE}]},
+    {'zones': [{'id': 'bad', 'polygon': [[52.0], [52.1], [52.2]]}]},
+    {'zones': [{'id': 'bad', 'polygon': 5}]},
+    [SQUARE],
+])
+def test_invalid_file_gives_no_zones(tmp_path, data):
+    assert not Geofence.load(write(tmp_path, data)).zones
+
+def test_missing_file_gives_no_zones(tmp_path):
+    assert not Geofence.load(str(tmp_path / 'missing.json')).zones
@@ -0,0 +1,52 @@
+"""
+Tests of the GPS fed from a file with recorded NMEA data
+"""
+import os
+import time
+
+from ingps import GPS
+
+TRACK = os.path.join(os.path.dirname(__file__), 'data', 'track.nmea')
+
+def test_read_one_fix_per_epoch():
+    with open(TRACK, 'rb') as uart:
+        gps = GPS(uart=uart, timeout=0.2)
+        latitudes = []
+        for _ in range(5):
+            fix = gps.read()
+            assert fix.valid and fix.coords_valid
+            assert fix.ticks is not None
+            latitudes.append(round(fix.lat, 6))
+
+    assert latitudes == sorted(set(latitudes))
+    assert list(fix.timestamp) == [10, 15, 47.0]
+
+def test_stale_fix_after_timeout():
+    with open(TRACK, 'rb') as uart:
+        gps = GPS(uart=uart, timeout=0.2)
+        for _ in range(5):
+            gps.update()
+        ticks = gps.fix_ticks
+
+        # End of the recording, the parser still holds the last fix
+        gps.update()
+        assert gps.fix.lat != 0
+        assert not gps.fix.valid
+        assert not gps.coords_valid
+        assert gps.fix.ticks is None
+        assert gps.fix_ticks == ticks
+
+def test_service_keeps_history():
+    with open(TRACK, 'rb') as uart:
+        gps = GPS(uart=uart, timeout=0.2)
+        gps.start_service(history=3, interval=10)
+        for _ in range(100):
+            if len(gps.service.history()) == 3:
+                break
+            time.sleep(0.01)
+        gps.stop_service()
+
+        history = gps.service.history()
+        assert len(history) == 3
+        assert all(fix.valid for fix in history)
+        assert [fix.lat for fix in history] == sorted(fix.lat for fix in history)
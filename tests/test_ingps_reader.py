@@ -0,0 +1,144 @@
+"""
+Tests of the GPS data reader with sentences split across reads
+"""
+import os
+import random
+
+from micropygps import MicropyGPS
+from ingps import DataReader
+from ingpsbench import PARSER_STATE
+from fakes import sentence, FakeUART, FakeGPSI2C
+
+TRACK = os.path.join(os.path.dirname(__file__), 'data', 'track.nmea')
+
+RMC = sentence('GNRMC,101543.000,A,5205.4712,N,00507.1238,E,0.21,112.40,200318,,,A')
+GGA = sentence('GNGGA,101543.000,5205.4712,N,00507.1238,E,1,11,0.92,12.6,M,47.0,M,,')
+GSA = sentence('GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1')
+STREAM = RMC + GSA + GGA
+
+def reader():
+    parser = MicropyGPS(location_formatting='dd')
+    return parser, DataReader(sentence_handler=parser.update_sentence)
+
+def test_sentences_reassembled_across_uart_reads():
+    for sizes in ((1,), (7,), (3, 50, 11), (255,)):
+        parser, datareader = reader()
+        datareader.start(uart=FakeUART(STREAM, sizes), timeout=1,
+                         gps_segments=['GPRMC', 'GPGGA', 'GPGSA'])
+
+        assert datareader.complete
+        assert datareader.sentences_complete == 3
+        assert datareader.sentences_dropped == 0
+        assert round(parser.latitude[0], 5) == 52.09119
+
+def test_i2c_padding_is_skipped():
+    parser, datareader = reader()
+    datareader.start(i2c=FakeGPSI2C(STREAM, sizes=(20, 90)), timeout=1,
+                     gps_segments=['GPRMC', 'GPGGA', 'GPGSA'])
+
+    assert datareader.complete
+    assert datareader.sentences_complete == 3
+    assert datareader.sentences_dropped == 0
+
+def test_cut_sentence_is_dropped():
+    parser, datareader = reader()
+    stream = RMC[:30] + GGA + RMC
+    datareader.start(uart=FakeUART(stream, (13,)), timeout=1,
+                     gps_segments=['GPRMC', 'GPGGA'])
+
+    assert datareader.complete
+    assert datareader.sentences_dropped == 1
+    assert datareader.sentences_complete == 2
+
+def test_required_sentences_end_the_read():
+    parser, datareader = reader()
+    uart = FakeUART(STREAM + GSA * 20, (16,))
+    datareader.start(uart=uart, timeout=1, required=('RMC', 'GGA'),
+                     epoch=lambda: parser.timestamp)
+
+    assert datareader.complete
+    assert not datareader.timed_out
+    assert uart.position < len(uart.data)
+
+def test_timeout_without_data():
+    parser, datareader = reader()
+    datareader.start(uart=FakeUART(b''), timeout=0.1)
+
+    assert datareader.timed_out
+    assert not datareader.complete
+
+def test_padding_within_sentence():
+    # The receiver had not finished writing the sentence at the first read
+    parser, datareader = reader()
+    datareader._read_buf[:20] = RMC[:10] + b'\n' * 10
+    datareader.feed(20)
+    datareader._read_buf[:len(RMC) - 10] = RMC[10:]
+    datareader.feed(len(RMC) - 10)
+
+    assert datareader.sentences_complete == 1
+    assert datareader.sentences_dropped == 0
+
+def test_sentence_cut_at_the_end_of_a_read():
+    parser, datareader = reader()
+    for data in (RMC[:30], GGA):
+        datareader._read_buf[:len(data)] = data
+        datareader.feed(len(data))
+
+    assert datareader.sentences_dropped == 1
+    assert datareader.sentences_complete == 1
+
+def test_long_line_is_dropped():
+    parser, datareader = reader()
+    stream = b'$GPTXT,' + b'1' * 200 + b'\r\n' + RMC
+    datareader.start(uart=FakeUART(stream, (255,)), timeout=0.2, gps_segments=['GPRMC'])
+
+    assert datareader.sentences_dropped == 1
+    assert datareader.sentences_complete == 1
+
+def test_data_after_the_end_is_kept():
+    parser, datareader = reader()
+    later = sentence('GNRMC,101544.000,A,5205.4715,N,00507.1238,E,0.21,112.40,200318,,,A') + \
+            sentence('GNGGA,101544.000,5205.4715,N,00507.1238,E,1,11,0.92,12.6,M,47.0,M,,')
+    uart = FakeUART(RMC + GGA + later, (255,))
+
+    datareader.start(uart=uart, timeout=1, required=('RMC', 'GGA'),
+                     epoch=lambda: parser.timestamp)
+    assert datareader.complete
+    assert parser.timestamp[2] == 43.0
+
+    # The next epoch was read with the first one and is parsed now
+    datareader.start(uart=uart, timeout=1, required=('RMC', 'GGA'),
+                     epoch=lambda: parser.timestamp)
+    assert datareader.complete
+    assert parser.timestamp[2] == 44.0
+    assert datareader.sentences_dropped == 0
+
+def test_random_splits_match_the_unsplit_parse():
+    with open(TRACK, 'rb') as f:
+        lines = f.readlines()
+    lines.append(RMC)
+
+    expected = MicropyGPS(location_formatting='dd')
+    for line in lines:
+        expected.update_sentence(line)
+
+    # With a cut sentence and a sentence which is too long, both dropped
+    stream = RMC[:30] + b''.join(lines[:-1]) + b'$GPTXT,' + b'1' * 200 + b'\r\n' + RMC
+
+    rng = random.Random(36)
+    for _ in range(20):
+        parser, datareader = reader()
+        position = 0
+        while position < len(stream):
+            # A chunk of the stream followed by I2C padding
+            size = rng.randint(1, 120)
+            padding = rng.choice((0, 0, rng.randint(1, 255 - size)))
+            chunk = stream[position:position + size] + b'\n' * padding
+            position += size
+            datareader._read_buf[:len(chunk)] = chunk
+            datareader.feed(len(chunk))
+
+        assert datareader.sentences_complete == expected.clean_sentences
+        assert datareader.sentences_dropped == 2
+        for name in PARSER_STATE:
+            assert getattr(parser, name) == getattr(expected, name), name
@@ -0,0 +1,30 @@
+"""
+Differential fuzzing of the NMEA parsers with the recorded corpus
+"""
+from micropygps import MicropyGPS
+from ingpsbench import corpus, fuzz, allocations, parse_characters, parse_sentences, \
+    parse_reader
+
+def test_corpus_is_reproducible():
+    assert corpus(50, seed=3) == corpus(50, seed=3)
+    assert corpus(50, seed=3) != corpus(50, seed=4)
+
+def test_corpus_parses():
+    parser = MicropyGPS()
+    parse_characters(parser, corpus(200))
+    assert parser.parsed_sentences > 0
+    assert parser.truncated_sentences > 0
+
+def test_sentences_match_characters():
+    assert fuzz(parse_sentences, rounds=50) == []
+
+def test_reader_matches_characters():
+    assert fuzz(parse_reader, rounds=50) == []
+
+def test_allocations_are_measured():
+    stream = corpus(50)
+    parser = MicropyGPS()
+    assert allocations(parse_sentences, parser, stream) > 0
+    assert parser.parsed_sentences > 0
+    assert allocations(parse_characters, MicropyGPS(), stream) > \
+        allocations(parse_sentences, MicropyGPS(), stream)
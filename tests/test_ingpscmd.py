@@ -0,0 +1,58 @@
+"""
+Tests of the GPS receiver command encoders against known messages
+"""
+import struct
+
+import ingpscmd
+from micropygps import MicropyGPS
+
+def test_pmtk_known_sentences():
+    assert ingpscmd.pmtk_test() == b'$PMTK000*32\r\n'
+    assert ingpscmd.pmtk_hot_start() == b'$PMTK101*32\r\n'
+    assert ingpscmd.pmtk_standby() == b'$PMTK161,0*28\r\n'
+    assert ingpscmd.pmtk_backup() == b'$PMTK225,4*2F\r\n'
+
+def test_pmtk_reference_position_time():
+    command = ingpscmd.pmtk_reference_position_time(52.091187, -5.118730, 12.6,
+                                                    (2018, 3, 20, 10, 15, 43))
+    assert command.startswith(b'$PMTK741,52.091187,-5.118730,12,2018,3,20,10,15,43*')
+
+    # The checksum is accepted by the NMEA parser
+    body, crc = command[1:-2].split(b'*')
+    assert int(crc, 16) == ingpscmd.nmea_checksum(body.decode())
+
+def test_nmea_checksum_accepted_by_parser():
+    parser = MicropyGPS()
+    parser.update_sentence(ingpscmd.nmea('GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1'))
+    assert parser.clean_sentences == 1
+
+def test_ubx_rxm_pmreq_known_message():
+    assert ingpscmd.ubx_rxm_pmreq() == bytes.fromhex('b562024108000000000002000000' '4d3b')
+
+def unpack_ubx(message):
+    assert message[:2] == ingpscmd.UBX_SYNC
+    cls, msg_id, length = struct.unpack('<BBH', message[2:6])
+    assert len(message) == 8 + length
+    assert bytes(ingpscmd.ubx_checksum(message[2:-2])) == message[-2:]
+    return (cls, msg_id), message[6:-2]
+
+def test_ubx_aid_ini():
+    message, payload = unpack_ubx(ingpscmd.ubx_aid_ini(52.091187, -5.11873, 12.6,
+                                                       (2018, 3, 20, 10, 15, 43)))
+    assert message == ingpscmd.UBX_AID_INI
+    assert len(payload) == 48
+
+    fields = struct.unpack('<iiiIHHIiIIiII', payload)
+    assert fields[0:3] == (520911870, -51187300, 1260)
+    assert fields[5:7] == (1803, 20101543)
+    assert fields[12] == 0x423
+
+def test_ubx_mga_ini():
+    message, payload = unpack_ubx(ingpscmd.ubx_mga_ini_pos_llh(52.091187, -5.11873, 12.6))
+    assert message == ingpscmd.UBX_MGA_INI
+    assert struct.unpack('<BBHiiiI', payload) == (1, 0, 0, 520911870, -51187300, 1260, 10000)
+
+    message, payload = unpack_ubx(ingpscmd.ubx_mga_ini_time_utc((2018, 3, 20, 10, 15, 43)))
+    assert message == ingpscmd.UBX_MGA_INI
+    assert len(payload) == 24
+    assert struct.unpack('<BBBbHBBBBBx', payload[:12]) == (0x10, 0, 0, -128, 2018, 3, 20, 10, 15, 43)
@@ -0,0 +1,84 @@
+"""
+Tests of the GPS power management on a fake receiver
+"""
+import pytest
+
+import ingpscmd
+import ingpspower
+from ingps import RECEIVER_MTK, RECEIVER_UBLOX
+from ingpspower import GPSPowerManager, LIS2HH12Motion
+from fakes import FakeGPS, FakeFix
+
+def simulate(manager, gps, cycles=100, moving=range(40, 50)):
+    """
+    Run the power manager on a receiver which moves 100m per cycle in the
+    moving cycles, returns the cycles with a read
+    """
+    lat = 52.0
+    reads = []
+    for cycle in range(cycles):
+        if cycle in moving:
+            lat += 0.0009
+        if manager.should_read():
+            gps.fix = FakeFix(lat, 5.0)
+            manager.read_done()
+            reads.append(cycle)
+    return reads
+
+def test_static_receiver_skips_and_sleeps():
+    gps = FakeGPS(RECEIVER_MTK)
+    manager = GPSPowerManager(gps, max_skip=10)
+    reads = simulate(manager, gps)
+
+    assert manager.reads + manager.skips == 100
+    assert manager.reads < 30
+    assert manager.sleeps > 0
+    assert manager.saved_ms == manager.skips * 3000
+    assert ingpscmd.pmtk_standby() in gps.commands
+    assert ingpscmd.pmtk_test() in gps.commands
+
+    # Every cycle of the movement is read once it is noticed
+    assert set(range(42, 50)) <= set(reads)
+
+def test_skips_grow_up_to_max_skip():
+    gps = FakeGPS(RECEIVER_MTK)
+    manager = GPSPowerManager(gps, max_skip=4)
+    reads = simulate(manager, gps, cycles=40, moving=())
+
+    gaps = [b - a for a, b in zip(reads, reads[1:])]
+    assert gaps[:3] == [2, 3, 5]
+    assert max(gaps) == 5
+
+def test_ublox_sleeps_with_power_management_request():
+    gps = FakeGPS(RECEIVER_UBLOX)
+    manager = GPSPowerManager(gps, cycle_ms=60000)
+    simulate(manager, gps, cycles=3, moving=())
+
+    assert gps.commands[0][2:4] == bytes(ingpscmd.UBX_RXM_PMREQ)
+    assert not any(command.startswith(b'$') for command in gps.commands)
+
+class Accelerometer(object):
+    def __init__(self):
+        self.values = [(0.0, 0.0, 1.0)]
+
+    def acceleration(self):
+        return self.values.pop(0) if len(self.values) > 1 else self.values[0]
+
+@pytest.mark.parametrize('receiver, wake', [(RECEIVER_MTK, ingpscmd.pmtk_test()),
+                                             (RECEIVER_UBLOX, ingpscmd.ubx_wake())])
+def test_motion_reads_again(monkeypatch, receiver, wake):
+    monkeypatch.setattr(ingpspower, 'UBLOX_WAKE_TIME', 0)
+    accelerometer = Accelerometer()
+    gps = FakeGPS(receiver)
+    manager = GPSPowerManager(gps, motion=LIS2HH12Motion(accelerometer), max_skip=10)
+    simulate(manager, gps, cycles=20, moving=())
+
+    # Skipping while static
+    while manager.should_read():
+        manager.read_done()
+
+    # The receiver sleeps, motion wakes it up before the next read
+    del gps.commands[:]
+    accelerometer.values = [(0.3, 0.0, 1.0)]
+    assert manager.should_read()
+    assert gps.commands == [wake]
@@ -0,0 +1,84 @@
+"""
+Tests of the managed I2C bus on the fake bus
+"""
+import pytest
+
+import bme280
+from ini2c import I2CBus
+from fakes import FakeI2C, FakeBME280, FakeTSL2561
+
+def test_scan_is_cached():
+    i2c = FakeI2C([FakeBME280(), FakeTSL2561()])
+    bus = I2CBus(i2c)
+    assert bus.scan() == [0x39, 0x76]
+
+    i2c.devices.pop(0x39)
+    assert bus.scan() == [0x39, 0x76]
+    assert bus.scan(refresh=True) == [0x76]
+
+def test_nack_is_retried():
+    device = FakeBME280()
+    bus = I2CBus(FakeI2C([device]), retries=2, backoff=1)
+
+    device.nacks = 2
+    assert bus.readfrom_mem(0x76, 0xD0, 1) == b'\x60'
+    statistics = bus.statistics[0x76]
+    assert statistics.transactions == 3
+    assert statistics.retries == 2
+    assert statistics.errors == 0
+
+def test_error_after_all_retries():
+    device = FakeBME280()
+    bus = I2CBus(FakeI2C([device]), retries=1, backoff=1)
+
+    device.nacks = 2
+    with pytest.raises(OSError):
+        bus.writeto_mem(0x76, 0xF4, b'\x00')
+    assert bus.statistics[0x76].errors == 1
+
+    with pytest.raises(OSError):
+        bus.readfrom(0x10, 10)
+    assert bus.statistics[0x10].transactions == 2
+
+def test_methods_reach_the_device():
+    device = FakeBME280()
+    bus = I2CBus(FakeI2C([device]))
+
+    buf = bytearray(1)
+    bus.readfrom_mem_into(0x76, 0xD0, buf)
+    assert buf == b'\x60'
+
+    bus.writeto(0x76, b'\x01')
+    device.stream = b'$GP'
+    assert bus.readfrom(0x76, 5) == b'$GP\n\n'
+    buf = bytearray(2)
+    bus.readfrom_into(0x76, buf)
+    assert buf == b'\n\n'
+    assert device.writes == [(None, b'\x01')]
+
+def test_read_registers_holds_the_bus():
+    i2c = FakeI2C([FakeBME280()])
+    bus = I2CBus(i2c)
+    locked = []
+    readfrom_mem_into = i2c.readfrom_mem_into
+
+    def check_lock(address, register, buf):
+        locked.append(bus.lock.locked())
+        readfrom_mem_into(address, register, buf)
+
+    i2c.readfrom_mem_into = check_lock
+    first = bytearray(2)
+    second = bytearray(1)
+    bus.read_registers(0x76, ((0x88, first), (0xD0, second)))
+
+    assert locked == [True, True]
+    assert second == b'\x60'
+    assert not bus.lock.locked()
+
+def test_bme280_reads_calibration_in_one_locked_read():
+    i2c = FakeI2C([FakeBME280()])
+    bus = I2CBus(i2c)
+    sensor = bme280.BME280(i2c=bus)
+
+    assert (sensor.dig_T1, sensor.dig_T2, sensor.dig_T3) == (27504, 26435, -1000)
+    assert (sensor.dig_H1, sensor.dig_H2, sensor.dig_H4, sensor.dig_H5) == (75, 362, 324, 50)
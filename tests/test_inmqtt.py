@@ -0,0 +1,108 @@
+"""
+Tests of the MQTT publish pipeline against the broker stand-in
+"""
+import time
+
+from inmqtt import PublishPipeline, encode_publish, puback_id, PACKET_ID_FIRST
+from mqttbroker import Broker, decode_publish
+
+def pipeline(broker, size=4, timeout=0.2, retries=3):
+    publisher = PublishPipeline(broker.send, size=size, timeout=timeout, retries=retries)
+    broker.receive = publisher.received
+    return publisher
+
+def test_encode_publish_round_trip():
+    packet = encode_publish('topic/a', 'x' * 200, 0x8001, dup=True)
+    assert decode_publish(packet) == ('topic/a', 'x' * 200, 0x8001, True)
+
+def test_puback_id():
+    assert puback_id(b'\x40\x02\x80\x01') == 0x8001
+    assert puback_id(b'\x90\x03\x00\x01\x01') is None
+
+def test_publishes_stay_in_flight():
+    broker = Broker(latency_ms=100)
+    publisher = pipeline(broker)
+    results = []
+
+    start = time.monotonic()
+    for index in range(4):
+        assert publisher.publish('t', str(index), lambda p, ok: results.append((p, ok)))
+    assert time.monotonic() - start < 0.1
+    assert len(publisher.window) == 4
+
+    assert publisher.flush(timeout=2)
+    assert results == [(str(index), True) for index in range(4)]
+    ids = [packet_id for _, _, packet_id, _ in broker.published]
+    assert len(set(ids)) == 4
+    assert min(ids) >= PACKET_ID_FIRST
+
+def test_full_window_waits_for_acknowledge():
+    broker = Broker(latency_ms=50)
+    publisher = pipeline(broker, size=2)
+
+    start = time.monotonic()
+    for index in range(3):
+        publisher.publish('t', str(index))
+    assert time.monotonic() - start >= 0.04
+    assert publisher.flush(timeout=2)
+
+def test_retransmit_uses_same_packet_id_with_dup():
+    broker = Broker(drop=[(PACKET_ID_FIRST, 1)])
+    publisher = pipeline(broker, timeout=0.05)
+    results = []
+
+    publisher.publish('t', 'a', lambda p, ok: results.append(ok))
+    assert publisher.flush(timeout=2)
+
+    assert [(packet_id, dup) for _, _, packet_id, dup in broker.published] == \
+           [(PACKET_ID_FIRST, False), (PACKET_ID_FIRST, True)]
+    assert results == [True]
+
+def test_late_puback_completes_publish():
+    broker = Broker(latency_ms=150)
+    publisher = pipeline(broker, timeout=0.05)
+    results = []
+
+    publisher.publish('t', 'a', lambda p, ok: results.append(ok))
+    assert publisher.flush(timeout=2)
+    broker.wait()
+
+    # Retransmitted before the first PUBACK arrived, which completed it
+    assert broker.published[1][3]
+    assert results == [True]
+    assert len(publisher.window) == 0
+
+def test_gives_up_after_retries():
+    drop = [(PACKET_ID_FIRST, attempt) for attempt in range(1, 5)]
+    broker = Broker(drop=drop)
+    publisher = pipeline(broker, timeout=0.02, retries=2)
+    results = []
+
+    publisher.publish('t', 'a', lambda p, ok: results.append(ok))
+    assert publisher.flush(timeout=2)
+    assert len(broker.published) == 3
+    assert results == [False]
+    assert publisher.window.take_latency() is None
+
+def test_latency_is_taken_once():
+    broker = Broker(latency_ms=20)
+    publisher = pipeline(broker)
+
+    publisher.publish('t', 'a')
+    assert publisher.flush(timeout=2)
+    assert publisher.window.take_latency() >= 20
+    assert publisher.window.take_latency() is None
+
+def test_foreign_packets_are_passed_on():
+    broker = Broker()
+    publisher = pipeline(broker)
+    assert not publisher.received(b'\x40\x02\x00\x01')
+    assert not publisher.received(b'\x90\x03\x00\x01\x01')
+    # Not in flight, like a PUBACK of a packet of the library
+    assert not publisher.received(b'\x40\x02\x80\x05')
+
+    publisher.publish('t', 'a')
+    broker.wait()
+    assert len(publisher.window) == 1
+    publisher.service()
+    assert len(publisher.window) == 0
@@ -0,0 +1,61 @@
+"""
+Tests of the WLAN connect phase with access points which never join
+"""
+import time
+
+import pytest
+
+import innetwork
+import innvram
+from innetwork import WLANNetwork, NetworkError, REASON_JOIN_TIMEOUT
+from fakes import FakeNet, FakeWLAN
+
+class StuckWLAN(FakeWLAN):
+    nets = [FakeNet('office', bytes([0, 1, 2, 3, 4, index]), -50 - index)
+            for index in range(4)]
+    instances = []
+
+    def __init__(self, mode=None, antenna=None):
+        super(StuckWLAN, self).__init__(mode, antenna)
+        StuckWLAN.instances.append(self)
+
+@pytest.fixture(autouse=True)
+def stuck_wlan(monkeypatch):
+    monkeypatch.setattr(innvram, '_memory', dict())
+    monkeypatch.setattr(innetwork, 'WLAN', StuckWLAN)
+    StuckWLAN.instances = []
+
+def test_connect_phase_is_bounded():
+    feeds = []
+    network = WLANNetwork(profiles=[('office', 'key', 0)], connect_timeout=200,
+                          phase_timeout=300, feed=lambda: feeds.append(1))
+
+    start = time.monotonic()
+    with pytest.raises(NetworkError) as error:
+        network.connect()
+    elapsed = time.monotonic() - start
+
+    assert error.value.reason == REASON_JOIN_TIMEOUT
+    # The ticks have millisecond resolution
+    assert 0.29 <= elapsed < 0.4
+    assert 300 <= error.value.elapsed_ms < 400
+
+    # The second join gets the time left, the others are not tried
+    joins = StuckWLAN.instances[0].joins
+    assert len(joins) == 2
+    assert joins[0][1] == 200
+    assert joins[1][1] <= 100
+    assert feeds
+
+def test_cached_access_point_within_the_phase():
+    network = WLANNetwork(profiles=[('office', 'key', 0)], connect_timeout=200,
+                          phase_timeout=150)
+    network.ssid = 'office'
+    network._store_access_point(StuckWLAN.nets[0].bssid, 1, 3)
+
+    with pytest.raises(NetworkError):
+        network.connect()
+
+    # The fast connect used the whole phase, no scan results were tried
+    joins = StuckWLAN.instances[0].joins
+    assert len(joins) == 1 and joins[0][1] == 150
@@ -0,0 +1,47 @@
+"""
+Tests of the position estimator with noisy fixes of a static receiver.
+The fixes in static_fixes.csv have an error of 5m times the HDOP, three
+multipath outliers of 150m and a move of 200m north after 90 fixes
+"""
+import os
+
+from ingeo import distance
+from inposition import PositionEstimator
+
+FIXES = os.path.join(os.path.dirname(__file__), 'data', 'static_fixes.csv')
+LATITUDE = 52.091187
+LONGITUDE = 5.118730
+
+def fixes():
+    with open(FIXES) as f:
+        for line in f:
+            if not line.startswith('#'):
+                ticks, latitude, longitude, hdop, satellites = line.split(',')
+                yield int(ticks), float(latitude), float(longitude), float(hdop), int(satellites)
+
+def test_estimate_is_better_than_the_fixes():
+    estimator = PositionEstimator(process_noise=0.05)
+    raw_errors = []
+    for ticks, latitude, longitude, hdop, satellites in list(fixes())[:90]:
+        estimator.update(latitude, longitude, hdop=hdop, satellites=satellites, ticks=ticks)
+        raw_errors.append(distance(LATITUDE, LONGITUDE, latitude, longitude))
+
+    error = distance(LATITUDE, LONGITUDE, estimator.latitude, estimator.longitude)
+    assert error < 3
+    assert error < sum(raw_errors) / len(raw_errors) / 3
+    assert estimator.accuracy < 5
+    assert estimator.rejected >= 3
+
+def test_same_fix_is_used_once():
+    estimator = PositionEstimator()
+    assert estimator.update(LATITUDE, LONGITUDE, hdop=1.0, satellites=8, ticks=1000)
+    assert not estimator.update(LATITUDE, LONGITUDE, hdop=1.0, satellites=8, ticks=1000)
+    assert estimator.updates == 1
+
+def test_move_restarts_the_estimate():
+    estimator = PositionEstimator(process_noise=0.05)
+    for ticks, latitude, longitude, hdop, satellites in fixes():
+        estimator.update(latitude, longitude, hdop=hdop, satellites=satellites, ticks=ticks)
+
+    moved = distance(LATITUDE, LONGITUDE, estimator.latitude, estimator.longitude)
+    assert 190 < moved < 210
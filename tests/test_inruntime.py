@@ -0,0 +1,68 @@
+"""
+Tests of the runtime configuration
+"""
+import json
+import types
+
+from inruntime import RuntimeConfig, MAX_SCAN_TIME_IN_SECONDS
+
+def runtime(tmp_path, persisted=None):
+    path = str(tmp_path / 'runtime.json')
+    if persisted is not None:
+        with open(path, 'w') as f:
+            f.write(persisted if isinstance(persisted, str) else json.dumps(persisted))
+
+    config = types.SimpleNamespace(SCAN_TIME_IN_SECONDS=60, GPS_POSITION_NOISE=1.0)
+    return config, RuntimeConfig(config=config, path=path)
+
+def test_update_is_applied_and_persisted(tmp_path):
+    config, runtime_config = runtime(tmp_path)
+    assert runtime_config.update('{"state": {"SCAN_TIME_IN_SECONDS": 120}}')
+    assert config.SCAN_TIME_IN_SECONDS == 120
+
+    config, runtime_config = runtime(tmp_path)
+    runtime_config.load()
+    assert config.SCAN_TIME_IN_SECONDS == 120
+
+def test_invalid_update_is_rejected(tmp_path):
+    config, runtime_config = runtime(tmp_path)
+    assert not runtime_config.update('{"SCAN_TIME_IN_SECONDS": 5}')
+    assert not runtime_config.update('{"UNKNOWN": 5}')
+    assert not runtime_config.update('not json')
+    assert config.SCAN_TIME_IN_SECONDS == 60
+
+def test_removed_setting_is_dropped_on_load(tmp_path):
+    config, runtime_config = runtime(tmp_path, {'GPS_COORD_DIFF_UPDATE_RULE': 3,
+                                                'SCAN_TIME_IN_SECONDS': 90,
+                                                'GPS_POSITION_NOISE': 500.0})
+    runtime_config.load()
+    assert config.SCAN_TIME_IN_SECONDS == 90
+    assert config.GPS_POSITION_NOISE == 1.0
+
+    with open(runtime_config.path) as f:
+        assert json.load(f) == {'SCAN_TIME_IN_SECONDS': 90}
+
+def test_corrupt_file_is_ignored(tmp_path):
+    config, runtime_config = runtime(tmp_path, '{"SCAN_TIME')
+    runtime_config.load()
+    assert config.SCAN_TIME_IN_SECONDS == 60
+
+    assert runtime_config.update('{"SCAN_TIME_IN_SECONDS": 30}')
+    with open(runtime_config.path) as f:
+        assert json.load(f) == {'SCAN_TIME_IN_SECONDS': 30}
+
+def test_scan_time_within_watchdog(tmp_path):
+    config, runtime_config = runtime(tmp_path)
+    assert runtime_config.update('{"SCAN_TIME_IN_SECONDS": %d}' % MAX_SCAN_TIME_IN_SECONDS)
+    assert not runtime_config.update('{"SCAN_TIME_IN_SECONDS": 3600}')
+    assert config.SCAN_TIME_IN_SECONDS == MAX_SCAN_TIME_IN_SECONDS
+    assert MAX_SCAN_TIME_IN_SECONDS < 300
+
+def test_scan_time_beyond_watchdog_is_dropped_on_load(tmp_path):
+    # Persisted by a version which allowed longer scans
+    config, runtime_config = runtime(tmp_path, {'SCAN_TIME_IN_SECONDS': 3600})
+    runtime_config.load()
+    assert config.SCAN_TIME_IN_SECONDS == 60
+
+    with open(runtime_config.path) as f:
+        assert json.load(f) == {}
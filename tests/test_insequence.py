@@ -0,0 +1,39 @@
+"""
+Tests of the message sequence tracker
+"""
+from insequence import SequenceTracker
+
+def message(seq, boot_id=1, device_id='dev'):
+    msg = {'devId': device_id, 'bootId': boot_id}
+    if seq is not None:
+        msg['seq'] = seq
+    return msg
+
+def test_duplicates_and_gaps():
+    tracker = SequenceTracker()
+    assert tracker.check(message(0)) == 'new'
+    assert tracker.check(message(1)) == 'new'
+    assert tracker.check(message(1)) == 'duplicate'
+    assert tracker.check(message(4)) == 'gap'
+    assert tracker.missing('dev') == [2, 3]
+    assert tracker.lost == 2
+
+    # Late arrival of a message counted as lost
+    assert tracker.check(message(2)) == 'new'
+    assert tracker.missing('dev') == [3]
+    assert tracker.lost == 1
+    assert tracker.duplicates == 1
+
+def test_reset_skips_reserved_block():
+    tracker = SequenceTracker()
+    tracker.check(message(10))
+    assert tracker.check(message(64, boot_id=2)) == 'new'
+    assert tracker.lost == 0
+
+def test_message_without_sequence():
+    tracker = SequenceTracker()
+    assert tracker.check(message(None)) == 'unsequenced'
+    assert tracker.check(message(0)) == 'new'
+    assert tracker.check(message(None)) == 'unsequenced'
+    assert tracker.unsequenced == 2
+    assert tracker.duplicates == 0
@@ -0,0 +1,68 @@
+"""
+Tests of the time service synchronization and drift estimate
+"""
+import pytest
+
+import innvram
+import intime
+from intime import TimeService, SOURCE_NTP, NVRAM_TIME_DRIFT, NVRAM_TIME_SOURCE, \
+    NVRAM_TIME_SYNCED
+from fakes import FakeRTC, FakeNTP
+
+# 2024-01-01
+NOW = 1704067200
+
+@pytest.fixture(autouse=True)
+def nvram(monkeypatch):
+    monkeypatch.setattr(innvram, '_memory', dict())
+
+def synced_before(seconds):
+    innvram.store(NVRAM_TIME_SOURCE, SOURCE_NTP)
+    innvram.store(NVRAM_TIME_SYNCED, NOW - seconds)
+
+def test_no_drift_after_cold_boot(monkeypatch):
+    synced_before(3600)
+    rtc = FakeRTC(0)  # Power on reset
+    rtc.install(monkeypatch)
+
+    time_service = TimeService(ntp=FakeNTP(rtc, NOW), rtc=rtc)
+    time_service.start()
+
+    assert time_service.source == SOURCE_NTP
+    assert time_service.is_valid
+    assert time_service.drift_ppm == 0
+    assert innvram.load(NVRAM_TIME_DRIFT) is None
+
+def test_cold_boot_without_ntp(monkeypatch):
+    synced_before(3600)
+    rtc = FakeRTC(0)
+    rtc.install(monkeypatch)
+
+    time_service = TimeService(ntp=FakeNTP(rtc, NOW, fails=True), rtc=rtc)
+    time_service.start()
+    assert not time_service.is_valid
+
+def test_drift_on_warm_boot(monkeypatch):
+    synced_before(10000)
+    rtc = FakeRTC(NOW)
+    rtc.install(monkeypatch)
+
+    time_service = TimeService(ntp=FakeNTP(rtc, 1), rtc=rtc)
+    time_service.start()
+    time_service.service()
+
+    assert time_service.drift_ppm == 99
+    assert innvram.load_signed(NVRAM_TIME_DRIFT) == 99
+
+def test_implausible_drift_is_ignored(monkeypatch):
+    synced_before(10000)
+    rtc = FakeRTC(NOW)
+    rtc.install(monkeypatch)
+
+    time_service = TimeService(ntp=FakeNTP(rtc, 100), rtc=rtc)
+    time_service.start()
+    time_service.service()
+
+    assert abs(100 * 1000000 // 10100) > intime.MAX_DRIFT_PPM
+    assert time_service.drift_ppm == 0
+    assert time_service.source == SOURCE_NTP
@@ -0,0 +1,51 @@
+"""
+Tests of the satellites in view of a multi-GNSS receiver
+"""
+import os
+
+from micropygps import MicropyGPS
+
+MULTI_GNSS = os.path.join(os.path.dirname(__file__), 'data', 'multignss.nmea')
+
+def parse(path, limit=None):
+    parser = MicropyGPS()
+    with open(path, 'rb') as f:
+        lines = f.readlines()[:limit]
+    for line in lines:
+        assert parser.update_sentence(line)
+    return parser
+
+def test_satellites_per_talker():
+    parser = parse(MULTI_GNSS)
+
+    assert parser.satellites_in_view_by_talker == {'GP': 10, 'GL': 6, 'GA': 3, 'GN': 2}
+    assert parser.satellites_in_view == 21
+    assert sorted(parser.satellite_data_by_talker['GP']) == [1, 2, 3, 12, 14, 18, 22, 25, 31, 32]
+    assert sorted(parser.satellite_data_by_talker['GL']) == [65, 66, 72, 79, 81, 88]
+    assert parser.satellite_data_by_talker['GL'][79] == (8, 300, None)
+    assert parser.satellite_data_by_talker['GA'][1] == (52, 110, 38)
+
+def test_merged_satellites_keep_overlapping_prns():
+    parser = parse(MULTI_GNSS)
+
+    # PRN 1 and 4 of Galileo overlap with GPS and the combined talker
+    assert len(parser.satellite_data) == 21
+    assert parser.satellite_data[('GP', 1)] == (40, 83, 46)
+    assert parser.satellite_data[('GA', 1)] == (52, 110, 38)
+    assert parser.satellite_data[('GN', 4)] == (45, 200, 36)
+    assert ('GA', 4) in parser.satellites_visible()
+
+def test_interleaved_groups_complete_per_talker():
+    # Up to the first GLGSV: the Galileo group completed within the
+    # GPS and GLONASS groups
+    parser = parse(MULTI_GNSS, limit=6)
+    assert parser.satellite_data_updated('GA')
+    assert not parser.satellite_data_updated('GP')
+    assert not parser.satellite_data_updated('GL')
+    assert not parser.satellite_data_updated()
+
+    parser = parse(MULTI_GNSS, limit=8)
+    assert parser.satellite_data_updated('GP')
+    assert parser.satellite_data_updated('GL')
+    assert parser.satellite_data_updated()
+    assert len(parser.satellite_data) == 19
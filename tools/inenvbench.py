@@ -0,0 +1,64 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,E1101
+
+"""
+InnovateNow environment sensor benchmark.
+Times a reading of one conversion with read() against the three separate
+BME280 properties on the fake I2C bus of the tests. Runs on the host with
+PYTHONPATH=lib:tests python3 tools/inenvbench.py
+"""
+import time
+
+from inenvsensor import Environment
+from fakes import FakeI2C, FakeBME280
+
+def benchmark(count=100):
+    """
+    Return the microseconds and I2C transactions of a reading with read()
+    and with the three separate BME280 properties
+    """
+    i2c = FakeI2C([FakeBME280()])
+    environment = Environment(i2c=i2c)
+    sensor = environment.bme280
+
+    transactions = i2c.transactions
+    start = time.ticks_us()
+    for _ in range(count):
+        environment.read()
+    read_us = time.ticks_diff(time.ticks_us(), start) // count
+    read_transactions = (i2c.transactions - transactions) // count
+
+    transactions = i2c.transactions
+    start = time.ticks_us()
+    for _ in range(count):
+        _ = (sensor.temperature, sensor.humidity, sensor.pressure)
+    properties_us = time.ticks_diff(time.ticks_us(), start) // count
+    properties_transactions = (i2c.transactions - transactions) // count
+
+    return read_us, read_transactions, properties_us, properties_transactions
+
+
+if __name__ == '__main__':
+    # MicroPython ticks on the host
+    if not hasattr(time, 'ticks_ms'):
+        import inticks  # pylint: disable=W0611
+    print('read {}us with {} transactions, properties {}us with {} transactions'.format(
+        *benchmark()))
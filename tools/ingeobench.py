@@ -0,0 +1,61 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,E1101
+
+"""
+InnovateNow geodesy benchmark.
+Runs on the host with PYTHONPATH=lib python3 tools/ingeobench.py or on the
+device when copied next to the lib modules.
+"""
+import math
+import time
+
+from array import array
+
+import ingeo
+
+def benchmark(count=200):
+    """
+    Print the error of the equirectangular fast path against haversine and
+    the time per distance of the functions over a range of distances
+    """
+    lat, lon = 52.0, 5.0
+    for meters in (10, 100, 1000, 10000, 100000, 1000000):
+        offset = meters / (ingeo.EARTH_RADIUS * math.pi / 180) / math.sqrt(2)
+        lats = array('f', [lat + offset * (i % 7) / 6 for i in range(count)])
+        lons = array('f', [lon + offset * (i % 5) / 4 for i in range(count)])
+        out = array('f', bytearray(4 * count))
+
+        results = []
+        for function in (ingeo.haversine_many, ingeo.equirectangular_many):
+            start = time.ticks_us()
+            function(lat, lon, lats, lons, out)
+            results.append((time.ticks_diff(time.ticks_us(), start) / count, array('f', out)))
+
+        error = max(abs(a - b) / a for a, b in zip(results[0][1], results[1][1]) if a)
+        print('{:>8}m haversine {:.1f}us equirectangular {:.1f}us max error {:.4f}%'.format(
+            meters, results[0][0], results[1][0], error * 100))
+
+
+if __name__ == '__main__':
+    # MicroPython ticks on the host
+    if not hasattr(time, 'ticks_ms'):
+        import inticks  # pylint: disable=W0611
+    benchmark()
@@ -0,0 +1,253 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=E0401,E1101,W0212
+
+"""
+InnovateNow NMEA parser benchmark and differential fuzzing.
+Runs on the host with PYTHONPATH=lib python3 tools/ingpsbench.py or on the
+device when copied next to the lib modules.
+"""
+import gc
+import time
+
+from micropygps import MicropyGPS
+
+# Parser state compared between the reference and a candidate parser
+PARSER_STATE = ('latitude', 'longitude', 'timestamp', 'date', 'speed', 'course',
+                'altitude', 'geoid_height', 'satellites_in_view', 'satellites_in_use',
+                'satellites_used', 'satellite_data', 'satellite_data_by_talker',
+                'satellites_in_view_by_talker', 'last_sv_sentence', 'total_sv_sentences',
+                'hdop', 'pdop', 'vdop', 'valid', 'fix_stat', 'fix_type',
+                'clean_sentences', 'parsed_sentences', 'truncated_sentences')
+
+# Recorded sentences of a Quectel L76-L and u-blox NEO-6M
+RECORDED = (
+    'GPRMC,081836.00,A,3751.65,S,14507.36,E,000.0,360.0,130998,011.3,E',
+    'GPGGA,081836.00,3751.65,S,14507.36,E,1,07,1.1,397.4,M,-32.6,M,,0000',
+    'GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1',
+    'GPGSV,2,1,08,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45',
+    'GPGSV,2,2,08,18,50,074,40,22,05,139,,25,33,270,42,31,56,209,44',
+    'GPVTG,054.7,T,034.4,M,005.5,N,010.2,K',
+    'GPGLL,4916.45,N,12311.12,W,225444,A',
+    'GNRMC,101543.000,A,5205.4712,N,00507.1238,E,0.21,112.40,200318,,,A',
+    'GNGGA,101543.000,5205.4712,N,00507.1238,E,1,11,0.92,12.6,M,47.0,M,,',
+    'GLGSV,1,1,04,65,44,073,32,72,23,027,28,81,61,258,,88,37,162,30',
+    'GPTXT,01,01,02,ANTSTATUS=OPEN',
+)
+
+
+class _Random(object):
+    """
+    Small linear congruential generator, so the corpus is the same on
+    MicroPython and CPython
+    """
+
+    def __init__(self, seed=1):
+        self.state = seed
+
+    def next(self, limit):
+        """
+        Return a number from 0 up to limit
+        """
+        self.state = (self.state * 1103515245 + 12345) & 0x7fffffff
+        return (self.state >> 8) % limit
+
+
+def sentence(body, crc=None):
+    """
+    Return the sentence for the body with its checksum as bytes
+    """
+    if crc is None:
+        crc = 0
+        for c in body.encode():
+            crc ^= c
+
+    return '${}*{:02X}\r\n'.format(body, crc).encode()
+
+
+def corpus(count=1000, seed=1):
+    """
+    Return a stream of recorded sentences with synthetic variations and
+    malformed sentences: a bad checksum, missing fields with a valid
+    checksum, a line past SENTENCE_LIMIT, a sentence cut before the end of
+    its checksum and a missing checksum
+    """
+    random = _Random(seed)
+    stream = []
+    for _ in range(count):
+        body = RECORDED[random.next(len(RECORDED))]
+        kind = random.next(10)
+
+        if kind == 0:
+            stream.append(sentence(body, crc=random.next(256)))
+        elif kind == 1:
+            fields = body.split(',')
+            stream.append(sentence(','.join(fields[:random.next(len(fields)) + 1])))
+        elif kind == 2:
+            stream.append(sentence(body + ',' * (MicropyGPS.SENTENCE_LIMIT - len(body))))
+        elif kind == 3:
+            line = sentence(body)
+            stream.append(line[:random.next(len(line) - 4) + 1])
+        elif kind == 4:
+            stream.append(('$' + body + '\r\n').encode())
+        else:
+            # Vary the digits of the numeric fields
+            fields = body.split(',')
+            index = random.next(len(fields))
+            field = fields[index]
+            if field and field.replace('.', '').isdigit():
+                fields[index] = ''.join(str(random.next(10)) if c.isdigit() else c for c in field)
+            stream.append(sentence(','.join(fields)))
+
+    return b''.join(stream)
+
+
+def parse_characters(parser, stream):
+    """
+    Reference: feed the stream character by character
+    """
+    for c in stream.decode():
+        parser.update(c)
+
+
+def parse_sentences(parser, stream):
+    """
+    Candidate: hand each sentence to update_sentence, a $ starts a new
+    sentence like in the reference
+    """
+    for line in stream.split(b'$'):
+        parser.update_sentence(b'$' + line)
+
+
+def parse_reader(parser, stream, seed=1):
+    """
+    Candidate: feed the stream to the GPS data reader in random chunks
+    """
+    from ingps import DataReader
+
+    random = _Random(seed)
+    reader = DataReader(sentence_handler=parser.update_sentence)
+    buf = reader._read_buf
+    position = 0
+    while position < len(stream):
+        size = min(random.next(len(buf)) + 1, len(stream) - position)
+        buf[:size] = stream[position:position + size]
+        reader.feed(size)
+        position += size
+
+
+def state(parser):
+    """
+    Return the compared state of the parser
+    """
+    return [getattr(parser, name) for name in PARSER_STATE]
+
+
+def fuzz(candidate=parse_sentences, rounds=100, count=50):
+    """
+    Parse corpora with the reference and the candidate parser and return the
+    corpora after which the parser states differ
+    """
+    differences = []
+    for seed in range(1, rounds + 1):
+        stream = corpus(count, seed)
+        reference = MicropyGPS()
+        parser = MicropyGPS()
+        parse_characters(reference, stream)
+        candidate(parser, stream)
+
+        expected = state(reference)
+        found = state(parser)
+        for i, name in enumerate(PARSER_STATE):
+            if expected[i] != found[i]:
+                differences.append((seed, name, expected[i], found[i]))
+
+    return differences
+
+
+def allocations(parse, parser, stream):
+    """
+    Return the bytes allocated while parsing the stream. On MicroPython
+    gc.mem_alloc measures the whole parse. On CPython tracemalloc measures
+    the peak of every call of the parser, so the allocations of the
+    benchmark loop itself are not included
+    """
+    gc.collect()
+    if hasattr(gc, 'mem_alloc'):
+        # The collector is disabled so freed memory does not hide allocations
+        gc.disable()
+        allocated = gc.mem_alloc()
+        parse(parser, stream)
+        allocated = gc.mem_alloc() - allocated
+        gc.enable()
+        return allocated
+
+    import tracemalloc
+    allocated = [0]
+
+    def traced(function):
+        def call(*args):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            try:
+                return function(*args)
+            finally:
+                allocated[0] += tracemalloc.get_traced_memory()[1] - current
+        return call
+
+    parser.update = traced(parser.update)
+    parser.update_sentence = traced(parser.update_sentence)
+    tracemalloc.start()
+    try:
+        parse(parser, stream)
+    finally:
+        tracemalloc.stop()
+        del parser.update, parser.update_sentence
+    return allocated[0]
+
+def benchmark(count=1000):
+    """
+    Print the sentences per second and the memory allocated per sentence
+    of the parsers
+    """
+    stream = corpus(count)
+    for name, parse in (('characters', parse_characters), ('sentences', parse_sentences),
+                        ('reader', parse_reader)):
+        parser = MicropyGPS()
+        gc.collect()
+        start = time.ticks_us()
+        parse(parser, stream)
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+
+        parser = MicropyGPS()
+        allocated = allocations(parse, parser, stream)
+
+        print('{:>10}: {} sentences/s, {} bytes allocated per sentence, {} parsed'.format(
+            name, count * 1000000 // max(elapsed, 1), allocated // count,
+            parser.parsed_sentences))
+
+
+if __name__ == '__main__':
+    # MicroPython ticks on the host
+    if not hasattr(time, 'ticks_ms'):
+        import inticks  # pylint: disable=W0611
+    benchmark()
+    for candidate in (parse_sentences, parse_reader):
+        print('{}: {} differences'.format(candidate.__name__, len(fuzz(candidate))))
@@ -0,0 +1,104 @@
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Linter
+# pylint: disable=C0103
+
+"""
+InnovateNow message sequence tracker.
+Ingest side tool which detects duplicate and lost device messages from the
+bootId and seq fields set by inmsg, it is not part of the device software.
+"""
+
+class SequenceTracker(object):
+    """
+    Detect duplicate and missing messages in a received message stream
+    based on the devId, bootId and seq fields of the messages
+    """
+
+    def __init__(self, window=256):
+        """
+        Initialize the tracker, window is the number of recent sequence
+        numbers per device remembered for detecting duplicates
+        """
+        self.window = window
+        self.duplicates = 0
+        self.lost = 0
+        self.unsequenced = 0
+        self._devices = dict()  # devId: [boot id, highest seq, recent seqs, missing seqs]
+
+    def check(self, message):
+        """
+        Check a received message and return 'new', 'duplicate', 'gap' or
+        'unsequenced' for messages without a sequence number
+        """
+        device_id = message.get('devId')
+        boot_id = message.get('bootId')
+        seq = message.get('seq')
+
+        if seq is None:
+            # Sent by firmware without message sequencing
+            self.unsequenced += 1
+            return 'unsequenced'
+
+        state = self._devices.get(device_id)
+        if state is None:
+            self._devices[device_id] = [boot_id, seq, [seq], set()]
+            return 'new'
+
+        if seq in state[2] or seq < state[1] - self.window:
+            self.duplicates += 1
+            return 'duplicate'
+
+        status = 'new'
+        if seq > state[1] + 1:
+            if boot_id == state[0]:
+                # Numbers skipped within one boot are lost messages
+                for missing in range(state[1] + 1, seq):
+                    state[3].add(missing)
+                self.lost += seq - state[1] - 1
+                status = 'gap'
+            # After a reset the unused part of the reserved block is skipped
+        elif seq < state[1]:
+            if seq in state[3]:
+                # Late arrival of a message counted as lost
+                state[3].discard(seq)
+                self.lost -= 1
+            else:
+                self.duplicates += 1
+                return 'duplicate'
+
+        if boot_id != state[0]:
+            state[0] = boot_id
+        state[1] = max(state[1], seq)
+        state[2].append(seq)
+        if len(state[2]) > self.window:
+            state[2].pop(0)
+        for missing in [m for m in state[3] if m < state[1] - self.window]:
+            state[3].discard(missing)
+
+        return status
+
+    def missing(self, device_id):
+        """
+        Return the sorted sequence numbers still missing for the device
+        """
+        state = self._devices.get(device_id)
+        if state is None:
+            return []
+        return sorted(state[3])